@@ -1,37 +1,281 @@
-from lexer import Token
+from array import array
+from lexer import Token, TokenType, TokenBuffer, TOKEN_TYPES, TOKEN_TYPE_IDS
+from SymbolTable import Symbol
+import astVisitor
+
+PARSING_TOKEN_ID = TOKEN_TYPE_IDS[TokenType.PARSING_TOKEN]
+
+# Type ids by the value of the token type, a str hashes faster than an Enum member
+TYPE_IDS_BY_VALUE = {token_type._value_: type_id for token_type, type_id in TOKEN_TYPE_IDS.items()}
 
 # https://github.com/wumphlett/COMP-3220/blob/main/HW-4/AST.rb
 # Based AST implementation off of COMP 3220 AST tree given in class
 class AST:
 
+    # Children are kept in a list for O(1) append and indexing
+    # down/right still link the first child and the next sibling for code that walks the tree
+    __slots__ = ("token", "down", "right", "children")
+
     def __init__(self, token):
         self.token = token
         self.down = None
         self.right = None
+        self.children = []
 
     def add_child(self, child_node):
         if(child_node is None):
             return 
-        t = self.down
-        if(t is None):
-            self.down = child_node
+        if(self.children):
+            self.children[-1].right = child_node
         else:
-            while(t.right is not None):
-                t = t.right
-            t.right = child_node
+            self.down = child_node
+        self.children.append(child_node)
         return
+
+    # Returns the nth child (0 is the first) or None if there are not that many children
+    def get_child(self, n):
+        if n < len(self.children):
+            return self.children[n]
+        return None
     
+    # Walked by an ASTVisitor so deep trees don't recurse
     def print_tree(self, level=0):
-        print('  ' * level + str(self.token))
-        child = self.down
-        while child is not None:
-            child.print_tree(level + 1)
-            child = child.right
+        astVisitor.ASTVisitor({}, print_node).visit(self, level)
+
+    def get_token(self):
+        return self.token
+
+
+# Compact AST storage for big programs
+# Every node is a row in parallel int arrays and is addressed by its integer handle
+# kinds[handle] - id of the node's token type from TOKEN_TYPE_IDS
+# token_indexes[handle] - index of the node's token in the token list or TokenBuffer the parser read,
+#                         for parsing tokens (Program, StmtList, ...) the index in parsing_tokens
+# symbol_ids[handle] - id of the Symbol the parser gave an identifier, -1 for other nodes
+# first_children, next_siblings[handle] - handles of the linked nodes or -1
+# No Token objects are kept for the nodes, a token is built from the lexer's tokens when it is asked for
+#
+# While parsing the rows are lists since appending to a list is a lot faster than to an array,
+# finish() turns them into arrays and drops what was only needed to build the tree, nodes can't be added after
+class ASTArena:
+
+    # symbols - list of every Symbol by id from the symbol table, identifiers get their value from it
+    def __init__(self, symbols):
+        self.kinds = []
+        self.token_indexes = []
+        self.symbol_ids = []
+        self.first_children = []
+        self.next_siblings = []
+        self.symbols = symbols
+        self.source = []
+
+        # Tokens the parser makes for StmtList, IfStmt, ... are the same every time so only one of each is kept
+        self.parsing_tokens = []
+        self.parsing_indexes = {}
+
+        # Only while parsing: last child of every node so adding a child doesn't walk the siblings,
+        # and the index of the token at every position in source so a node can point at its token
+        self.last_children = []
+        self.token_at = None
+        self.line_starts = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # Keeps the tokens the parser reads so the nodes can point into them and returns the tokens to parse
+    # A token stream is read into a list first since tokens are looked up by index
+    # Tokens are found by their position, the offset from a TokenBuffer or line and column packed into one int
+    def start(self, tokens):
+        if isinstance(tokens, TokenBuffer):
+            self.token_at = dict(zip(tokens.starts, range(len(tokens))))
+            self.line_starts = tokens.line_starts
+            self.source_value = tokens.value
+        else:
+            if not isinstance(tokens, list):
+                tokens = list(tokens)
+            self.token_at = {token.line << 32 | token.column: index for index, token in enumerate(tokens)}
+            self.source_value = lambda index: tokens[index].value
+        self.source = tokens
+        return tokens
+
+    # Packs the rows into arrays once the parser is done
+    def finish(self):
+        for name in ("kinds", "token_indexes", "symbol_ids", "first_children", "next_siblings"):
+            setattr(self, name, array('i', getattr(self, name)))
+        self.last_children = None
+        self.token_at = None
+        self.line_starts = None
+
+    # Adds a node and returns a view of it, used by the parser in place of AST.AST
+    def new_node(self, token):
+        return ArenaNode(self, self.add_node(token))
+
+    # Adds a node without children and returns its handle
+    def add_node(self, token):
+        kind = TYPE_IDS_BY_VALUE[token.type._value_]
+        symbol_id = -1
+        if kind == PARSING_TOKEN_ID:
+            token_index = self.parsing_indexes.get(token.value)
+            if token_index is None:
+                token_index = self.parsing_indexes[token.value] = len(self.parsing_tokens)
+                self.parsing_tokens.append(token)
+        else:
+            line_starts = self.line_starts
+            if line_starts is not None:
+                token_index = self.token_at[line_starts[token.line - 1] + token.column - 1]
+            else:
+                token_index = self.token_at[token.line << 32 | token.column]
+            value = token.value
+            if isinstance(value, Symbol):
+                symbol_id = value.id
+
+        kinds = self.kinds
+        handle = len(kinds)
+        kinds.append(kind)
+        self.token_indexes.append(token_index)
+        self.symbol_ids.append(symbol_id)
+        self.first_children.append(-1)
+        self.next_siblings.append(-1)
+        self.last_children.append(-1)
+        return handle
+
+    def add_child(self, parent, child):
+        last = self.last_children[parent]
+        if last == -1:
+            self.first_children[parent] = child
+        else:
+            self.next_siblings[last] = child
+        self.last_children[parent] = child
+
+    # Token type and value of a node without building its Token
+    def token_type(self, handle):
+        return TOKEN_TYPES[self.kinds[handle]]
+
+    def token_value(self, handle):
+        symbol_id = self.symbol_ids[handle]
+        if symbol_id != -1:
+            return self.symbols[symbol_id]
+        if self.kinds[handle] == PARSING_TOKEN_ID:
+            return self.parsing_tokens[self.token_indexes[handle]].value
+        return self.source_value(self.token_indexes[handle])
+
+    # Token of a node built from the lexer's token, identifiers get their Symbol as the value like in the parser
+    def token(self, handle):
+        if self.kinds[handle] == PARSING_TOKEN_ID:
+            return self.parsing_tokens[self.token_indexes[handle]]
+        token = self.source[self.token_indexes[handle]]
+        symbol_id = self.symbol_ids[handle]
+        if symbol_id != -1:
+            return Token(token.type, self.symbols[symbol_id], token.line, token.column)
+        return token
+
+    # First child of a node or None
+    def first_child(self, handle):
+        if handle is None:
+            return None
+        child = self.first_children[handle]
+        return child if child != -1 else None
+
+    # Returns the nth child (0 is the first) or None if there are not that many children
+    # Walks the sibling links, nodes only look past their first few children
+    def nth_child(self, handle, n):
+        if handle is None:
+            return None
+        child = self.first_children[handle]
+        while child != -1 and n > 0:
+            child = self.next_siblings[child]
+            n -= 1
+        return child if child != -1 else None
+
+    # Handles of the children of a node in order
+    def child_handles(self, handle):
+        child = self.first_children[handle]
+        while child != -1:
+            yield child
+            child = self.next_siblings[child]
+
+    # Walks the subtree under handle in preorder without recursion
+    # Yields (handle, depth) with depth 0 for the node the walk starts at
+    def walk(self, handle):
+        yield handle, 0
+        first_children = self.first_children
+        next_siblings = self.next_siblings
+        stack = []
+        if first_children[handle] != -1:
+            stack.append((first_children[handle], 1))
+        while stack:
+            current, depth = stack.pop()
+            yield current, depth
+
+            # The child is pushed last so it is visited before the sibling
+            if next_siblings[current] != -1:
+                stack.append((next_siblings[current], depth))
+            if first_children[current] != -1:
+                stack.append((first_children[current], depth + 1))
+
+
+# View of one arena node with the same methods and down/right links as AST
+# Views are made when asked for so two views of the same node compare equal but are not the same object
+# The parser builds the tree through them, TAC walks the handles in the arena instead
+class ArenaNode:
+
+    __slots__ = ("arena", "handle")
+
+    def __init__(self, arena, handle):
+        self.arena = arena
+        self.handle = handle
+
+    def __eq__(self, other):
+        return isinstance(other, ArenaNode) and self.arena is other.arena and self.handle == other.handle
+
+    def __hash__(self):
+        return hash((id(self.arena), self.handle))
+
+    @property
+    def token(self):
+        return self.arena.token(self.handle)
+
+    @property
+    def down(self):
+        child = self.arena.first_children[self.handle]
+        return ArenaNode(self.arena, child) if child != -1 else None
+
+    @property
+    def right(self):
+        sibling = self.arena.next_siblings[self.handle]
+        return ArenaNode(self.arena, sibling) if sibling != -1 else None
+
+    @property
+    def children(self):
+        return [ArenaNode(self.arena, child) for child in self.arena.child_handles(self.handle)]
+
+    def add_child(self, child_node):
+        if(child_node is None):
+            return
+        arena = self.arena
+        parent = self.handle
+        child = child_node.handle
+        last = arena.last_children[parent]
+        if last == -1:
+            arena.first_children[parent] = child
+        else:
+            arena.next_siblings[last] = child
+        arena.last_children[parent] = child
+
+    # Returns the nth child (0 is the first) or None if there are not that many children
+    def get_child(self, n):
+        child = self.arena.nth_child(self.handle, n)
+        return ArenaNode(self.arena, child) if child is not None else None
+
+    def print_tree(self, level=0):
+        astVisitor.ASTVisitor({}, print_node).visit(self, level)
 
     def get_token(self):
         return self.token
-    
-   
 
-    
 
+# Visitor handler for print_tree, prints the node indented by its depth then visits its children one level deeper
+def print_node(node, level):
+    print('  ' * level + str(node.token))
+    for child in node.children:
+        yield child, level + 1
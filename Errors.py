@@ -12,4 +12,10 @@ class ParsingError(Exception):
         self.message = message
         self.line = line
         self.column = column
-        super().__init__(f"Parsing Error: {message} at line {line}, column {column}")
\ No newline at end of file
+        super().__init__(f"Parsing Error: {message} at line {line}, column {column}")
+# Error in a program that parsed but can't be turned into assembly, TAC has no positions so there is no line or column
+class CodeGenerationError(Exception):
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(f"Code Generation Error: {message}")
@@ -1,36 +1,159 @@
 # https://matthewmacfarquhar.medium.com/build-your-own-programming-language-part-4-the-symbol-table-69f47ea394ad 
 # Somewhat based symbol table off this but tried to simplify it
 # Basically just a dictionary of dictionaries with some ease of use things
+from lexer import Token
+from Errors import ParsingError
 
+
+# Name of a variable, function or temp in the AST and TAC
+# It is the name string so printing and comparing work like before,
+# id is a dense number from the symbol table that passes can index lists and bitsets with
+class Symbol(str):
+    def __new__(cls, name, id):
+        symbol = super().__new__(cls, name)
+        symbol.id = id
+        return symbol
+
+    # Symbols are sent to other processes when files are compiled in parallel
+    def __getnewargs__(self):
+        return str(self), self.id
+
+
+# Temp variable made by TAC, kept apart from Symbols so passes can tell temps from source variables by type
+class Temp(Symbol):
+    pass
+
+
+# Scopes are global, one per function and one per block ({ } of if/else/while/for, for headers get their own too)
+# Block scopes are named function.n and point to the scope they are nested in, lookups follow that chain
+# so every step is one dict lookup
 class symbol_table:
     def __init__(self):
         self.scopes = {}  
 
+        # Nearest scope with symbols every block scope is nested in, global and function scopes have none
+        self.parents = {}
+
+        # Function every block scope belongs to
+        self.scope_functions = {}
+
+        # Number of block scopes made in every function, used to name the next one
+        self.block_counts = {}
+
+        # Parameters of every function in order, filled in as they are declared
+        self.signatures = {}
+
+        # Every symbol and temp by id and what kind of symbol it is (variable, parameter, function, temp)
+        self.symbols = []
+        self.symbol_kinds = []
+
+        # Ids of the symbols declared in the global scope
+        self.global_symbol_ids = set()
+
+    # Gives name the next id
+    def new_symbol(self, name, kind, symbol_class=Symbol):
+        symbol = symbol_class(name, len(self.symbols))
+        self.symbols.append(symbol)
+        self.symbol_kinds.append(kind)
+        return symbol
+
+    # Makes a temp variable for TAC
+    def new_temp(self, name):
+        return self.new_symbol(name, "temp", Temp)
+
     # Add a new symbol to the table
-    def add_symbol(self,name, type, scope, kind):
+    # Names can't be declared again in the same scope or hide a name from an enclosing block of the same function
+    # since TAC and the assembler tell the variables of a function apart by name
+    # token is where the name was declared for the error, symbols imported from an interface have none
+    def add_symbol(self,name, type, scope, kind, token=None):
         if scope not in self.scopes:
             self.scopes[scope] = {}
-        if name in self.scopes[scope]:
-            raise Exception(f"Symbol {name} already declared in scope {scope}")
-        self.scopes[scope][name] = symbol_table_entry(name, type, scope, kind)
+        declared_scope = scope
+        while declared_scope is not None:
+            if name in self.scopes.get(declared_scope, ()):
+                line, column = (token.line, token.column) if token is not None else (0, 0)
+                raise ParsingError(f"Symbol {name} already declared in scope {declared_scope}", line, column)
+            declared_scope = self.parents.get(declared_scope)
+        entry = symbol_table_entry(self.new_symbol(name, kind), type, scope, kind)
+        self.scopes[scope][name] = entry
+        if scope == 'global':
+            self.global_symbol_ids.add(entry.name.id)
+
+        # Keep the function signature up to date
+        if kind == "function":
+            self.signatures[name] = []
+        elif kind == "parameter":
+            self.signatures.setdefault(scope, []).append(entry)
+        return entry
+
+    # Makes a new block scope nested in scope and returns its name
+    # Symbols only go into the innermost open block, so enclosing blocks that are still empty stay empty
+    # while this one is open and the chain can skip straight to the nearest one with symbols
+    def new_block(self, scope):
+        function = self.function_of(scope)
+        count = self.block_counts.get(function, 0) + 1
+        self.block_counts[function] = count
+        block = f"{function}.{count}"
+        while scope in self.parents and not self.scopes.get(scope):
+            scope = self.parents[scope]
+        self.parents[block] = scope
+        self.scope_functions[block] = function
+        return block
+
+    # Name of the function a scope belongs to, the scope itself for function and global scopes
+    def function_of(self, scope):
+        return self.scope_functions.get(scope, scope)
+
+    # Ids of the global variables and functions
+    # Other functions and files can use them so passes don't keep track of their values
+    def global_ids(self):
+        return self.global_symbol_ids
+
+    # Variable, parameter or temp of a function, the symbols passes keep track of the values and liveness of
+    def is_local(self, value):
+        return isinstance(value, Symbol) and value.id not in self.global_symbol_ids and self.symbol_kinds[value.id] != "function"
 
     # Lookup a symbol in the table
+    # Looks in scope and the blocks it's nested in, then in global
     def lookup(self, name, scope):
-        if scope in self.scopes and name in self.scopes[scope]:
-            return self.scopes[scope][name]
+        while scope is not None:
+            symbols = self.scopes.get(scope)
+            if symbols is not None and name in symbols:
+                return symbols[name]
+            scope = self.parents.get(scope)
         if 'global' in self.scopes and name in self.scopes['global']:
             return self.scopes['global'][name]
         return None
     
     # Get all the parameters of a function
+    # Signatures are kept as parameters are declared so this doesn't look through the scope
     def get_function_params(self, function_name):
-        params = []
-        if function_name in self.scopes:
-            for symbol_entry in self.scopes[function_name].values():
-                if symbol_entry.kind == "parameter":
-                    params.append(symbol_entry)
+        params = self.signatures.get(function_name)
         return params if params else None
     
+    # Globals and function signatures of this file for its module interface file
+    # [name, type] for variables, [name, type, [[param name, param type], ...]] for functions
+    def export_interface(self):
+        exports = {"variables": [], "functions": []}
+        for entry in self.scopes.get('global', {}).values():
+            if entry.imported:
+                continue
+            if entry.kind == "function":
+                params = self.signatures.get(entry.name, [])
+                exports["functions"].append([entry.name, entry.type, [[param.name, param.type] for param in params]])
+            else:
+                exports["variables"].append([entry.name, entry.type])
+        return exports
+
+    # Adds the globals and functions another file exports so this file can use them
+    def import_interface(self, exports):
+        for name, type in exports["variables"]:
+            self.add_symbol(name, type, "global", "variable").imported = True
+        for name, type, params in exports["functions"]:
+            self.add_symbol(name, type, "global", "function").imported = True
+            for param_name, param_type in params:
+                self.add_symbol(param_name, param_type, name, "parameter").imported = True
+
     # Print the entire symbol table
     def print_table(self):
         if not self.scopes:
@@ -48,6 +171,7 @@ class symbol_table:
 # Type - data type of the symbol 
 # Scope - scope in which the symbol is defined
 # Kind - kind of symbol variable vs function
+# Name is a Symbol so the entry's id is name.id
 class symbol_table_entry:
     def __init__(self, name, type, scope, kind):
         self.name = name
@@ -55,5 +179,12 @@ class symbol_table_entry:
         self.scope = scope
         self.kind = kind
 
+        # Declared in another file and imported from its interface
+        self.imported = False
+
+    # Token for a use of this symbol at token's position, its value is the Symbol so the id goes into the AST and TAC
+    def symbol_token(self, token):
+        return Token(token.type, self.name, token.line, token.column)
+
     def __str__(self):
         return f"Name: {self.name}, Type: {self.type}, Scope: {self.scope}, Kind: {self.kind}"
\ No newline at end of file
@@ -1,129 +1,169 @@
 import instruction
+from instruction import Opcode, Const
 from lexer import TokenType
 from lexer import Token
 import AST
+import astVisitor
 import SymbolTable
+
+
+# Const for a number or character token, the value is parsed once here
+# A character is its character code, characters longer than one letter keep their text
+def constant(token):
+    return constant_of(token.type, token.value)
+
+def constant_of(token_type, text):
+    if token_type == TokenType.NUMBER:
+        return Const(int(text), text)
+    if token_type == TokenType.FLOATING_NUMBER:
+        return Const(float(text), text)
+    return Const(ord(text[1]) if len(text) == 3 else text, text)
+
+
 class TAC:
     def __init__(self, symbol_table):
         self.instructions = []
         self.temp_var_count = 1
         self.temp_label_count = 1
         self.symbol_table = symbol_table
+        self.handlers = self.build_handlers()
+        self.visitor = astVisitor.ASTVisitor(self.handlers)
 
     # Helper function to generate temporary variable names
+    # Temps get an id from the symbol table like variables
     def generate_fresh_variable(self):
-        var_name = f"%temp{self.temp_var_count}"
+        var_name = self.symbol_table.new_temp(f"%temp{self.temp_var_count}")
         self.temp_var_count += 1
         return var_name
 
     # Helper function to generate unique labels names
     def generate_fresh_label(self):
-        label_name = f"%L{self.temp_label_count}"
+        label_name = instruction.Label(f"%L{self.temp_label_count}")
         self.temp_label_count += 1
         return label_name
 
     # Function to add a new instruction to the TAC list
-    def add_instruction(self, label=None, operator=None, arg1=None, arg2=None, result=None, function_call=False):
-        instr = instruction.Instruction(label, operator, arg1, arg2, result, function_call=function_call)
+    def add_instruction(self, opcode, arg1=None, arg2=None, result=None, label=None):
+        instr = instruction.Instruction(opcode, arg1, arg2, result, label)
         self.instructions.append(instr)
         return instr
     
     # Returns a list of all children of node
     def children(self, node):
-        children = []
-        current = node.down if node else None
-        while current is not None:
-            children.append(current)
-            current = current.right
-        return children
+        return node.children if node else []
 
     # Returns the first child of node
     def get_first_child(self, node):
         return node.down if node and node.down else None
     
+    # Identifiers from the parser are Symbols so their kind is looked up by id
     def identifier_is_function(self, identifier, scope):
+        if isinstance(identifier, SymbolTable.Symbol):
+            return self.symbol_table.symbol_kinds[identifier.id] == 'function'
         entry = self.symbol_table.lookup(identifier, scope)
         return entry is not None and entry.kind == 'function'
         
     # Returns the nth child of node
     def get_nth_child(self, node, n):
-        current = node.down if node else None
-        for _ in range(n):
-            if current is None:
-                return None
-            current = current.right
-        return current
+        return node.get_child(n) if node else None
+
+    def token_type(self, node):
+        return node.token.type
+
+    def token_value(self, node):
+        return node.token.value
 
     # Generates TAC for a given AST node
+    # The tree is walked by an ASTVisitor so deep programs don't recurse, the handlers are the generate_TAC_for_* methods
+    # For an ASTArena the handlers walk the integer handles, the node helpers above are replaced with the arena's
     def generate_TAC(self, node, label=None, scope ='global'):
-        # If node is none that means we are at a leaf and can go back up
-        if node is None:
-            return None
-        
-        # Get the type of the token to determine what to do
-        token_type = node.get_token().type
-        
-        if token_type == TokenType.PARSING_TOKEN:
-            if node.get_token().value == "IfStmt":
-                end_label = self.generate_TAC_for_if(node, scope)
-                self.add_instruction(label=end_label)
-                return None
-            else:
-                for child in self.children(node):
-                    self.generate_TAC(child, scope=scope)
-                return None
-
-        # Handles function definitions and calls
-        if token_type == TokenType.IDENTIFIER and self.identifier_is_function(node.get_token().value, scope):
-            first_child = self.get_first_child(node)
-    
-            if first_child and first_child.get_token().value == "Parameters":
-                return self.generate_TAC_for_function_call(node, scope)
-            else:
-                function_label = node.get_token().value
-                self.add_instruction(label=function_label)
-                self.generate_TAC(self.get_first_child(node), scope=function_label)
-                return None
-
-        if token_type == TokenType.ASSIGN:
-            return self.generate_TAC_for_assignment(node, scope)
-        
-        if token_type in {TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE, TokenType.GREATER_THAN, TokenType.LESS_THAN, TokenType.EQUAL, TokenType.NOT_EQUAL}:
-            return self.generate_TAC_for_expression(node, scope=scope)
-        
-        if token_type == TokenType.RETURN:
-            return self.generate_TAC_for_return(node, scope)
-        
-        if token_type == TokenType.WHILE:
-            end_label = self.generate_TAC_for_while(node, scope)
-            self.add_instruction(label=end_label)
-            return None
-
-        if token_type == TokenType.FOR:
-            end_label = self.generate_TAC_for_for(node, scope)
-            self.add_instruction(label=end_label)
-            return None
-
-        # Handles leaf nodes like numbers and identifiers
-        if token_type in {TokenType.NUMBER, TokenType.IDENTIFIER, TokenType.FLOATING_NUMBER, TokenType.CHARACTER}:
-            return node.get_token().value
-        
+        if isinstance(node, AST.ArenaNode):
+            arena = node.arena
+            self.children = arena.child_handles
+            self.get_first_child = arena.first_child
+            self.get_nth_child = arena.nth_child
+            self.token_type = arena.token_type
+            self.token_value = arena.token_value
+            return astVisitor.ArenaVisitor(arena, self.handlers).visit(node.handle, scope)
+        return self.visitor.visit(node, scope)
+
+    # Handlers for the visitor keyed by token type, or by value for parsing tokens
+    def build_handlers(self):
+        handlers = {
+            "IfStmt": self.generate_TAC_for_if,
+            "Program": self.generate_TAC_for_program,
+            "StmtList": self.generate_TAC_for_children,
+            "Parameters": self.generate_TAC_for_children,
+            TokenType.IDENTIFIER: self.generate_TAC_for_identifier,
+            TokenType.ASSIGN: self.generate_TAC_for_assignment,
+            TokenType.RETURN: self.generate_TAC_for_return,
+            TokenType.WHILE: self.generate_TAC_for_while,
+            TokenType.FOR: self.generate_TAC_for_for,
+            TokenType.NUMBER: self.generate_TAC_for_leaf,
+            TokenType.FLOATING_NUMBER: self.generate_TAC_for_leaf,
+            TokenType.CHARACTER: self.generate_TAC_for_leaf,
+        }
+        for operator in [TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE, TokenType.GREATER_THAN, TokenType.LESS_THAN, TokenType.EQUAL, TokenType.NOT_EQUAL]:
+            handlers[operator] = self.generate_TAC_for_expression
+        return handlers
+
+    # Globals are set before the first function wherever they are declared, the assembler works out their values
+    # from the instructions before it. Declarations are still visited in order so temps are numbered like the source
+    def generate_TAC_for_program(self, node, scope):
+        function_instructions = self.instructions
+        global_instructions = []
+        for child in self.children(node):
+            is_function = self.token_type(child) == TokenType.IDENTIFIER and self.identifier_is_function(self.token_value(child), scope)
+            self.instructions = function_instructions if is_function else global_instructions
+            yield child, scope
+        self.instructions = global_instructions + function_instructions
+        return None
+
+    # Handles nodes that only group statements or arguments, like astVisitor.visit_children
+    def generate_TAC_for_children(self, node, scope):
+        for child in self.children(node):
+            yield child, scope
+        return None
+
+    # Handles leaf nodes like numbers and chars
+    def generate_TAC_for_leaf(self, node, scope):
+        return constant_of(self.token_type(node), self.token_value(node))
+
+    # Handles function definitions and calls, other identifiers are leaf nodes
+    # A definition always has its StmtList, a call has Parameters or no children when it has no arguments
+    def generate_TAC_for_identifier(self, node, scope):
+        identifier = self.token_value(node)
+        if not self.identifier_is_function(identifier, scope):
+            return identifier
+
+        first_child = self.get_first_child(node)
+        if first_child is None or self.token_value(first_child) == "Parameters":
+            return self.generate_TAC_for_function_call(node, scope)
+
+        function_label = identifier
+        self.add_instruction(Opcode.FUNCTION, label=function_label)
+        return self.generate_TAC_for_function_body(first_child, function_label)
+
+    # Handles the statements of a function definition
+    def generate_TAC_for_function_body(self, body_node, function_label):
+        yield body_node, function_label
         return None
     
     # Handles TAC Generation for declerations
     def generate_TAC_for_assignment(self, node, scope):
         left = self.get_first_child(node)
         right = self.get_nth_child(node, 1)
-        right_result = self.generate_TAC(right, scope=scope)
-        self.add_instruction(operator='=', arg1=right_result, result=left.get_token().value)
-        return left.get_token().value
+        right_result = yield right, scope
+        variable = self.token_value(left)
+        self.add_instruction(Opcode.COPY, arg1=right_result, result=variable)
+        return variable
 
     # Handles TAC Generation for return statements
     def generate_TAC_for_return(self, node, scope):
         # Get the expression node that will be returned
         expr_node = self.get_first_child(node)
-        expr_result = self.generate_TAC(expr_node, scope=scope)
-        self.add_instruction(operator=node.get_token().value, arg1=expr_result)
+        expr_result = yield expr_node, scope
+        self.add_instruction(Opcode.RETURN, arg1=expr_result)
         return None
 
     # Handles TAC Generation for binary expressions
@@ -132,13 +172,13 @@ class TAC:
             left = self.get_first_child(node)
             right = self.get_nth_child(node, 1)
 
-            # Recursively generate TAC for left and right 
-            left_result = self.generate_TAC(left, scope=scope)
-            right_result = self.generate_TAC(right, scope=scope)
+            # Generate TAC for left and right 
+            left_result = yield left, scope
+            right_result = yield right, scope
 
             # Create a new temporary variable to hold the result and add the instruction
             temp_var = self.generate_fresh_variable()
-            self.add_instruction(operator=node.get_token().value, arg1=left_result, arg2=right_result, result=temp_var)
+            self.add_instruction(instruction.BINARY_OPCODES[self.token_value(node)], arg1=left_result, arg2=right_result, result=temp_var)
            
             # Send the temp variable back up so that it can be used to set variables to the right value
             return temp_var
@@ -149,26 +189,27 @@ class TAC:
         if_node = self.get_first_child(node)
         condition_node = self.get_first_child(if_node)
         else_node = self.get_nth_child(node, 1)
-        condition_result = self.generate_TAC(condition_node, scope=scope)
+        condition_result = yield condition_node, scope
 
         # Generate Labels for the if-else structure
         if_label = self.generate_fresh_label()
-        else_label = self.generate_fresh_label() if else_node else None
+        else_label = self.generate_fresh_label() if else_node is not None else None
         end_label = self.generate_fresh_label()
 
         # Generate TAC for the if-else structure
-        self.add_instruction(operator= "if", arg1=condition_result, arg2=if_label, result= else_label if else_label else end_label)
-        self.add_instruction(label=if_label)
-        self.generate_TAC(self.get_nth_child(if_node, 1), scope=scope)
-        self.add_instruction(operator='goto', result=end_label)
+        self.add_instruction(Opcode.IF, arg1=condition_result, arg2=if_label, result= else_label if else_label else end_label)
+        self.add_instruction(Opcode.LABEL, label=if_label)
+        yield self.get_nth_child(if_node, 1), scope
+        self.add_instruction(Opcode.GOTO, result=end_label)
         
         # If there is an else node, generate TAC for it
-        if else_node:
-            self.add_instruction(label=else_label)
-            self.generate_TAC(self.get_first_child(else_node), scope=scope)
-            self.add_instruction(operator='goto', result=end_label)
+        if else_node is not None:
+            self.add_instruction(Opcode.LABEL, label=else_label)
+            yield self.get_first_child(else_node), scope
+            self.add_instruction(Opcode.GOTO, result=end_label)
 
-        return end_label
+        self.add_instruction(Opcode.LABEL, label=end_label)
+        return None
 
     # Handles TAC Generation for while loops
     def generate_TAC_for_while(self, node, scope):
@@ -182,18 +223,19 @@ class TAC:
         end_label = self.generate_fresh_label()
 
         # Generate TAC for the loop
-        self.add_instruction(label=start_label)
-        condition_result = self.generate_TAC(conditon_node, scope=scope)
-        self.add_instruction(operator="if", arg1=condition_result, arg2=body_label, result=end_label)
-        self.add_instruction(label=body_label)
-        self.generate_TAC(body_node, scope=scope)
-        self.add_instruction(operator='goto', result=start_label)
-        return end_label
+        self.add_instruction(Opcode.LABEL, label=start_label)
+        condition_result = yield conditon_node, scope
+        self.add_instruction(Opcode.IF, arg1=condition_result, arg2=body_label, result=end_label)
+        self.add_instruction(Opcode.LABEL, label=body_label)
+        yield body_node, scope
+        self.add_instruction(Opcode.GOTO, result=start_label)
+        self.add_instruction(Opcode.LABEL, label=end_label)
+        return None
 
     # Handles TAC Generation for for loops
     def generate_TAC_for_for(self, node, scope):
         # Add the initialization part to last label
-        self.generate_TAC(self.get_first_child(node), scope=scope) 
+        yield self.get_first_child(node), scope
 
         # Get the condition, increment, and body nodes
         condition_node = self.get_nth_child(node, 1)
@@ -206,28 +248,27 @@ class TAC:
         end_label = self.generate_fresh_label()
 
         # Generate TAC for the loop
-        self.add_instruction(label=start_label)
-        condition_result = self.generate_TAC(condition_node, scope=scope)
-        self.add_instruction(operator="if", arg1=condition_result, arg2=body_label, result=end_label)
-        self.add_instruction(label=body_label)
-        self.generate_TAC(body_node, scope=scope)
-        self.generate_TAC(increment_node, scope=scope)
-        self.add_instruction(operator='goto', result=start_label)
-        return end_label
+        self.add_instruction(Opcode.LABEL, label=start_label)
+        condition_result = yield condition_node, scope
+        self.add_instruction(Opcode.IF, arg1=condition_result, arg2=body_label, result=end_label)
+        self.add_instruction(Opcode.LABEL, label=body_label)
+        yield body_node, scope
+        yield increment_node, scope
+        self.add_instruction(Opcode.GOTO, result=start_label)
+        self.add_instruction(Opcode.LABEL, label=end_label)
+        return None
     
     # Handles TAC Generation for function calls
     def generate_TAC_for_function_call(self, node, scope):
         parameter_head = self.get_first_child(node)
-        function_name = node.get_token().value
+        function_name = self.token_value(node)
         parameter_list = []
 
-        if parameter_head:
+        if parameter_head is not None:
             for child in self.children(parameter_head):
-                param_result = self.generate_TAC(child, scope=scope)
+                param_result = yield child, scope
                 parameter_list.append(param_result)
         
         temp_var = self.generate_fresh_variable()
-        self.add_instruction(operator='call', arg1=function_name, arg2=','.join(parameter_list), result=temp_var, function_call=True)
+        self.add_instruction(Opcode.CALL, arg1=function_name, arg2=tuple(parameter_list), result=temp_var)
         return temp_var
-       
-
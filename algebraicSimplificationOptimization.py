@@ -1,80 +1,63 @@
-from instruction import Instruction
+from instruction import Instruction, Opcode, Const
+from instructionList import as_instruction_list
 
+# True if value is the constant number
+def is_constant(value, number):
+    return type(value) is Const and value.value == number
+
+# Simplified instructions are replaced with copies in the InstructionList, modified is True if any were
 class AlgebraicSimplificationOptimization:
     def __init__(self, instructions):
-        self.instructions = instructions
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
+
+    # Replaces the instruction in node with result = value
+    def simplify(self, node, value):
+        self.instructions.replace(node, Instruction(Opcode.COPY, arg1=value, result=node.instr.result))
+        self.modified = True
 
     def optimize(self):
-        optimized_instructions = []
-        for instr in self.instructions:
+        for node in self.instructions.nodes():
+            instr = node.instr
+            opcode = instr.opcode
+
             # x + 0 = x
             # 0 + x = x
-            if instr.operator == '+':
-                if instr.arg1 == '0' or instr.arg1 == 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg2, arg2=None, result=instr.result)
-                    )
-                elif instr.arg2 == '0' or instr.arg2 == 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg1, arg2=None, result=instr.result)
-                    )
-                else:
-                    optimized_instructions.append(instr)
+            if opcode is Opcode.ADD:
+                if is_constant(instr.arg1, 0):
+                    self.simplify(node, instr.arg2)
+                elif is_constant(instr.arg2, 0):
+                    self.simplify(node, instr.arg1)
             
             # x - 0 = x
             # x - x = 0
-            elif instr.operator == '-':
-                if instr.arg2 == '0' or instr.arg2 == 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg1, arg2=None, result=instr.result)
-                    )
+            elif opcode is Opcode.SUB:
+                if is_constant(instr.arg2, 0):
+                    self.simplify(node, instr.arg1)
                 elif instr.arg1 == instr.arg2:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1='0', arg2=None, result=instr.result)
-                    )
-                else:
-                    optimized_instructions.append(instr)
+                    self.simplify(node, Const(0))
             
             # x * 1 = x
             # 1 * x = x 
             # x * 0 = 0 
             # 0 * x = 0
-            elif instr.operator == '*':
-                if instr.arg1 == '1' or instr.arg1 == 1:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg2, arg2=None, result=instr.result)
-                    )
-                elif instr.arg2 == '1' or instr.arg2 == 1:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg1, arg2=None, result=instr.result)
-                    )
-                elif instr.arg1 == '0' or instr.arg1 == 0 or instr.arg2 == '0' or instr.arg2 == 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1='0', arg2=None, result=instr.result)
-                    )
-                else:
-                    optimized_instructions.append(instr)
+            elif opcode is Opcode.MUL:
+                if is_constant(instr.arg1, 1):
+                    self.simplify(node, instr.arg2)
+                elif is_constant(instr.arg2, 1):
+                    self.simplify(node, instr.arg1)
+                elif is_constant(instr.arg1, 0) or is_constant(instr.arg2, 0):
+                    self.simplify(node, Const(0))
             
             # x / 1 = x
             # x / x = 1 
             # 0 / x = 0
-            elif instr.operator == '/':
-                if instr.arg2 == '1' or instr.arg2 == 1:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1=instr.arg1, arg2=None, result=instr.result)
-                    )
-                elif instr.arg1 == instr.arg2 and instr.arg1 != '0' and instr.arg1 != 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1='1', arg2=None, result=instr.result)
-                    )
-                elif instr.arg1 == '0' or instr.arg1 == 0:
-                    optimized_instructions.append(
-                        Instruction(operator='=', arg1='0', arg2=None, result=instr.result)
-                    )
-                else:
-                    optimized_instructions.append(instr)
-                    
-            else:
-                optimized_instructions.append(instr)
-        
-        return optimized_instructions
\ No newline at end of file
+            elif opcode is Opcode.DIV:
+                if is_constant(instr.arg2, 1):
+                    self.simplify(node, instr.arg1)
+                elif instr.arg1 == instr.arg2 and not is_constant(instr.arg1, 0):
+                    self.simplify(node, Const(1))
+                elif is_constant(instr.arg1, 0):
+                    self.simplify(node, Const(0))
+
+        return self.instructions
@@ -1,6 +1,7 @@
-from instruction import Instruction
+from instruction import Opcode, Const, Var, BINARY
 from assemblyInstruction import AssemblyInstruction
-from SymbolTable import symbol_table
+from constantFoldingOptimization import fold
+from Errors import CodeGenerationError
 
 # Used chatgpt to help figure out how to convert to assembly and to check output
 class assembler:
@@ -10,19 +11,21 @@ class assembler:
         self.variable_map = {}
         self.size_to_allocate = 0
         self.symbol_table = symbol_table
+
+        # Global variables are in the data section and used by name, so every file that imports one shares it
+        # Symbol id -> memory operand of every global variable
+        self.global_map = {entry.name.id: f"[{entry.name}]" for entry in symbol_table.scopes.get('global', {}).values()
+                           if entry.kind == "variable"}
         
 
-    # See if an argument is numeric
+    # See if an argument is a constant, constants are immediates and everything else is in memory or a register
     def isNumeric(self, value):
-        try:
-            float(value)
-            return True
-        except (ValueError, TypeError):
-            return False
+        return type(value) is Const
     
     # Format memory address with proper signs
+    # variable_map is keyed by symbol id
     def format_memory_address(self, variable):
-        location = self.variable_map[variable]
+        location = self.variable_map[variable.id]
         
         # Check if it's a register name (string)
         if isinstance(location, str):
@@ -35,53 +38,59 @@ class assembler:
             return f"[rbp{location}]"  # negative already includes the minus sign  
 
     # Map all the variables in order to allocate space on stack
-    def mapVariables(self, instructions, function_name):
-        self.variable_map = {}
+    # Symbols used in the function are collected in a bitset by id and get stack slots in id order
+    # start is the index of the function's label so only its own instructions are read
+    def mapVariables(self, instructions, function_name, start=0):
+        self.variable_map = dict(self.global_map)
         offset = 0
-        variables_seen = set()
+        variables_seen = 0
         in_target_function = False
+        symbol_kinds = self.symbol_table.symbol_kinds
 
         # Find instructions belonging to the target function
-        for instr in instructions:
+        for index in range(start, len(instructions)):
+            instr = instructions[index]
             
-            if instr.label == function_name:
-                in_target_function = True
+            if instr.opcode is Opcode.FUNCTION:
+                if in_target_function:
+                    break
+                in_target_function = instr.label == function_name
                 continue
             
-            if instr.label and not instr.label.startswith('%') and instr.label != function_name and in_target_function:
-                break
-            
             
             if in_target_function:
-                
-                if instr.result and not self.isNumeric(instr.result):
-                    variables_seen.add(instr.result)
-                if instr.arg1 and not self.isNumeric(instr.arg1):
-                    variables_seen.add(instr.arg1)
-                if instr.arg2 and not self.isNumeric(instr.arg2):
-                    variables_seen.add(instr.arg2)
+                operands = [instr.result, instr.arg1]
+                if instr.opcode is Opcode.CALL:
+                    operands.extend(instr.arg2)
+                else:
+                    operands.append(instr.arg2)
+                for operand in operands:
+                    if isinstance(operand, Var) and symbol_kinds[operand.id] != "function" and operand.id not in self.global_map:
+                        variables_seen |= 1 << operand.id
 
         # First 4 params in registers: rdi, rsi, rdx, rcx
         # Additional params on stack at positive offsets
         function_params = self.symbol_table.get_function_params(function_name)
-        param_names = set()
+        param_ids = 0
         param_registers = ["rdi", "rsi", "rdx", "rcx"]
         param_offset = 16  # Stack parameters start at rbp+16
         
         if function_params is not None:
             for i, params in enumerate(function_params):
                 if i < 4:  
-                    self.variable_map[params.name] = param_registers[i]
+                    self.variable_map[params.name.id] = param_registers[i]
                 else: 
-                    self.variable_map[params.name] = param_offset
+                    self.variable_map[params.name.id] = param_offset
                     param_offset += 8
-                param_names.add(params.name)  
+                param_ids |= 1 << params.name.id
 
         # Map local variables at negative offsets
-        for var in variables_seen:
-            if var not in param_names:  
-                offset += 8
-                self.variable_map[var] = -offset
+        local_ids = variables_seen & ~param_ids
+        while local_ids:
+            lowest = local_ids & -local_ids
+            offset += 8
+            self.variable_map[lowest.bit_length() - 1] = -offset
+            local_ids ^= lowest
                 
         self.size_to_allocate = ((offset + 15) // 16) * 16
         return self.variable_map
@@ -90,13 +99,65 @@ class assembler:
         instr = AssemblyInstruction(operation, destination, source, label)
         self.assembly_instructions.append(instr)
 
+    # Initial values of the global variables by symbol id
+    # The instructions before the first function set them, C only allows constants there so they are worked out
+    # here with the folding the optimizations use and go in the data section instead of running
+    # A value that isn't known is None, it is an error once it reaches a global
+    def global_values(self, instructions):
+        values = {}
+
+        def value_of(operand):
+            if type(operand) is Const:
+                return operand.value if operand.is_numeric() else None
+            return values.get(operand.id, 0 if operand.id in self.global_map else None)
+
+        for instr in instructions:
+            if instr.opcode is Opcode.FUNCTION:
+                break
+            value = None
+            if instr.opcode is Opcode.COPY:
+                value = value_of(instr.arg1)
+            elif instr.opcode in BINARY:
+                left, right = value_of(instr.arg1), value_of(instr.arg2)
+                if left is not None and right is not None:
+                    value = fold(instr.opcode, left, right)
+            if value is None and instr.result.id in self.global_map:
+                raise CodeGenerationError(f"Initial value of global {instr.result} is not a constant")
+            values[instr.result.id] = value
+        return values
+
+    # Linkage of the functions and global variables of this file and the data section with its global variables
+    # Everything this file defines is exported with global and everything imported from other files is extern,
+    # so separately compiled files can call each other and share their globals once they are linked
+    def assemble_globals(self, instructions):
+        entries = self.symbol_table.scopes.get('global', {}).values()
+        for entry in entries:
+            self.addInstruction("extern" if entry.imported else "global", entry.name)
+
+        defined = [entry for entry in entries if entry.kind == "variable" and not entry.imported]
+        if not defined:
+            return
+        values = self.global_values(instructions)
+        self.addInstruction("section", ".data")
+        for entry in defined:
+            self.addInstruction(label=entry.name)
+            self.addInstruction("dq", str(values.get(entry.name.id, 0)))
+        self.addInstruction("section", ".text")
+
     def assemble(self, instructions):
         in_function = False
-        
+        self.assemble_globals(instructions)
+
         for i, instr in enumerate(instructions):
             
+            opcode = instr.opcode
+
+            # Globals were set in the data section
+            if not in_function and opcode is not Opcode.FUNCTION:
+                continue
+
             # Set up stack frame on function lables otherewise just add label
-            if instr.label is not None and not instr.label.startswith('%'):
+            if opcode is Opcode.FUNCTION:
 
                 # Add epilogue for previous function
                 if i > 0 and in_function:
@@ -106,60 +167,60 @@ class assembler:
                 
                 # Start new function
                 self.addInstruction(label=instr.label)
-                self.mapVariables(instructions, instr.label)
+                self.mapVariables(instructions, instr.label, i)
                 self.addInstruction("push", "rbp")
                 self.addInstruction("mov",  "rbp", "rsp")
                 if self.size_to_allocate > 0:
                     self.addInstruction("sub", "rsp", str(self.size_to_allocate))
                 in_function = True
-            elif instr.label:
+            elif opcode is Opcode.LABEL:
                 self.addInstruction(label=instr.label)
 
             # Translate TAC setting to assembly
-            if instr.operator == '=':
+            elif opcode is Opcode.COPY:
                 destination = self.format_memory_address(instr.result)
                 if self.isNumeric(instr.arg1):
-                    self.addInstruction("mov", destination, str(instr.arg1))
+                    self.addInstruction("mov", destination, str(instr.arg1.value))
                 else:
                     source = self.format_memory_address(instr.arg1)
                     self.addInstruction("mov", "rax", source)
                     self.addInstruction("mov", destination, "rax")
 
             # Translate TAC arithmatic operations(not division) to assembly
-            elif instr.operator in ('+', '-', '*', '<', '>', '==', '!='):
+            elif opcode in BINARY and opcode is not Opcode.DIV:
                 destination = self.format_memory_address(instr.result)
 
                 if self.isNumeric(instr.arg1):
-                    self.addInstruction("mov", "rax", str(instr.arg1))
+                    self.addInstruction("mov", "rax", str(instr.arg1.value))
                 else:
                     source1 = self.format_memory_address(instr.arg1)
                     self.addInstruction("mov", "rax", source1)
                 
                 if self.isNumeric(instr.arg2):
-                    source2 = str(instr.arg2)
+                    source2 = str(instr.arg2.value)
                 else:
                     source2 = self.format_memory_address(instr.arg2)
 
 
-                if instr.operator == '+':
+                if opcode is Opcode.ADD:
                     self.addInstruction("add", "rax", source2)
-                elif instr.operator == '-':
+                elif opcode is Opcode.SUB:
                     self.addInstruction("sub", "rax", source2)
-                elif instr.operator == '*':
+                elif opcode is Opcode.MUL:
                     self.addInstruction("imul", "rax", source2)
-                elif instr.operator == '<':
+                elif opcode is Opcode.LT:
                     self.addInstruction("cmp", "rax", source2)
                     self.addInstruction("setl", "al")
                     self.addInstruction("movzx", "rax", "al")
-                elif instr.operator == '>':
+                elif opcode is Opcode.GT:
                     self.addInstruction("cmp", "rax", source2)
                     self.addInstruction("setg", "al")
                     self.addInstruction("movzx", "rax", "al")
-                elif instr.operator == '==':
+                elif opcode is Opcode.EQ:
                     self.addInstruction("cmp", "rax", source2)
                     self.addInstruction("sete", "al")
                     self.addInstruction("movzx", "rax", "al")
-                elif instr.operator == '!=':
+                elif opcode is Opcode.NE:
                     self.addInstruction("cmp", "rax", source2)
                     self.addInstruction("setne", "al")
                     self.addInstruction("movzx", "rax", "al")
@@ -167,11 +228,11 @@ class assembler:
                 self.addInstruction("mov", destination, "rax")
 
             # Translate TAC division to assembly
-            elif instr.operator == '/':
+            elif opcode is Opcode.DIV:
                 destination = self.format_memory_address(instr.result)
 
                 if self.isNumeric(instr.arg1):
-                    self.addInstruction("mov", "rax", str(instr.arg1))
+                    self.addInstruction("mov", "rax", str(instr.arg1.value))
                 else:
                     source1 = self.format_memory_address(instr.arg1)
                     self.addInstruction("mov", "rax", source1)
@@ -179,7 +240,7 @@ class assembler:
                 self.addInstruction("cdq")
 
                 if self.isNumeric(instr.arg2):
-                    source2 = str(instr.arg2)
+                    source2 = str(instr.arg2.value)
                     self.addInstruction("mov", "rcx", source2)
                     self.addInstruction("idiv", "rcx")
                 else:
@@ -189,18 +250,18 @@ class assembler:
                 self.addInstruction("mov", destination, "rax")
             
             # Translate TAC return to assembly
-            elif instr.operator == 'return':
-                if instr.arg1:
+            elif opcode is Opcode.RETURN:
+                if instr.arg1 is not None:
                     if self.isNumeric(instr.arg1):
-                        self.addInstruction("mov", "rax", str(instr.arg1))
+                        self.addInstruction("mov", "rax", str(instr.arg1.value))
                     else:
                         source = self.format_memory_address(instr.arg1)
                         self.addInstruction("mov", "rax", source)
 
             # Translate TAC if to assembly
-            elif instr.operator == 'if':
+            elif opcode is Opcode.IF:
                 if self.isNumeric(instr.arg1):
-                    self.addInstruction("mov", "rax", str(instr.arg1))
+                    self.addInstruction("mov", "rax", str(instr.arg1.value))
                 else:
                     source = self.format_memory_address(instr.arg1)
                     self.addInstruction("mov", "rax", source)
@@ -210,11 +271,11 @@ class assembler:
                 self.addInstruction("jmp", instr.result)
 
             # Translate TAC goto to assembly
-            elif instr.operator == 'goto':
+            elif opcode is Opcode.GOTO:
                 self.addInstruction("jmp", instr.result)
 
             # Translate TAC function call to assembly
-            elif instr.function_call:
+            elif opcode is Opcode.CALL:
          
                 # First 4 params in registers: rdi, rsi, rdx, rcx
                 # 5th+ params on stack 
@@ -222,12 +283,12 @@ class assembler:
                 param_registers = ["rdi", "rsi", "rdx", "rcx"]
                 
                 if instr.arg2:
-                    params = instr.arg2.split(',')
+                    params = instr.arg2
                     
                     for i, param in enumerate(params):
                         if i < 4:  
                             if self.isNumeric(param):
-                                self.addInstruction("mov", param_registers[i], str(param))
+                                self.addInstruction("mov", param_registers[i], str(param.value))
                             else:
                                 source = self.format_memory_address(param)
                                 self.addInstruction("mov", "rax", source)
@@ -237,7 +298,7 @@ class assembler:
                     for param in reversed(stack_params):
                         number_of_stack_params += 1
                         if self.isNumeric(param):
-                            self.addInstruction("mov", "rax", str(param))
+                            self.addInstruction("mov", "rax", str(param.value))
                         else:
                             source = self.format_memory_address(param)
                             self.addInstruction("mov", "rax", source)
@@ -0,0 +1,84 @@
+from types import GeneratorType
+from lexer import TokenType, TOKEN_TYPES, TOKEN_TYPE_IDS
+
+PARSING_TOKEN_ID = TOKEN_TYPE_IDS[TokenType.PARSING_TOKEN]
+
+# https://en.wikipedia.org/wiki/Visitor_pattern
+# Walks an AST with an explicit stack instead of recursing so deep programs can't hit the recursion limit
+#
+# Handlers are kept in a dict keyed by the token type of the node,
+# parsing tokens (Program, StmtList, IfStmt, Parameters) are keyed by their value instead
+# A handler is called as handler(node, context) and either
+#   - returns the result for the node right away, or
+#   - is a generator that yields (child, context) for every child it wants visited,
+#     gets the child's result back from the yield and returns the result for the node
+class ASTVisitor:
+
+    # handlers - dict of key -> handler
+    # default - handler for nodes with no entry in handlers
+    def __init__(self, handlers, default=None):
+        self.handlers = handlers
+        self.default = default
+
+    # Calls the handler for one node, visiting None gives None
+    def dispatch(self, node, context):
+        if node is None:
+            return None
+        token = node.token
+        handler = self.handlers.get(token.value if token.type is TokenType.PARSING_TOKEN else token.type, self.default)
+        if handler is None:
+            return None
+        return handler(node, context)
+
+    # Visits node and returns the result of its handler
+    # The stack holds the generators of handlers that are waiting on a child
+    def visit(self, node, context=None):
+        stack = []
+        result = self.dispatch(node, context)
+        while True:
+            # Start a handler that has children to visit
+            if type(result) is GeneratorType:
+                stack.append(result)
+                result = None
+
+            if not stack:
+                return result
+
+            # Give the result to the handler waiting on it and visit the next child it asks for
+            try:
+                child, child_context = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            result = self.dispatch(child, child_context)
+
+
+# Visits the integer handles of an AST.ASTArena instead of node objects
+# Handlers get handles and ask the arena about them, so walking the tree makes no node views
+# Handlers for token types are in a list by type id so a handle's kind finds its handler without hashing a TokenType
+class ArenaVisitor(ASTVisitor):
+
+    def __init__(self, arena, handlers, default=None):
+        super().__init__(handlers, default)
+        self.arena = arena
+        self.kind_handlers = [handlers.get(token_type, default) for token_type in TOKEN_TYPES]
+
+    def dispatch(self, handle, context):
+        if handle is None:
+            return None
+        arena = self.arena
+        kind = arena.kinds[handle]
+        if kind == PARSING_TOKEN_ID:
+            handler = self.handlers.get(arena.parsing_tokens[arena.token_indexes[handle]].value, self.default)
+        else:
+            handler = self.kind_handlers[kind]
+        if handler is None:
+            return None
+        return handler(handle, context)
+
+
+# Handler that visits every child with the same context, for nodes that only group other nodes
+def visit_children(node, context):
+    for child in node.children:
+        yield child, context
@@ -2,7 +2,7 @@
 # https://www.geeksforgeeks.org/python/networkx-python-software-package-study-complex-networks/
 # https://www.geeksforgeeks.org/python/networkx-python-software-package-study-complex-networks/
 
-import instruction
+from instruction import Opcode
 import networkx as nx
 
 class BasicBlockGenerator:
@@ -49,8 +49,8 @@ class BasicBlockGenerator:
             instructions_in_block.append(current_instr)
             self.instruction_index += 1
             
-            # If this was a branch/jump instruction, end the block
-            if current_instr.operator in ["if", "goto"]:
+            # If this was a branch/jump/return instruction, end the block
+            if current_instr.opcode in (Opcode.IF, Opcode.GOTO, Opcode.RETURN):
                 break
         
         self.basic_blocks[block_id] = instructions_in_block
@@ -67,7 +67,7 @@ class BasicBlockGenerator:
                 
             last_instr = instructions[-1]
             
-            if last_instr.operator == "if":
+            if last_instr.opcode is Opcode.IF:
 
                 true_jump = self.label_in_block.get(last_instr.arg2)
                 false_jump = self.label_in_block.get(last_instr.result)
@@ -77,10 +77,14 @@ class BasicBlockGenerator:
                 if false_jump:
                     self.graph.add_edge(block_id, false_jump, label="false")
                     
-            elif last_instr.operator == "goto":
+            elif last_instr.opcode is Opcode.GOTO:
                 target = self.label_in_block.get(last_instr.result)
                 if target:
                     self.graph.add_edge(block_id, target, label="goto")
+
+            # Blocks that don't jump or return fall through to the next block
+            elif last_instr.opcode is not Opcode.RETURN and i + 1 < len(block_ids):
+                self.graph.add_edge(block_id, block_ids[i + 1], label="fallthrough")
     
     def print_control_flow_graph(self):
         print("\nControl Flow Graph:")
@@ -0,0 +1,608 @@
+import os
+import sys
+import io
+import time
+import argparse
+import tracemalloc
+import lexer
+import Errors
+from lexer import Token, TokenType
+import parser
+import AST
+import TAC
+import ll1Parser
+import tacParser
+import constantFoldingOptimization
+import tempVariableRemoverOptimization
+import algebraicSimplificationOptimization
+import candcPropagation
+import easyDeadCodeElimination
+import localValueNumbering
+import assembler
+import instruction
+import passManager
+
+# Benchmarks for compiler stages
+# To run benchmarks: python3 benchmark.py [options] <benchmark>
+
+
+# Builds a synthetic program with the given number of functions
+# Every function uses declarations, expressions, if/else, loops and comments
+def generate_program(function_count):
+    parts = ["// Generated benchmark program", "int total = 0;", ""]
+    for i in range(function_count):
+        parts.append(f"""// Function number {i}
+int func{i}(int a, int b) {{
+    int x = a + b * 2;
+    int y = x - 3;
+    if (x > y) {{
+        y = y + 1;
+    }} else {{
+        y = y - 1;
+    }}
+    while (y < 10) {{
+        y = y + 1;
+    }}
+    return y;
+}}
+""")
+    parts.append("int main() {")
+    parts.append("    int result = 0;")
+    for i in range(min(function_count, 50)):
+        parts.append(f"    result = func{i}(result, {i});")
+    parts.append("    return result;")
+    parts.append("}")
+    return "\n".join(parts) + "\n"
+
+
+# Builds functions whose settings are constants that reach branches and loops in other blocks
+# like a program with configuration values and debug switches
+def generate_constant_program(function_count):
+    parts = ["// Generated constant benchmark program", ""]
+    for i in range(function_count):
+        parts.append(f"""// Function number {i}
+int func{i}(int a) {{
+    int debug = 0;
+    int scale = 4;
+    int limit = scale * 8;
+    int result = a;
+    if (debug == 1) {{
+        result = result + limit;
+        scale = 1;
+    }}
+    int step = scale / 2;
+    for (int i = 0; i < limit; i = i + step) {{
+        result = result + step * scale;
+        if (debug != 0) {{
+            result = result - i;
+        }}
+    }}
+    return result + limit;
+}}
+""")
+    parts.append("int main() {")
+    parts.append("    int result = 0;")
+    for i in range(min(function_count, 50)):
+        parts.append(f"    result = func{i}(result);")
+    parts.append("    return result;")
+    parts.append("}")
+    return "\n".join(parts) + "\n"
+
+
+# Builds functions with chains of dead assignments across blocks and stores that are overwritten on every path
+# like code left behind after a refactoring
+def generate_dead_program(function_count):
+    parts = ["// Generated dead code benchmark program", ""]
+    for i in range(function_count):
+        parts.append(f"""// Function number {i}
+int func{i}(int a, int b) {{
+    int unused = a * b;
+    int twice = unused + unused;
+    int result = a - b;
+    if (a > b) {{
+        result = a;
+        twice = twice - 1;
+    }} else {{
+        result = b;
+    }}
+    int counter = 0;
+    while (counter < a) {{
+        counter = counter + 1;
+        unused = twice * 2;
+    }}
+    int spare = counter + twice;
+    return result;
+}}
+""")
+    parts.append("int main() {")
+    parts.append("    int result = 0;")
+    for i in range(min(function_count, 50)):
+        parts.append(f"    result = func{i}(result, {i});")
+    parts.append("    return result;")
+    parts.append("}")
+    return "\n".join(parts) + "\n"
+
+
+# Builds functions that compute the same expressions in both arms of an if, after the join and in a loop
+# like code that recomputes an index or a scaled value instead of keeping it in a variable
+def generate_redundant_program(function_count):
+    parts = ["// Generated redundant expression benchmark program", ""]
+    for i in range(function_count):
+        parts.append(f"""// Function number {i}
+int func{i}(int a, int b, int c) {{
+    int x = 0;
+    if (c > a * b) {{
+        x = a * b + c * 2;
+    }} else {{
+        x = a * b - c * 2;
+    }}
+    int y = (a * b + c * 2) / (b + 1) + (a * b + c * 2);
+    int i = 0;
+    while (i < c) {{
+        x = x + a * b + c * 2;
+        i = i + 1;
+    }}
+    return x + y + a * b;
+}}
+""")
+    parts.append("int main() {")
+    parts.append("    int result = 0;")
+    for i in range(min(function_count, 50)):
+        parts.append(f"    result = func{i}(result, {i}, 3);")
+    parts.append("    return result;")
+    parts.append("}")
+    return "\n".join(parts) + "\n"
+
+
+# Builds identifier-heavy code, long names and keywords with few operators
+def generate_identifier_program(statement_count):
+    names = ["alpha", "beta_value", "gamma2", "delta_total", "index", "interval", "format", "charge", "voided", "iffy"]
+    lines = ["int main() {"]
+    for name in names:
+        lines.append(f"    int {name} = 0;")
+    for i in range(statement_count):
+        a, b, c = names[i % 10], names[(i + 3) % 10], names[(i + 7) % 10]
+        lines.append(f"    if ({a} > {b}) {{ {c} = {a} + {b}; }} else {{ {c} = {b}; }}")
+    lines.append("    return alpha;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# Runs func the given number of times and returns the best time in seconds
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+# Turns a token list into comparable tuples
+def token_tuples(tokens):
+    return [(token.type, token.value, token.line, token.column) for token in tokens]
+
+
+# Compares the lexer scanner engines on the same source
+def bench_lexer(source, repeat):
+    results = {}
+    baseline = None
+    for engine in lexer.Lexer.ENGINES:
+        my_lexer = lexer.Lexer(engine)
+        tokens = my_lexer.tokenize(source)
+
+        # Every engine has to produce the exact same token stream
+        if baseline is None:
+            baseline = token_tuples(tokens)
+        elif token_tuples(tokens) != baseline:
+            raise AssertionError(f"Lexer engine '{engine}' produced a different token stream")
+
+        results[engine] = best_time(lambda: my_lexer.tokenize(source), repeat)
+
+    print(f"Lexer: {len(baseline)} tokens, {len(source)} characters")
+    for engine, seconds in results.items():
+        print(f"  {engine:<10} {seconds * 1000:10.2f} ms  {seconds * 1e9 / len(baseline):8.1f} ns/token")
+
+
+# Compares matching keywords with one regex pattern each against the KEYWORDS lookup
+# The pattern version puts the old keyword patterns back in front of the other patterns
+def bench_keywords(source, repeat):
+    source = generate_identifier_program(max(len(source) // 200, 1))
+    keyword_patterns = [(rf'\b{keyword}\b', token_type) for keyword, token_type in lexer.KEYWORDS.items()]
+
+    print(f"Keywords: identifier-heavy program, {len(source)} characters")
+    for engine in lexer.Lexer.ENGINES:
+        lookup_lexer = lexer.Lexer(engine)
+        pattern_lexer = lexer.Lexer(engine)
+        pattern_lexer.token_patterns = keyword_patterns + pattern_lexer.token_patterns
+        pattern_lexer._compile_patterns()
+
+        tokens = lookup_lexer.tokenize(source)
+        if token_tuples(pattern_lexer.tokenize(source)) != token_tuples(tokens):
+            raise AssertionError("Keyword lookup produced a different token stream")
+
+        for name, my_lexer in [("patterns", pattern_lexer), ("lookup", lookup_lexer)]:
+            seconds = best_time(lambda: my_lexer.tokenize(source), repeat)
+            print(f"  {engine:<8} {name:<10} {seconds * 1000:10.2f} ms  {seconds * 1e9 / len(tokens):8.1f} ns/token")
+
+
+# Runs func and returns the peak traced memory in bytes
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Compares building the whole token list with streaming tokens from a file
+def bench_stream(source, repeat):
+    my_lexer = lexer.Lexer()
+
+    def lex_list():
+        for _ in my_lexer.tokenize(source):
+            pass
+
+    def lex_stream():
+        for _ in my_lexer.iter_tokens(io.StringIO(source)):
+            pass
+
+    def parse_list():
+        parser.Parser().parse(my_lexer.tokenize(source))
+
+    def parse_stream():
+        parser.Parser().parse(my_lexer.iter_tokens(io.StringIO(source)))
+
+    print(f"Streaming: {len(source)} characters")
+    for name, func in [("lex list", lex_list), ("lex stream", lex_stream), ("parse list", parse_list), ("parse stream", parse_stream)]:
+        seconds = best_time(func, repeat)
+        peak = peak_memory(func)
+        print(f"  {name:<14} {seconds * 1000:10.2f} ms  peak {peak / 1024:10.1f} KiB")
+
+
+# Runs func and returns the memory still held by its result in bytes
+def retained_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        held = tracemalloc.get_traced_memory()[0]
+        del result
+        return held
+    finally:
+        tracemalloc.stop()
+
+
+# Compares a list of Token objects with the compact TokenBuffer
+def bench_tokens(source, repeat):
+    my_lexer = lexer.Lexer()
+    tokens = my_lexer.tokenize(source)
+    buffer = my_lexer.tokenize_compact(source)
+    if token_tuples(buffer) != token_tuples(tokens):
+        raise AssertionError("TokenBuffer produced a different token stream")
+
+    print(f"Token storage: {len(tokens)} tokens")
+    for name, func in [("list", lambda: my_lexer.tokenize(source)), ("buffer", lambda: my_lexer.tokenize_compact(source))]:
+        seconds = best_time(func, repeat)
+        held = retained_memory(func)
+        print(f"  {name:<10} {seconds * 1000:10.2f} ms  holds {held / 1024:10.1f} KiB  {held / len(tokens):6.1f} bytes/token")
+    seconds = best_time(lambda: parser.Parser().parse(buffer), repeat)
+    print(f"  parse from buffer {seconds * 1000:10.2f} ms")
+
+
+# Turns an AST into nested tuples so trees from different parsers can be compared
+def ast_tuples(node):
+    children = []
+    child = node.down
+    while child is not None:
+        children.append(ast_tuples(child))
+        child = child.right
+    return (str(node.token.type), node.token.value, tuple(children))
+
+
+# Compares the hand-written parser engines with the table-driven LL(1) parser
+def bench_parser(source, repeat):
+    tokens = lexer.Lexer().tokenize(source)
+    parsers = [(engine, lambda engine=engine: parser.Parser(engine)) for engine in parser.Parser.ENGINES]
+    parsers.append(("ll1", ll1Parser.LL1Parser))
+
+    print(f"Parser: {len(tokens)} tokens")
+    baseline = None
+    for name, make_parser in parsers:
+        tree, symbol_table = make_parser().parse(tokens)
+
+        # Every parser has to build the same AST and symbol table
+        symbols = [(scope, [str(entry) for entry in entries.values()]) for scope, entries in symbol_table.scopes.items()]
+        result = (ast_tuples(tree), symbols)
+        if baseline is None:
+            baseline = result
+        elif result != baseline:
+            raise AssertionError(f"Parser '{name}' built a different AST or symbol table")
+
+        seconds = best_time(lambda: make_parser().parse(tokens), repeat)
+        print(f"  {name:<10} {seconds * 1000:10.2f} ms  {seconds * 1e9 / len(tokens):8.1f} ns/token")
+
+
+# Builds a program with one function that has the given number of statements
+def generate_long_function(statement_count):
+    lines = ["int main() {", "    int x = 0;"]
+    for i in range(statement_count):
+        lines.append(f"    x = x + {i % 100};")
+    lines.append("    return x;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# Appends children by walking the sibling chain like AST.add_child used to
+def chain_add_child(node, child_node):
+    t = node.down
+    if t is None:
+        node.down = child_node
+    else:
+        while t.right is not None:
+            t = t.right
+        t.right = child_node
+
+
+# Finds the nth child by walking the sibling chain like TAC.get_nth_child used to
+def chain_nth_child(node, n):
+    current = node.down
+    for _ in range(n):
+        if current is None:
+            return None
+        current = current.right
+    return current
+
+
+# Compares the AST child list with walking the sibling chain on a function with many statements
+# The sibling chain is quadratic so it is only timed on the first chain_limit statements
+def bench_ast(source, repeat, statement_count=50000, chain_limit=5000):
+    source = generate_long_function(statement_count)
+    tokens = lexer.Lexer().tokenize(source)
+    tree, symbol_table = parser.Parser().parse(tokens)
+    stmt_list = tree.get_child(0).get_child(0)
+    statements = stmt_list.children
+    token = Token(TokenType.PARSING_TOKEN, "StmtList", None, None)
+
+    def list_append(count):
+        node = AST.AST(token)
+        for child in statements[:count]:
+            node.add_child(AST.AST(child.token))
+
+    def chain_append(count):
+        node = AST.AST(token)
+        for child in statements[:count]:
+            chain_add_child(node, AST.AST(child.token))
+
+    def list_index(count):
+        for n in range(count):
+            stmt_list.get_child(n)
+
+    def chain_index(count):
+        for n in range(count):
+            chain_nth_child(stmt_list, n)
+
+    def generate_tac():
+        TAC.TAC(symbol_table).generate_TAC(tree)
+
+    chain_count = min(chain_limit, len(statements))
+    print(f"AST: function with {len(statements)} statements")
+    for name, func, count in [("append list", list_append, len(statements)), ("append chain", chain_append, chain_count),
+                              ("index list", list_index, len(statements)), ("index chain", chain_index, chain_count)]:
+        seconds = best_time(lambda: func(count), repeat)
+        print(f"  {name:<14} {count:>7} children {seconds * 1000:10.2f} ms  {seconds * 1e9 / count:10.1f} ns/child")
+    for name, func in [("parse", lambda: parser.Parser().parse(tokens)), ("TAC", generate_tac)]:
+        seconds = best_time(func, repeat)
+        print(f"  {name:<14} {seconds * 1000:10.2f} ms")
+
+
+# Counts the nodes of an AST.AST tree in preorder with an explicit stack
+def count_nodes(root):
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(reversed(node.children))
+    return count
+
+
+# Compares AST.AST objects with the array-backed ASTArena
+def bench_arena(source, repeat):
+    tokens = lexer.Lexer().tokenize(source)
+    tree, symbol_table = parser.Parser().parse(tokens)
+    arena_parser = parser.Parser(arena=True)
+    arena_root, arena_symbol_table = arena_parser.parse(tokens)
+    arena = arena_parser.arena
+    if ast_tuples(arena_root) != ast_tuples(tree):
+        raise AssertionError("Arena built a different AST")
+
+    node_count = len(arena)
+    print(f"AST arena: {node_count} nodes")
+    # The symbol table is the same for both so it is taken out of what the tree holds
+    for name, use_arena in [("objects", False), ("arena", True)]:
+        seconds = best_time(lambda: parser.Parser(arena=use_arena).parse(tokens), repeat)
+        held = retained_memory(lambda: parser.Parser(arena=use_arena).parse(tokens))
+        held -= retained_memory(lambda: parser.Parser(arena=use_arena).parse(tokens)[1])
+        print(f"  parse {name:<10} {seconds * 1000:10.2f} ms  holds {held / 1024:10.1f} KiB  {held / node_count:6.1f} bytes/node")
+
+    def walk_objects():
+        count_nodes(tree)
+
+    def walk_arena():
+        for _ in arena.walk(arena_root.handle):
+            pass
+
+    for name, func in [("walk objects", walk_objects), ("walk arena", walk_arena),
+                       ("TAC objects", lambda: TAC.TAC(symbol_table).generate_TAC(tree)),
+                       ("TAC arena", lambda: TAC.TAC(arena_symbol_table).generate_TAC(arena_root))]:
+        seconds = best_time(func, repeat)
+        print(f"  {name:<16} {seconds * 1000:10.2f} ms  {seconds * 1e9 / node_count:8.1f} ns/node")
+
+
+# Times every optimization pass and the assembler on the TAC of the program
+def bench_optimize(source, repeat):
+    tree, symbol_table = parser.Parser().parse(lexer.Lexer().tokenize(source))
+    generator = TAC.TAC(symbol_table)
+    generator.generate_TAC(tree)
+    instructions = generator.instructions
+    count = len(instructions)
+
+    print(f"Optimize: {count} instructions")
+    for name, func in [("temp remover", lambda: tempVariableRemoverOptimization.tempVarRemover(list(instructions)).optimize()),
+                       ("algebraic", lambda: algebraicSimplificationOptimization.AlgebraicSimplificationOptimization(instructions).optimize()),
+                       ("constant fold", lambda: constantFoldingOptimization.ConstantFoldingOptimization(instructions).optimize()),
+                       ("propagation", lambda: candcPropagation.CandCPropagation(instructions).optimize()),
+                       ("value numbers", lambda: localValueNumbering.LocalValueNumbering(instructions, symbol_table).optimize()),
+                       ("dead code", lambda: easyDeadCodeElimination.EasyDeadCodeElimination(instructions).optimize()),
+                       ("O2 pipeline", lambda: passManager.standard_pass_manager(symbol_table).run("O2", instructions)),
+                       ("assemble", lambda: assembler.assembler(symbol_table).assemble(instructions))]:
+        seconds = best_time(func, repeat)
+        print(f"  {name:<14} {seconds * 1000:10.2f} ms  {seconds * 1e9 / count:8.1f} ns/instruction")
+
+
+# Compares parsing to an AST and then generating TAC with emitting TAC while parsing
+def bench_fused(source, repeat):
+    tokens = lexer.Lexer().tokenize(source)
+
+    def ast_then_tac():
+        tree, symbol_table = parser.Parser().parse(tokens)
+        generator = TAC.TAC(symbol_table)
+        generator.generate_TAC(tree)
+        return generator.instructions
+
+    def fused():
+        return tacParser.TACParser().parse(tokens)[0]
+
+    if [str(instr) for instr in ast_then_tac()] != [str(instr) for instr in fused()]:
+        raise AssertionError("Fused parsing produced different TAC")
+
+    print(f"Fused: {len(tokens)} tokens")
+    for name, func in [("AST + TAC", ast_then_tac), ("fused", fused)]:
+        seconds = best_time(func, repeat)
+        peak = peak_memory(func)
+        print(f"  {name:<14} {seconds * 1000:10.2f} ms  peak {peak / 1024:10.1f} KiB")
+
+
+# Compares constant propagation inside blocks with sparse conditional constant propagation across them
+# by the instructions left, on the program and on a generated program full of constants
+def bench_sccp(source, repeat):
+    pipelines = [("local", [("propagate", "fold", "dce")]), ("sccp", [("sccp", "dce")]), ("O2", None), ("O3", None)]
+    for name, program in [("program", source), ("constants", generate_constant_program(200))]:
+        tree, symbol_table = parser.Parser().parse(lexer.Lexer().tokenize(program))
+        generator = TAC.TAC(symbol_table)
+        generator.generate_TAC(tree)
+        instructions = generator.instructions
+        print(f"SCCP on {name}: {len(instructions)} instructions")
+        for pipeline, steps in pipelines:
+            def run():
+                manager = passManager.standard_pass_manager(symbol_table)
+                if steps is not None:
+                    manager.add_pipeline(pipeline, steps)
+                return manager.run(pipeline, instructions)
+            seconds = best_time(run, repeat)
+            print(f"  {pipeline:<14} {seconds * 1000:10.2f} ms  {len(run()):8d} left")
+
+
+# Compares dead code elimination by names used anywhere with the one by liveness across blocks,
+# by themselves and in the O2 pipeline, on the program and on a generated program full of dead code
+def bench_dce(source, repeat):
+    pipelines = [("dce", [("dce",)]), ("liveness", ["liveness"]),
+                 ("O2 with dce", ["temp", ("algebraic", "fold", "propagate", "dce")]), ("O2", None)]
+    for name, program in [("program", source), ("dead code", generate_dead_program(200))]:
+        tree, symbol_table = parser.Parser().parse(lexer.Lexer().tokenize(program))
+        generator = TAC.TAC(symbol_table)
+        generator.generate_TAC(tree)
+        instructions = generator.instructions
+        print(f"DCE on {name}: {len(instructions)} instructions")
+        for pipeline, steps in pipelines:
+            def run():
+                manager = passManager.standard_pass_manager(symbol_table)
+                if steps is not None:
+                    manager.add_pipeline(pipeline, steps)
+                return manager.run(pipeline, instructions)
+            seconds = best_time(run, repeat)
+            print(f"  {pipeline:<14} {seconds * 1000:10.2f} ms  {len(run()):8d} left")
+
+
+# Compares no common subexpression elimination, local value numbering and global CSE in the O3 pipeline by time,
+# instructions left and arithmetic left, on every test file that compiles, the program and a program full of
+# redundant expressions
+def bench_cse(source, repeat):
+    pipelines = [("no cse", ["temp", ("sccp", "algebraic", "fold", "propagate", "liveness")]),
+                 ("lvn", ["temp", ("sccp", "lvn", "algebraic", "fold", "propagate", "liveness")]), ("O3", None)]
+
+    def tac_of(program):
+        tree, symbol_table = parser.Parser().parse(lexer.Lexer().tokenize(program))
+        generator = TAC.TAC(symbol_table)
+        generator.generate_TAC(tree)
+        return generator.instructions, symbol_table
+
+    test_files = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_files")
+    test_programs = []
+    for name in sorted(os.listdir(test_files)):
+        with open(os.path.join(test_files, name), 'r') as f:
+            try:
+                test_programs.append(tac_of(f.read()))
+            except (Errors.LexerError, Errors.ParsingError):
+                pass
+
+    for name, programs in [("test_files", test_programs), ("program", [tac_of(source)]),
+                           ("redundant", [tac_of(generate_redundant_program(200))])]:
+        print(f"CSE on {name}: {sum(len(instructions) for instructions, _ in programs)} instructions")
+        for pipeline, steps in pipelines:
+            def run():
+                results = []
+                for instructions, symbol_table in programs:
+                    manager = passManager.standard_pass_manager(symbol_table)
+                    if steps is not None:
+                        manager.add_pipeline(pipeline, steps)
+                    results.append(manager.run(pipeline, instructions))
+                return results
+            seconds = best_time(run, repeat)
+            results = run()
+            left = sum(len(result) for result in results)
+            arithmetic = sum(1 for result in results for instr in result if instr.opcode in instruction.BINARY)
+            print(f"  {pipeline:<14} {seconds * 1000:10.2f} ms  {left:8d} left  {arithmetic:8d} arithmetic")
+
+
+BENCHMARKS = {
+    "lexer": bench_lexer,
+    "keywords": bench_keywords,
+    "stream": bench_stream,
+    "tokens": bench_tokens,
+    "parser": bench_parser,
+    "ast": bench_ast,
+    "arena": bench_arena,
+    "optimize": bench_optimize,
+    "fused": bench_fused,
+    "sccp": bench_sccp,
+    "dce": bench_dce,
+    "cse": bench_cse,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmarks for Beau\'s C compiler')
+    arg_parser.add_argument('benchmark', nargs='*', help=f'Benchmarks to run: {", ".join(BENCHMARKS)} (default all)')
+    arg_parser.add_argument('-f', '--functions', type=int, default=2000, help='Number of functions in the generated program')
+    arg_parser.add_argument('-i', '--input_file', help='Benchmark on this source file instead of a generated program')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of runs, the best time is reported')
+    args = arg_parser.parse_args()
+    for name in args.benchmark:
+        if name not in BENCHMARKS:
+            arg_parser.error(f"unknown benchmark '{name}'")
+
+    if args.input_file:
+        with open(args.input_file, 'r') as f:
+            source = f.read()
+    else:
+        source = generate_program(args.functions)
+
+    for name in args.benchmark or BENCHMARKS:
+        BENCHMARKS[name](source, args.repeat)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,43 +1,86 @@
-from instruction import Instruction
+from instruction import Instruction, Opcode
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
 
+# Constant and copy propagation inside a block
+# Known values are kept by symbol id, a new value for a symbol forgets what was known about it and the copies of it
+# A call can change globals so they are forgotten at calls, without the symbol table everything is
+# Only instructions that get a new operand are replaced in the InstructionList, modified is True if any were
 class CandCPropagation:
-    def __init__(self, instructions):
-        self.instructions = instructions
+    def __init__(self, instructions, symbol_table=None):
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
+        self.global_ids = None
+        if symbol_table is not None:
+            self.global_ids = symbol_table.global_ids()
 
     def optimize(self):
         constant_values = {}
-        optimized_instructions = []
 
-        for instr in self.instructions:
-            if instr.operator == '=' and instr.arg2 is None:
-                if instr.arg1 in constant_values:
+        # Ids of the symbols whose known value is a copy of a symbol, by the id of that symbol
+        copies_of = {}
 
-                    new_value = constant_values[instr.arg1]
-                    constant_values[instr.result] = new_value
+        # Value known for an operand or the operand itself, a tuple is only copied if an argument changed
+        def propagate(value):
+            if isinstance(value, Symbol):
+                return constant_values.get(value.id, value)
+            if type(value) is tuple:
+                args = tuple(propagate(arg) for arg in value)
+                return value if all(new is old for new, old in zip(args, value)) else args
+            return value
 
-                    optimized_instructions.append(Instruction(operator='=', arg1=new_value, arg2=None, result=instr.result))
-                else:
+        # A symbol got a new value, what was known about it and the copies of its old value are gone
+        def forget(symbol):
+            constant_values.pop(symbol.id, None)
+            for copy_id in copies_of.pop(symbol.id, ()):
+                constant_values.pop(copy_id, None)
 
-                    constant_values[instr.result] = instr.arg1
-                    optimized_instructions.append(instr)
+        def remember(symbol, value):
+            constant_values[symbol.id] = value
+            if isinstance(value, Symbol):
+                copies_of.setdefault(value.id, set()).add(symbol.id)
 
-            elif instr.label is not None:
+        for node in self.instructions.nodes():
+            instr = node.instr
+            opcode = instr.opcode
+            if opcode is Opcode.COPY:
+                new_value = propagate(instr.arg1)
+                forget(instr.result)
+
+                # A copy that would not change, like x = y after y = y, is left alone so modified stays False
+                if new_value is not instr.arg1:
+                    self.instructions.replace(node, Instruction(Opcode.COPY, arg1=new_value, result=instr.result))
+                    self.modified = True
+
+                # x = x tells nothing new
+                if new_value is not instr.result:
+                    remember(instr.result, new_value)
+
+            elif opcode is Opcode.LABEL or opcode is Opcode.FUNCTION:
 
                 # Create fresh scope on a new block
-                optimized_instructions.append(instr)
                 constant_values = {}
+                copies_of = {}
 
             else:
-                if instr.arg1 in constant_values:
-                    arg1 = constant_values[instr.arg1]
-                else:
-                    arg1 = instr.arg1
+                arg1 = propagate(instr.arg1)
+                arg2 = propagate(instr.arg2)
 
-                if instr.arg2 in constant_values:
-                    arg2 = constant_values[instr.arg2]
-                else:
-                    arg2 = instr.arg2
+                if arg1 is not instr.arg1 or arg2 is not instr.arg2:
+                    self.instructions.replace(node, Instruction(opcode, arg1=arg1, arg2=arg2, result=instr.result))
+                    self.modified = True
 
-                optimized_instructions.append(Instruction(operator=instr.operator, arg1=arg1, arg2=arg2, result=instr.result))
+                if isinstance(instr.result, Symbol):
+                    forget(instr.result)
+                if opcode is Opcode.CALL:
+                    if self.global_ids is None:
+                        constant_values = {}
+                        copies_of = {}
+                    else:
+                        for symbol_id in self.global_ids & constant_values.keys():
+                            constant_values.pop(symbol_id)
+                        for symbol_id in self.global_ids & copies_of.keys():
+                            for copy_id in copies_of.pop(symbol_id):
+                                constant_values.pop(copy_id, None)
 
-        return optimized_instructions
\ No newline at end of file
+        return self.instructions
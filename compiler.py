@@ -1,32 +1,41 @@
 import sys
 import os
+import json
+import hashlib
 import argparse
+import concurrent.futures
 import lexer
 import parser
+import ll1Parser
+import tacParser
 import TAC
 import AST
 import SymbolTable
 from Errors import LexerError
 from Errors import ParsingError
-import constantFoldingOptimization
-import tempVariableRemoverOptimization
+from Errors import CodeGenerationError
+import passManager
 import algebraicSimplificationOptimization
 import candcPropagation
-import easyDeadCodeElimination as eas
 import assembler
+import moduleInterface
+import ssaForm
 
 
 # Sets up and runs the lexer
-# input: source code as string
-def run_lexer(source_code):
+# input: source code as string, name of the scanner engine to use, whether to store tokens in a TokenBuffer
+def run_lexer(source_code, engine="master", compact=False):
     
     # Tries to run lexer
     try:
         
         # Initialize and run lexer
-        # Returns list of token objects
-        my_lexer = lexer.Lexer()
-        tokens = my_lexer.tokenize(source_code)
+        # Returns list of token objects or a compact token buffer
+        my_lexer = lexer.Lexer(engine)
+        if compact:
+            tokens = my_lexer.tokenize_compact(source_code)
+        else:
+            tokens = my_lexer.tokenize(source_code)
         
         return tokens
     
@@ -41,16 +50,30 @@ def run_lexer(source_code):
         return None
 
 # Set up and run the parser
-# input: list of tokens
-def run_parser(tokens):
+# input: list of tokens or a token iterator from Lexer.iter_tokens, name of the parser engine to use,
+#        whether to keep parsing after errors and report all of them, whether to build the AST in an arena
+# The fused engine emits TAC while parsing and returns the TAC instructions in place of the AST
+def run_parser(tokens, engine="recursive", recover=False, arena=False):
 
     try:
 
         # Initialize and run parser
         # Returns AST 
-        my_parser = parser.Parser()
+        if engine == "ll1":
+            my_parser = ll1Parser.LL1Parser(arena=arena)
+        elif engine == "fused":
+            my_parser = tacParser.TACParser(recover)
+        else:
+            my_parser = parser.Parser(engine, recover, arena)
         AST, my_symbol_table = my_parser.parse(tokens)
 
+        # Report every error found in recovery mode
+        if recover and my_parser.errors:
+            for error in my_parser.errors:
+                print(error)
+            print(f"{len(my_parser.errors)} parsing error(s)")
+            return None
+
         return AST, my_symbol_table
 
     # Handle parsing errors
@@ -58,56 +81,205 @@ def run_parser(tokens):
         print(e)
         return None
 
+    # Handle lexer errors from a token stream that is scanned while parsing
+    except LexerError as e:
+        print(e)
+        return None
+
     # Handle other errors
     except Exception as e:
         print(f"Error during parsing: {e}")
         return None
 
+# Scans one file of a project for its interface
+# Returns (interface, error message) where interface is None if the file could not be scanned
+def scan_unit(source_path):
+    with open(source_path, 'r') as f:
+        source_code = f.read()
+    hash = moduleInterface.source_hash(source_code)
+    try:
+        tokens = lexer.Lexer().tokenize(source_code)
+        table = moduleInterface.scan_interface(tokens)
+    except (LexerError, ParsingError) as e:
+        return None, str(e)
+    interface = {"source": hash}
+    interface.update(table.export_interface())
+    return interface, None
+
+# Compiles one file of a project to assembly after importing the interfaces of the other files
+# The first line of the output is the build key so the file is only compiled again when it changes
+# Returns an error message or None
+def compile_unit(source_path, imports, build_key, output_path):
+    with open(source_path, 'r') as f:
+        source_code = f.read()
+    try:
+        tokens = lexer.Lexer().tokenize(source_code)
+
+        # Files are not optimized so TAC is emitted while parsing without building the AST
+        my_parser = tacParser.TACParser()
+        for exports in imports:
+            my_parser.symbol_table.import_interface(exports)
+        tac_instructions, my_symbol_table = my_parser.parse(tokens)
+        assembly_code = assembler.assembler(my_symbol_table).assemble(tac_instructions)
+    except (LexerError, ParsingError, CodeGenerationError) as e:
+        return str(e)
+
+    with open(output_path, 'w') as f:
+        f.write(f"; build {build_key}\n")
+        for instr in assembly_code:
+            f.write(f"{instr}\n")
+    return None
+
+# Returns the build key in the first line of an output file or None
+def read_build_key(output_path):
+    try:
+        with open(output_path, 'r') as f:
+            first_line = f.readline()
+    except OSError:
+        return None
+    if not first_line.startswith("; build "):
+        return None
+    return first_line[len("; build "):].strip()
+
+# Compiles several files separately, each one only sees the interfaces of the others
+# Interfaces and assembly go in build_dir, files whose source and imported interfaces did not change are skipped
+# Runs up to jobs files at a time in separate processes
+# Returns True if every file compiled
+def build_project(source_paths, build_dir, jobs):
+    os.makedirs(build_dir, exist_ok=True)
+    names = [os.path.splitext(os.path.basename(path))[0] for path in source_paths]
+    for name in names:
+        if names.count(name) > 1:
+            print(f"Error: More than one input file is named {name}")
+            return False
+
+    # Interfaces are only scanned again for files whose source changed
+    interfaces = {}
+    to_scan = []
+    for path in source_paths:
+        with open(path, 'r') as f:
+            hash = moduleInterface.source_hash(f.read())
+        interface = moduleInterface.read_interface(moduleInterface.interface_path(build_dir, path))
+        if interface is not None and interface["source"] == hash:
+            interfaces[path] = interface
+        else:
+            to_scan.append(path)
+
+    executor = concurrent.futures.ProcessPoolExecutor(jobs) if jobs > 1 else None
+    try:
+        run = executor.map if executor else map
+        success = True
+        for path, (interface, error) in zip(to_scan, run(scan_unit, to_scan)):
+            if error is not None:
+                print(f"{path}: {error}")
+                success = False
+                continue
+            moduleInterface.write_interface(moduleInterface.interface_path(build_dir, path), interface["source"], moduleInterface.exports_of(interface))
+            interfaces[path] = interface
+        if not success:
+            return False
+
+        # A file is compiled again when its source or any interface it imports changed
+        jobs_to_run = []
+        for path, name in zip(source_paths, names):
+            imports = [moduleInterface.exports_of(interfaces[other]) for other in source_paths if other != path]
+            build_key = hashlib.sha256((interfaces[path]["source"] + json.dumps(imports)).encode()).hexdigest()
+            output_path = os.path.join(build_dir, name + ".s")
+            if read_build_key(output_path) == build_key:
+                print(f"Up to date: {path}")
+            else:
+                jobs_to_run.append((path, imports, build_key, output_path))
+
+        errors = run(compile_unit, *zip(*jobs_to_run)) if jobs_to_run else []
+        for (path, _, _, output_path), error in zip(jobs_to_run, errors):
+            if error is not None:
+                print(f"{path}: {error}")
+                success = False
+            else:
+                print(f"Compiled: {path} -> {output_path}")
+        return success
+    finally:
+        if executor:
+            executor.shutdown()
+
 # Main function to handle command-line arguments and run all compiler parts
 # To run compiler: python3 compiler.py [options] <input_file>
+# To compile several files separately: python3 compiler.py [--build-dir dir] [-j jobs] <input_file> <input_file> ...
 def main():
 
     # Command-line arguments for actually running the compiler
     arg_parser = argparse.ArgumentParser(description='Compiler for Beau\'s C language')
-    arg_parser.add_argument('input_file', help='Input source code file')
+    arg_parser.add_argument('input_files', nargs='+', metavar='input_file', help='Input source code file, several files are compiled separately into --build-dir')
     arg_parser.add_argument('-l', '--lexer', action='store_true', help='Print lexer output tokens')
     arg_parser.add_argument('-p', '--parser', action='store_true', help='Print parser output AST and symbol table')
     arg_parser.add_argument('-t', '--tac', action='store_true', help='Print TAC output')
     arg_parser.add_argument('-o1', '--opt1', action='store_true', help='Enable optimization 1')
     arg_parser.add_argument('-o2', '--opt2', action='store_true', help='Enable optimization 2')
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=(1, 2, 3), help='Run the O1, O2 or O3 optimization pipeline (-O1, -O2, -O3)')
+    arg_parser.add_argument('--max-iterations', type=int, default=None, help='Most times a pass runs while optimizing to a fixed point, no limit by default')
     arg_parser.add_argument('-c', '--candc', action='store_true', help='Enable constant and copy propagation optimization')
     arg_parser.add_argument('-a', '--algebraic', action='store_true', help='Enable algebraic simplification optimization')
     arg_parser.add_argument('-b', '--basicblocks', action='store_true', help='Print basic blocks generated from TAC')
+    arg_parser.add_argument('--ssa', action='store_true', help='Convert TAC to SSA form and back before generating assembly, printing both')
     arg_parser.add_argument('-x', '--assemble', action='store_true', help='Generate assembly code from TAC')
+    arg_parser.add_argument('-s', '--stream', action='store_true', help='Stream tokens from the file into the parser instead of building the token list first')
+    arg_parser.add_argument('-k', '--compact', action='store_true', help='Store tokens in a compact array-backed token buffer')
+    arg_parser.add_argument('-r', '--recover', action='store_true', help='Keep parsing after errors and report all of them')
+    arg_parser.add_argument('--arena', action='store_true', help='Store the AST in compact parallel arrays')
+    arg_parser.add_argument('--lexer-engine', choices=lexer.Lexer.ENGINES, default="master", help='Scanner used by the lexer')
+    arg_parser.add_argument('--parser-engine', choices=parser.Parser.ENGINES + ("ll1", "fused"), default="recursive", help='How the parser handles nested statements, ll1 uses the table-driven parser, fused emits TAC while parsing without building the AST')
+    arg_parser.add_argument('--build-dir', help='Directory for the interface files and assembly of separately compiled files (default: build)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Number of files compiled at the same time')
     args = arg_parser.parse_args()
+    if args.recover and args.parser_engine == "ll1":
+        arg_parser.error("--recover is not supported by the ll1 parser engine")
+    if args.parser_engine == "fused" and (args.parser or args.arena):
+        arg_parser.error("the fused parser engine builds no AST, -p and --arena need one")
     
-    # See if input file exists
-    if not os.path.exists(args.input_file):
-        print(f"Error: Input file '{args.input_file}' not found")
+    # See if input files exist
+    for input_file in args.input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: Input file '{input_file}' not found")
+            return
+
+    # Separate compilation of a project
+    if len(args.input_files) > 1 or args.build_dir:
+        if not build_project(args.input_files, args.build_dir or "build", max(args.jobs, 1)):
+            sys.exit(1)
         return
+    args.input_file = args.input_files[0]
 
-    # Read source code
-    with open(args.input_file, 'r') as f:
-        source_code = f.read()
+    # Stream tokens straight from the file into the parser
+    # Printing the tokens needs the whole list so -l always uses the normal path
+    if args.stream and not args.lexer:
+        with open(args.input_file, 'r') as f:
+            tokens = lexer.Lexer(args.lexer_engine).iter_tokens(f)
+            parser_result = run_parser(tokens, args.parser_engine, args.recover, args.arena)
+    else:
+        # Read source code
+        with open(args.input_file, 'r') as f:
+            source_code = f.read()
 
-    # Run lexer
-    tokens = run_lexer(source_code)
-    if tokens == None:
-        sys.exit(1)
-    if args.lexer:
-        print(f"Running lexer on: {args.input_file}")
-        print("Tokens:")
-        for token in tokens:
-            print(token)
-        print()
+        # Run lexer
+        tokens = run_lexer(source_code, args.lexer_engine, args.compact)
+        if tokens == None:
+            sys.exit(1)
+        if args.lexer:
+            print(f"Running lexer on: {args.input_file}")
+            print("Tokens:")
+            for token in tokens:
+                print(token)
+            print()
 
 
 
-    # Run parser
-    parser_result = run_parser(tokens)
+        # Run parser
+        parser_result = run_parser(tokens, args.parser_engine, args.recover, args.arena)
     if parser_result == None:
         sys.exit(1)
     AST, my_symbol_table = parser_result
+    if args.parser_engine == "fused":
+        tac_instructions = AST
     if args.parser:
         print("Running parser on output tokens")
         print("AST:")
@@ -118,23 +290,24 @@ def main():
         my_symbol_table.print_table()
         print()
 
-    # Run TAC generation
-    Three_Address_Code = TAC.TAC(my_symbol_table)
-    Three_Address_Code.generate_TAC(AST)
+    # Run TAC generation, the fused engine already made the TAC
+    if args.parser_engine != "fused":
+        Three_Address_Code = TAC.TAC(my_symbol_table)
+        Three_Address_Code.generate_TAC(AST)
+        tac_instructions = Three_Address_Code.instructions
     optimized_instructions = None
     if args.tac:
         print("Three Address Code (TAC):")
-        for instr in Three_Address_Code.instructions:
+        for instr in tac_instructions:
             print(instr)
         print()
 
     # Run optimizations if enabled
+    # -o1 and -o2 are the O1 and O2 pipelines of the pass manager, -O picks any of them
+    pass_manager = passManager.standard_pass_manager(my_symbol_table, args.max_iterations)
     if args.opt1:
         print("Running optimization 1 on TAC")
-        CF = constantFoldingOptimization.ConstantFoldingOptimization(Three_Address_Code.instructions)
-        optimized_instructions = CF.optimize()
-        tVR = tempVariableRemoverOptimization.tempVarRemover(optimized_instructions)
-        optimized_instructions = tVR.optimize()
+        optimized_instructions = pass_manager.run("O1", tac_instructions)
         print("Three Address Code (TAC):")
         for instr in optimized_instructions:
             print(instr)
@@ -142,36 +315,27 @@ def main():
 
     if args.opt2:
         print("Running optimization 2 on TAC")
-        optimized_instructions = Three_Address_Code.instructions
-        tVR = tempVariableRemoverOptimization.tempVarRemover(optimized_instructions)
-        optimized_instructions = tVR.optimize()  
-        while True:
-            previous_tac = [str(instr) for instr in optimized_instructions]
-            
-            ASO = algebraicSimplificationOptimization.AlgebraicSimplificationOptimization(optimized_instructions)
-            optimized_instructions = ASO.optimize()
-            CF = constantFoldingOptimization.ConstantFoldingOptimization(optimized_instructions)
-            optimized_instructions = CF.optimize()
-            CP = candcPropagation.CandCPropagation(optimized_instructions)
-            optimized_instructions = CP.optimize()
-            EDC = eas.EasyDeadCodeElimination(optimized_instructions)
-            optimized_instructions = EDC.optimize()
-
-            # Break if no changes were made
-            current_tac = [str(instr) for instr in optimized_instructions]
-            if current_tac == previous_tac:
-                break
-        
+        optimized_instructions = pass_manager.run("O2", tac_instructions)
+        print("Three Address Code (TAC):")
+        for instr in optimized_instructions:
+            print(instr)
+        print()
 
-              
+    if args.opt_level:
+        print(f"Running O{args.opt_level} pipeline on TAC")
+        optimized_instructions = pass_manager.run(f"O{args.opt_level}", tac_instructions)
         print("Three Address Code (TAC):")
         for instr in optimized_instructions:
             print(instr)
         print()
 
+    if pass_manager.capped:
+        print(f"Warning: optimization stopped after a pass ran {args.max_iterations} times without reaching a fixed point")
+        print()
+
     if args.candc:
         print("Running constant and copy propagation optimization on TAC")
-        CP = candcPropagation.CandCPropagation(Three_Address_Code.instructions)
+        CP = candcPropagation.CandCPropagation(tac_instructions, my_symbol_table)
         optimized_instructions = CP.optimize()
         print("Three Address Code (TAC):")
         for instr in optimized_instructions:
@@ -180,19 +344,41 @@ def main():
 
     if args.algebraic:
         print("Running algebraic simplification optimization on TAC")
-        ASO = algebraicSimplificationOptimization.AlgebraicSimplificationOptimization(Three_Address_Code.instructions)
+        ASO = algebraicSimplificationOptimization.AlgebraicSimplificationOptimization(tac_instructions)
         optimized_instructions = ASO.optimize()
         print("Three Address Code (TAC):")
         for instr in optimized_instructions:
             print(instr)
         print()
 
+    # The assembler and SSA index the instructions so they get a list
     if optimized_instructions is not None:
-            optimized_instructions = optimized_instructions
+            optimized_instructions = list(optimized_instructions)
     else:
-            optimized_instructions = Three_Address_Code.instructions
+            optimized_instructions = tac_instructions
+
+    if args.ssa:
+        print("Converting TAC to SSA form")
+        ssa = ssaForm.SSAForm(my_symbol_table)
+        global_instructions, functions = ssa.construct(optimized_instructions)
+        print("Static Single Assignment form (SSA):")
+        for instr in global_instructions:
+            print(instr)
+        for function in functions:
+            for instr in function.instructions():
+                print(instr)
+        print()
+        optimized_instructions = ssa.destruct(global_instructions, functions)
+        print("Three Address Code (TAC) out of SSA form:")
+        for instr in optimized_instructions:
+            print(instr)
+        print()
     asm_instructions = assembler.assembler(my_symbol_table)
-    assembly_code = asm_instructions.assemble(optimized_instructions)
+    try:
+        assembly_code = asm_instructions.assemble(optimized_instructions)
+    except CodeGenerationError as e:
+        print(e)
+        sys.exit(1)
     if args.assemble:
 
         print("Assembly Code:")
@@ -1,58 +1,59 @@
-from instruction import Instruction
+from instruction import Instruction, Opcode, Const
+from instructionList import as_instruction_list
 
+# Value of arg1 op arg2 for two constant values the way the generated code computes it, or None if it can't be folded
+# Integers are 64 bit and divide toward zero like idiv, comparisons are 1 or 0
+# Division by zero is left for the program to do when it runs
+def fold(opcode, num1, num2):
+    if opcode is Opcode.ADD:
+        result = num1 + num2
+    elif opcode is Opcode.SUB:
+        result = num1 - num2
+    elif opcode is Opcode.MUL:
+        result = num1 * num2
+    elif opcode is Opcode.DIV:
+        if num2 == 0:
+            return None
+        if isinstance(num1, int) and isinstance(num2, int):
+            result = abs(num1) // abs(num2)
+            if (num1 < 0) != (num2 < 0):
+                result = -result
+        else:
+            result = num1 / num2
+    elif opcode is Opcode.LT:
+        return int(num1 < num2)
+    elif opcode is Opcode.GT:
+        return int(num1 > num2)
+    elif opcode is Opcode.EQ:
+        return int(num1 == num2)
+    elif opcode is Opcode.NE:
+        return int(num1 != num2)
+    else:
+        return None
+    if isinstance(result, int):
+        result = (result + 2**63) % 2**64 - 2**63
+    return result
+
+# Folds arithmetic on two constants into a copy of the result
+# Constants were parsed when TAC was made so this only looks at operand types
+# Folded instructions are replaced in the InstructionList, modified is True if any were
 class ConstantFoldingOptimization:
     def __init__(self, instructions):
-        self.instructions = instructions
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
 
     def is_numeric(self, value):
-        # First check if it's already a number
-        if isinstance(value, (int, float)):
-            return True
-        # Then check if it's a numeric string
-        if isinstance(value, str):
-            try:
-                if '.' in value:
-                    float(value)
-                    return True
-                else:
-                    int(value)
-                    return True
-            except ValueError:
-                return False
-        return False
-    
-    def get_numeric_value(self, value):
-        if isinstance(value, (int, float)):
-            return value
-        if isinstance(value, str):
-            if '.' in value:
-                return float(value)
-            else:
-                return int(value)
-        return None
+        return type(value) is Const and value.is_numeric()
 
     def optimize(self):
-        optimized_instructions = []
-        for instr in self.instructions:
-            if (instr.operator in ('+', '-', '*', '/') and 
+        for node in self.instructions.nodes():
+            instr = node.instr
+            opcode = instr.opcode
+            if (opcode in (Opcode.ADD, Opcode.SUB, Opcode.MUL, Opcode.DIV) and
                 self.is_numeric(instr.arg1) and self.is_numeric(instr.arg2)):
                 
-                num1 = self.get_numeric_value(instr.arg1)
-                num2 = self.get_numeric_value(instr.arg2)
-                
-                if instr.operator == '+':
-                    result = num1 + num2
-                elif instr.operator == '-':
-                    result = num1 - num2
-                elif instr.operator == '*':
-                    result = num1 * num2
-                elif instr.operator == '/':
-                    if isinstance(num1, int) and isinstance(num2, int) and num1 % num2 == 0:
-                        result = num1 // num2
-                    else:
-                        result = num1 / num2
-                    
-                optimized_instructions.append(Instruction(operator='=', arg1=result, arg2=None, result=instr.result))
-            else:
-                optimized_instructions.append(instr)
-        return optimized_instructions
\ No newline at end of file
+                result = fold(opcode, instr.arg1.value, instr.arg2.value)
+                if result is not None:
+                    self.instructions.replace(node, Instruction(Opcode.COPY, arg1=Const(result), result=instr.result))
+                    self.modified = True
+        return self.instructions
@@ -0,0 +1,271 @@
+# https://en.wikipedia.org/wiki/Thompson%27s_construction
+# https://en.wikipedia.org/wiki/Powerset_construction
+# Builds a deterministic finite automaton for the lexer from the same token patterns the regex scanners use
+# Pattern -> NFA (Thompson construction) -> DFA (subset construction) over character classes
+
+# Characters 0-127 are their own symbols, every other character is the OTHER symbol
+# so \d, \w and \s only match ASCII, the regex scanners compile the patterns with re.ASCII to match
+ASCII_SIZE = 128
+OTHER = ASCII_SIZE
+ALL_SYMBOLS = frozenset(range(ASCII_SIZE + 1))
+DIGITS = frozenset(range(ord('0'), ord('9') + 1))
+WORD = DIGITS | frozenset(range(ord('a'), ord('z') + 1)) | frozenset(range(ord('A'), ord('Z') + 1)) | {ord('_')}
+SPACES = frozenset(ord(c) for c in ' \t\n\r\f\v')
+ESCAPES = {'d': DIGITS, 'w': WORD, 's': SPACES, 'D': ALL_SYMBOLS - DIGITS, 'W': ALL_SYMBOLS - WORD, 'S': ALL_SYMBOLS - SPACES}
+ESCAPED_CHARS = {'t': '\t', 'n': '\n', 'r': '\r', 'f': '\f', 'v': '\v'}
+
+
+# Nondeterministic automaton built up one pattern fragment at a time
+# epsilon[state] - states reachable without reading a symbol
+# moves[state] - list of (set of symbols, next state)
+class NFA:
+    def __init__(self):
+        self.epsilon = []
+        self.moves = []
+
+    def new_state(self):
+        self.epsilon.append([])
+        self.moves.append([])
+        return len(self.epsilon) - 1
+
+
+# Parses one regular expression and adds it to the NFA
+# Supports the syntax used by token patterns: literals, escapes, [classes], ., groups, |, *, + and ?
+class PatternParser:
+    def __init__(self, pattern, nfa):
+        self.pattern = pattern
+        self.position = 0
+        self.nfa = nfa
+
+    # Returns (start state, end state) of the fragment for the whole pattern
+    def parse(self):
+        fragment = self.parse_alternation()
+        if self.position != len(self.pattern):
+            self.error("unexpected ')'")
+        return fragment
+
+    def error(self, message):
+        raise ValueError(f"Cannot build DFA for pattern {self.pattern!r}: {message} at position {self.position}")
+
+    def peek(self):
+        if self.position < len(self.pattern):
+            return self.pattern[self.position]
+        return None
+
+    def next_char(self):
+        if self.position >= len(self.pattern):
+            self.error("unexpected end of pattern")
+        char = self.pattern[self.position]
+        self.position += 1
+        return char
+
+    # alternation -> sequence ('|' sequence)*
+    def parse_alternation(self):
+        fragments = [self.parse_sequence()]
+        while self.peek() == '|':
+            self.position += 1
+            fragments.append(self.parse_sequence())
+        if len(fragments) == 1:
+            return fragments[0]
+
+        start = self.nfa.new_state()
+        end = self.nfa.new_state()
+        for fragment_start, fragment_end in fragments:
+            self.nfa.epsilon[start].append(fragment_start)
+            self.nfa.epsilon[fragment_end].append(end)
+        return start, end
+
+    # sequence -> (atom quantifier?)*
+    def parse_sequence(self):
+        start = end = self.nfa.new_state()
+        while self.peek() is not None and self.peek() not in '|)':
+            atom_start, atom_end = self.parse_quantified()
+            self.nfa.epsilon[end].append(atom_start)
+            end = atom_end
+        return start, end
+
+    def parse_quantified(self):
+        start, end = self.parse_atom()
+        while self.peek() is not None and self.peek() in '*+?':
+            quantifier = self.next_char()
+            if self.peek() == '?':
+                self.error("lazy quantifiers have no meaning with longest match")
+            new_start = self.nfa.new_state()
+            new_end = self.nfa.new_state()
+            self.nfa.epsilon[new_start].append(start)
+            self.nfa.epsilon[end].append(new_end)
+            if quantifier in '*?':
+                self.nfa.epsilon[new_start].append(new_end)
+            if quantifier in '*+':
+                self.nfa.epsilon[end].append(start)
+            start, end = new_start, new_end
+        return start, end
+
+    def parse_atom(self):
+        char = self.next_char()
+        if char == '(':
+            if self.pattern.startswith('?:', self.position):
+                self.position += 2
+            fragment = self.parse_alternation()
+            if self.next_char() != ')':
+                self.error("missing ')'")
+            return fragment
+        if char == '[':
+            symbols = self.parse_class()
+        elif char == '.':
+            symbols = ALL_SYMBOLS - {ord('\n')}
+        elif char == '\\':
+            symbols = self.parse_escape()
+        elif char in '*+?)':
+            self.error(f"nothing to repeat before '{char}'")
+        else:
+            symbols = frozenset([self.symbol(char)])
+
+        start = self.nfa.new_state()
+        end = self.nfa.new_state()
+        self.nfa.moves[start].append((frozenset(symbols), end))
+        return start, end
+
+    # Character class like [a-zA-Z_] or [^"]
+    def parse_class(self):
+        negated = self.peek() == '^'
+        if negated:
+            self.position += 1
+
+        symbols = set()
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            char = self.next_char()
+            if char == '\\':
+                escaped = self.parse_escape()
+                if len(escaped) != 1:
+                    symbols |= escaped
+                    continue
+                low = next(iter(escaped))
+            else:
+                low = self.symbol(char)
+
+            # Range like a-z
+            if self.peek() == '-' and self.pattern[self.position + 1:self.position + 2] not in ('', ']'):
+                self.position += 1
+                high_char = self.next_char()
+                high = next(iter(self.parse_escape())) if high_char == '\\' else self.symbol(high_char)
+                if high < low:
+                    self.error("bad character range")
+                symbols.update(range(low, high + 1))
+            else:
+                symbols.add(low)
+        self.position += 1
+
+        if negated:
+            return ALL_SYMBOLS - symbols
+        return frozenset(symbols)
+
+    def parse_escape(self):
+        char = self.next_char()
+        if char in ESCAPES:
+            return ESCAPES[char]
+        if char in ESCAPED_CHARS:
+            return frozenset([ord(ESCAPED_CHARS[char])])
+        if char.isalnum():
+            self.error(f"unsupported escape '\\{char}'")
+        return frozenset([self.symbol(char)])
+
+    def symbol(self, char):
+        code = ord(char)
+        if code >= ASCII_SIZE:
+            self.error("only ASCII characters can be used in patterns")
+        return code
+
+
+# Deterministic automaton used by the lexer
+# class_of[code] - character class of an ASCII character code, other_class is used for everything else
+# table[state][class] - next state or -1 when there is no transition
+# accept[state] - token type accepted in the state or None
+# State 0 is the start state
+class DFA:
+    def __init__(self, class_of, other_class, table, accept):
+        self.class_of = class_of
+        self.other_class = other_class
+        self.table = table
+        self.accept = accept
+
+
+# Builds the DFA for a list of (pattern, token type)
+# When one input is accepted by several patterns the one listed first wins, like the regex scanners
+def build_dfa(token_patterns):
+    nfa = NFA()
+    start = nfa.new_state()
+    accepting = {}
+    for priority, (pattern, token_type) in enumerate(token_patterns):
+        fragment_start, fragment_end = PatternParser(pattern, nfa).parse()
+        nfa.epsilon[start].append(fragment_start)
+        accepting[fragment_end] = (priority, token_type)
+
+    # Split the symbols into classes that every NFA move treats the same way
+    symbol_sets = sorted({symbols for moves in nfa.moves for symbols, _ in moves}, key=sorted)
+    signatures = {}
+    symbol_class = [0] * (ASCII_SIZE + 1)
+    for symbol in range(ASCII_SIZE + 1):
+        signature = tuple(index for index, symbols in enumerate(symbol_sets) if symbol in symbols)
+        symbol_class[symbol] = signatures.setdefault(signature, len(signatures))
+    class_count = len(signatures)
+    classes_of_set = {symbols: {symbol_class[symbol] for symbol in symbols} for symbols in symbol_sets}
+
+    # Subset construction, every DFA state is the epsilon closure of a set of NFA states
+    def closure(states):
+        result = set(states)
+        stack = list(states)
+        while stack:
+            for next_state in nfa.epsilon[stack.pop()]:
+                if next_state not in result:
+                    result.add(next_state)
+                    stack.append(next_state)
+        return frozenset(result)
+
+    start_set = closure([start])
+    state_ids = {start_set: 0}
+    state_sets = [start_set]
+    table = []
+    accept = []
+    index = 0
+    while index < len(state_sets):
+        current = state_sets[index]
+        index += 1
+
+        # Accept the pattern listed first among the accepting NFA states
+        matches = [accepting[state] for state in current if state in accepting]
+        accept.append(min(matches, key=lambda match: match[0])[1] if matches else None)
+
+        targets = [set() for _ in range(class_count)]
+        for state in current:
+            for symbols, next_state in nfa.moves[state]:
+                for char_class in classes_of_set[symbols]:
+                    targets[char_class].add(next_state)
+
+        row = []
+        for target in targets:
+            if not target:
+                row.append(-1)
+                continue
+            target_set = closure(target)
+            if target_set not in state_ids:
+                state_ids[target_set] = len(state_sets)
+                state_sets.append(target_set)
+            row.append(state_ids[target_set])
+        table.append(row)
+
+    return DFA(symbol_class[:ASCII_SIZE], symbol_class[OTHER], table, accept)
+
+
+# DFAs already built in this run, keyed by the patterns they were built from
+_dfa_cache = {}
+
+
+# Returns the DFA for the token patterns, building it the first time it is asked for
+def get_dfa(token_patterns):
+    key = tuple(token_patterns)
+    if key not in _dfa_cache:
+        _dfa_cache[key] = build_dfa(token_patterns)
+    return _dfa_cache[key]
@@ -1,26 +1,34 @@
+from instruction import Opcode, BINARY
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
+
+# Removes assignments to variables and temps that are never used
+# Used symbols are kept in a bitset indexed by symbol id
+# Dead instructions are removed from the InstructionList, modified is True if any were
 class EasyDeadCodeElimination:
     def __init__(self, instructions):
-        self.instructions = instructions
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
         
     def optimize(self):
-        used_vars = set()
+        used_vars = 0
         
         for instr in self.instructions:
-            if instr.arg1:
-                used_vars.add(instr.arg1)
-            if instr.arg2:
-                used_vars.add(instr.arg2)
-        
+            for arg in (instr.arg1, instr.arg2):
+                if isinstance(arg, Symbol):
+                    used_vars |= 1 << arg.id
+                elif type(arg) is tuple:
+                    for call_arg in arg:
+                        if isinstance(call_arg, Symbol):
+                            used_vars |= 1 << call_arg.id
         
-        for instr in self.instructions:
-
-            if instr.operator in ["if", "call"]:
-                instr.is_dead = False  
-            elif instr.result and instr.result not in used_vars:
-                instr.is_dead = True
-            else:
-                instr.is_dead = False
+        # Only copies and arithmetic can be dead, calls can have side effects and the rest are control flow
+        def is_dead(instr):
+            return (instr.opcode is Opcode.COPY or instr.opcode in BINARY) and not used_vars >> instr.result.id & 1
 
-        self.instructions = [instr for instr in self.instructions if not instr.is_dead]
+        for node in self.instructions.nodes():
+            if is_dead(node.instr):
+                self.instructions.remove(node)
+                self.modified = True
 
-        return self.instructions
\ No newline at end of file
+        return self.instructions
@@ -0,0 +1,223 @@
+import heapq
+import itertools
+from basicBlockGenerator import BasicBlockGenerator
+from instruction import Instruction, Opcode, BINARY, COMMUTATIVE
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
+
+# https://en.wikipedia.org/wiki/Available_expression
+# https://en.wikipedia.org/wiki/Common_subexpression_elimination
+# Common subexpression elimination across the basic blocks of a function with available expressions
+#   - Blocks and the CFG come from BasicBlockGenerator, blocks that can't be reached from the entry are left alone
+#   - An expression is available at a point if it was computed on every path there and none of its operands
+#     were assigned since, a call makes the expressions of globals unavailable
+#   - Available in of a block is what is available out of all its predecessors, nothing is available in the entry,
+#     the other blocks start with everything so loops keep what they don't kill and the worklist only removes
+#   - An expression computed where it is available is redundant, going back through the predecessors finds the
+#     computations that reach it
+# The value is kept in a variable the redundant computations copy instead:
+#   - If every computation of the expression assigns the same local variable and nothing else does, that variable
+#   - Else a new temp that is copied from the result right after every computation that reaches a redundant one,
+#     named %cse0, %cse1, ... from cse_numbers, the pass manager gives all its runs one counter so the names don't repeat
+#
+# Expressions are numbered per function so available sets are bitsets, like LocalValueNumbering
+# the operands of +, *, == and != are sorted and x > y is y < x
+class GlobalCommonSubexpressionElimination:
+    def __init__(self, instructions, symbol_table, cse_numbers=None):
+        self.instructions = as_instruction_list(instructions)
+        self.symbol_table = symbol_table
+        self.cse_numbers = cse_numbers if cse_numbers is not None else itertools.count()
+        self.modified = False
+        self.global_ids = symbol_table.global_ids()
+
+    def optimize(self):
+        for function_nodes in list(self.instructions.functions()):
+            self.optimize_function(function_nodes)
+        return self.instructions
+
+    # New temp to keep the value of an expression in
+    def generate_fresh_holder(self):
+        return self.symbol_table.new_temp(f"%cse{next(self.cse_numbers)}")
+
+    # Hashable expression of arithmetic on at least one variable, or None
+    def expression(self, instr):
+        if instr.opcode not in BINARY or not (isinstance(instr.arg1, Symbol) or isinstance(instr.arg2, Symbol)):
+            return None
+
+        # Variables by id before constants by value, 1 and 1.0 are different constants for the generated code
+        def key(operand):
+            if isinstance(operand, Symbol):
+                return (0, operand.id)
+            return (1, type(operand.value).__name__, repr(operand.value))
+
+        left, right = key(instr.arg1), key(instr.arg2)
+        if instr.opcode is Opcode.GT:
+            return (Opcode.LT, right, left)
+        if instr.opcode in COMMUTATIVE and right < left:
+            return (instr.opcode, right, left)
+        return (instr.opcode, left, right)
+
+    def optimize_function(self, nodes):
+        # Number every expression and the expressions that use every variable,
+        # a function that never computes an expression twice has nothing to eliminate
+        expressions = [self.expression(node.instr) for node in nodes]
+        numbers = {}
+        uses_of = {}
+        globals_mask = 0
+        computation_count = 0
+        for node, expression in zip(nodes, expressions):
+            if expression is None:
+                continue
+            computation_count += 1
+            if expression not in numbers:
+                number = numbers[expression] = len(numbers)
+                for operand in (node.instr.arg1, node.instr.arg2):
+                    if isinstance(operand, Symbol):
+                        uses_of[operand.id] = uses_of.get(operand.id, 0) | 1 << number
+                        if operand.id in self.global_ids:
+                            globals_mask |= 1 << number
+        if computation_count == len(numbers):
+            return
+
+        generator = BasicBlockGenerator()
+        blocks, graph = generator.generate_basic_blocks([node.instr for node in nodes])
+        block_ids = list(blocks)
+        order = {block_id: index for index, block_id in enumerate(block_ids)}
+
+        # (number of the expression computed or None, expressions made unavailable) of every instruction
+        summaries = []
+        for node, expression in zip(nodes, expressions):
+            instr = node.instr
+            kills = 0
+            if (instr.opcode is Opcode.COPY or instr.opcode in BINARY or instr.opcode is Opcode.CALL) and isinstance(instr.result, Symbol):
+                kills = uses_of.get(instr.result.id, 0)
+            if instr.opcode is Opcode.CALL:
+                kills |= globals_mask
+            summaries.append((None if expression is None else numbers[expression], kills))
+
+        # Blocks are in the same order as the nodes
+        block_nodes = {}
+        block_summaries = {}
+        position = 0
+        for block_id, block in blocks.items():
+            block_nodes[block_id] = nodes[position:position + len(block)]
+            block_summaries[block_id] = summaries[position:position + len(block)]
+            position += len(block)
+
+        def transfer(block_id, available):
+            for number, kills in block_summaries[block_id]:
+                if number is not None:
+                    available |= 1 << number
+                available &= ~kills
+            return available
+
+        # Only blocks that can be reached from the entry, the others don't take part
+        entry = block_ids[0]
+        reachable = {entry}
+        stack = [entry]
+        while stack:
+            for successor in graph.successors(stack.pop()):
+                if successor not in reachable:
+                    reachable.add(successor)
+                    stack.append(successor)
+
+        everything = (1 << len(numbers)) - 1
+        in_states = {}
+        out_states = {block_id: everything for block_id in reachable}
+        worklist = [order[block_id] for block_id in reachable]
+        heapq.heapify(worklist)
+        queued = set(reachable)
+        while worklist:
+            block_id = block_ids[heapq.heappop(worklist)]
+            queued.discard(block_id)
+            available = 0
+            if block_id != entry:
+                available = everything
+                for predecessor in graph.predecessors(block_id):
+                    if predecessor in reachable:
+                        available &= out_states[predecessor]
+            in_states[block_id] = available
+            available = transfer(block_id, available)
+            if available != out_states[block_id]:
+                out_states[block_id] = available
+                for successor in graph.successors(block_id):
+                    if successor not in queued:
+                        queued.add(successor)
+                        heapq.heappush(worklist, order[successor])
+
+        # Redundant computations with the computation before them in their own block, or None if the ones that reach
+        # them are in the predecessors, and the last computations still available at the end of every block
+        redundant = []
+        exit_computations = {}
+        for block_id in block_ids:
+            if block_id not in reachable:
+                continue
+            available = in_states[block_id]
+            computations = {}
+            for node, (number, kills) in zip(block_nodes[block_id], block_summaries[block_id]):
+                if number is not None:
+                    if available >> number & 1:
+                        redundant.append((node, number, computations.get(number), block_id))
+                    computations[number] = node
+                    available |= 1 << number
+                if kills:
+                    computations = {computed: computation for computed, computation in computations.items() if not kills >> computed & 1}
+                available &= ~kills
+            exit_computations[block_id] = computations
+        if not redundant:
+            return
+        redundant_nodes = {id(node) for node, _, _, _ in redundant}
+
+        # Computations that reach the start of a block, the expression is available so every path back has one
+        def reaching(block_id, number):
+            found = []
+            visited = set()
+            stack = [predecessor for predecessor in graph.predecessors(block_id) if predecessor in reachable]
+            while stack:
+                predecessor = stack.pop()
+                if predecessor in visited:
+                    continue
+                visited.add(predecessor)
+                computation = exit_computations[predecessor].get(number)
+                if computation is not None:
+                    found.append(computation)
+                else:
+                    stack.extend(block for block in graph.predecessors(predecessor) if block in reachable)
+            return found
+
+        # Expressions every variable is assigned, None for anything else, to tell if it only ever holds one
+        assigned = {}
+        computed_into = {}
+        for node, (number, kills) in zip(nodes, summaries):
+            result = node.instr.result
+            if isinstance(result, Symbol):
+                assigned.setdefault(result.id, set()).add(number)
+            if number is not None:
+                computed_into.setdefault(number, {})[result.id] = result
+
+        # Expression number -> (variable that keeps its value, computations already copied into it or None)
+        kept = {}
+        for node, number, local, block_id in redundant:
+            if number not in kept:
+                results = computed_into[number]
+                if len(results) == 1:
+                    result_id, result = next(iter(results.items()))
+                    if result_id not in self.global_ids and assigned[result_id] == {number}:
+                        kept[number] = (result, None)
+                if number not in kept:
+                    kept[number] = (self.generate_fresh_holder(), set())
+            holder, copied = kept[number]
+
+            # A new temp is copied from the result of every computation that reaches here,
+            # a redundant computation already reads it
+            if copied is not None:
+                for source in ([local] if local is not None else reaching(block_id, number)):
+                    if id(source) not in redundant_nodes and id(source) not in copied:
+                        copied.add(id(source))
+                        self.instructions.insert_after(source, Instruction(Opcode.COPY, arg1=source.instr.result, result=holder))
+
+            if node.instr.result.id == holder.id:
+                self.instructions.remove(node)
+            else:
+                self.instructions.replace(node, Instruction(Opcode.COPY, arg1=holder, result=node.instr.result))
+            self.modified = True
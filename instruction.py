@@ -1,47 +1,120 @@
 # https://www.geeksforgeeks.org/compiler-design/three-address-code-compiler/
 # Used for object design of what an instruction is
+from enum import IntEnum
+from SymbolTable import Symbol as Var, Temp
+
+
+# What an instruction does, passes and the assembler dispatch on this instead of comparing operator strings
+class Opcode(IntEnum):
+    LABEL = 0       # label:
+    FUNCTION = 1    # start of a function, the label is the function name
+    COPY = 2        # result = arg1
+    ADD = 3         # result = arg1 + arg2
+    SUB = 4
+    MUL = 5
+    DIV = 6
+    LT = 7
+    GT = 8
+    EQ = 9
+    NE = 10
+    IF = 11         # if arg1 goto arg2 else goto result
+    GOTO = 12       # goto result
+    CALL = 13       # result = arg1(arg2), arg2 is the tuple of arguments
+    RETURN = 14     # return arg1
+    PHI = 15        # result = phi(arg2), only in SSA form, arg1 is the tuple of predecessor blocks arg2 comes from
+
+
+# Operator text of every opcode that has one, used when printing
+OPERATORS = {
+    Opcode.COPY: '=', Opcode.ADD: '+', Opcode.SUB: '-', Opcode.MUL: '*', Opcode.DIV: '/',
+    Opcode.LT: '<', Opcode.GT: '>', Opcode.EQ: '==', Opcode.NE: '!=',
+    Opcode.IF: 'if', Opcode.GOTO: 'goto', Opcode.CALL: 'call', Opcode.RETURN: 'return', Opcode.PHI: 'phi',
+}
+
+# Opcode of every binary operator in the AST
+BINARY_OPCODES = {'+': Opcode.ADD, '-': Opcode.SUB, '*': Opcode.MUL, '/': Opcode.DIV,
+                  '<': Opcode.LT, '>': Opcode.GT, '==': Opcode.EQ, '!=': Opcode.NE}
+
+# Opcodes of the form result = arg1 op arg2
+BINARY = frozenset(BINARY_OPCODES.values())
+
+# Binary opcodes whose operands can be swapped
+COMMUTATIVE = frozenset((Opcode.ADD, Opcode.MUL, Opcode.EQ, Opcode.NE))
+
+
+# Operands
+#   Const - number or character, value is parsed once when TAC is generated
+#   Var - variable or function name, a SymbolTable.Symbol with a dense id
+#   Temp - temp made by TAC, a Symbol too so passes can index bitsets with its id
+#   Label - jump target
+#   tuple - arguments of a call or phi
+class Const:
+    __slots__ = ("value", "text")
+
+    # text is how the constant was written in the source, printed instead of value when given
+    def __init__(self, value, text=None):
+        self.value = value
+        self.text = text
+
+    # Characters that are more than one letter have no number value
+    def is_numeric(self):
+        return type(self.value) is not str
+
+    def __eq__(self, other):
+        return type(other) is Const and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __str__(self):
+        return self.text if self.text is not None else str(self.value)
+
+    def __repr__(self):
+        return f"Const({self.value!r})"
+
+
+class Label(str):
+    __slots__ = ()
+
+
 class Instruction:
-    def __init__(self, label=None, operator=None, arg1=None, arg2=None, result=None, function_call=False):
-        self.label = label
-        self.operator = operator
+    __slots__ = ("opcode", "arg1", "arg2", "result", "label")
+
+    def __init__(self, opcode, arg1=None, arg2=None, result=None, label=None):
+        self.opcode = opcode
         self.arg1 = arg1
         self.arg2 = arg2
         self.result = result
-        self.function_call = function_call
+        self.label = label
+
+    # Operator text like '+' or 'goto', None for labels
+    @property
+    def operator(self):
+        return OPERATORS.get(self.opcode)
+
+    @property
+    def function_call(self):
+        return self.opcode is Opcode.CALL
 
     def __str__(self):
-        parts = []
-        if self.label is not None:
-            parts.append(f"\n{self.label}:")
-            
-        if self.operator == 'if':
-            parts.append(f"if {self.arg1} goto {self.arg2} else goto {self.result}")
-        elif self.operator == 'call':
-            parts.append(f"{self.result} = {self.arg1}({self.arg2})")
-        elif self.operator == 'goto':
-            parts.append(f"goto {self.result}")
-        elif self.result is not None and self.operator == '=':
-            parts.append(f"{self.result} = {self.arg1}")
-        elif self.result is not None and self.arg1 is not None and self.arg2 is not None and self.operator is not None:
-            parts.append(f"{self.result} = {self.arg1} {self.operator} {self.arg2}")
-        elif self.operator == 'return':
-            parts.append(f"return {self.arg1}")
-        elif self.operator is not None or self.result is not None or self.arg1 is not None or self.arg2 is not None:
-            instruction_parts = []
-            if self.result is not None:
-                instruction_parts.append(f"{self.result}")
-            if self.arg1 is not None:
-                instruction_parts.append(f"{self.arg1}")
-            if self.operator is not None:
-                instruction_parts.append(f"{self.operator}")
-            if self.arg2 is not None:
-                instruction_parts.append(f"{self.arg2}")
-            parts.append(' '.join(instruction_parts))
-        
-        return ' '.join(parts)
-    
+        opcode = self.opcode
+        if opcode is Opcode.LABEL or opcode is Opcode.FUNCTION:
+            return f"\n{self.label}:"
+        if opcode is Opcode.COPY:
+            return f"{self.result} = {self.arg1}"
+        if opcode in BINARY:
+            return f"{self.result} = {self.arg1} {OPERATORS[opcode]} {self.arg2}"
+        if opcode is Opcode.IF:
+            return f"if {self.arg1} goto {self.arg2} else goto {self.result}"
+        if opcode is Opcode.GOTO:
+            return f"goto {self.result}"
+        if opcode is Opcode.CALL:
+            return f"{self.result} = {self.arg1}({','.join(str(arg) for arg in self.arg2)})"
+        if opcode is Opcode.PHI:
+            return f"{self.result} = phi({', '.join(f'{block}: {arg}' for block, arg in zip(self.arg1, self.arg2))})"
+        return f"return {self.arg1}"
+
     def to_string_simple(self):
         """Simple string representation showing all components with labels and None values"""
-        return (f"label:{self.label} operator:{self.operator} "
+        return (f"label:{self.label} opcode:{self.opcode.name} "
                 f"arg1:{self.arg1} arg2:{self.arg2} result:{self.result}\n")
-    
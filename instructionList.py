@@ -0,0 +1,116 @@
+# https://en.wikipedia.org/wiki/Doubly_linked_list
+# Instructions of a function (or a whole program) in a doubly linked list so passes can edit it in place
+# Inserting, removing and replacing an instruction is O(1) given its node, nothing else is copied
+# Every edit sets modified so a pass (or a loop of passes) can tell if anything changed without comparing the TAC
+#
+# Passes replace an instruction with a new one instead of changing it so the instructions the list was made from
+# stay the same, the same TAC can go through several passes one after another
+
+from instruction import Opcode
+
+
+class InstructionNode:
+    __slots__ = ("instr", "prev", "next")
+
+    def __init__(self, instr):
+        self.instr = instr
+        self.prev = None
+        self.next = None
+
+
+class InstructionList:
+    __slots__ = ("head", "tail", "length", "modified")
+
+    def __init__(self, instructions=()):
+        self.head = None
+        self.tail = None
+        self.length = 0
+        self.modified = False
+        for instr in instructions:
+            self.append(instr)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        node = self.head
+        while node is not None:
+            yield node.instr
+            node = node.next
+
+    # Nodes in order, the node being looked at can be removed or replaced and
+    # nodes inserted after it are not visited
+    def nodes(self):
+        node = self.head
+        while node is not None:
+            next_node = node.next
+            yield node
+            node = next_node
+
+    # Lists of the nodes of every function from its FUNCTION instruction to the next one,
+    # instructions before the first function are global and in none of them
+    def functions(self):
+        function_nodes = None
+        for node in self.nodes():
+            if node.instr.opcode is Opcode.FUNCTION:
+                if function_nodes:
+                    yield function_nodes
+                function_nodes = []
+            if function_nodes is not None:
+                function_nodes.append(node)
+        if function_nodes:
+            yield function_nodes
+
+    # Plain list of the instructions for code that indexes them like the assembler
+    def to_list(self):
+        return list(self)
+
+    # Links a new node between prev and next, either can be None at the ends
+    def link(self, node, prev, next):
+        node.prev = prev
+        node.next = next
+        if prev is None:
+            self.head = node
+        else:
+            prev.next = node
+        if next is None:
+            self.tail = node
+        else:
+            next.prev = node
+        self.length += 1
+        return node
+
+    # Adding instructions while the list is built is not an edit
+    def append(self, instr):
+        return self.link(InstructionNode(instr), self.tail, None)
+
+    def insert_before(self, node, instr):
+        self.modified = True
+        return self.link(InstructionNode(instr), node.prev, node)
+
+    def insert_after(self, node, instr):
+        self.modified = True
+        return self.link(InstructionNode(instr), node, node.next)
+
+    def remove(self, node):
+        self.modified = True
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+        self.length -= 1
+
+    def replace(self, node, instr):
+        self.modified = True
+        node.instr = instr
+
+
+# Passes take a list or an InstructionList, a list is put in a new InstructionList
+def as_instruction_list(instructions):
+    if isinstance(instructions, InstructionList):
+        return instructions
+    return InstructionList(instructions)
@@ -1,7 +1,10 @@
 import re
+import sys
+from array import array
 from enum import Enum
 from typing import List
 from Errors import LexerError
+import dfaGenerator
 
 
 class TokenType(Enum):
@@ -50,11 +53,49 @@ class TokenType(Enum):
     
     # Other
     WHITESPACE = "WHITESPACE"
+    COMMENT = "COMMENT"
+    BLOCK_COMMENT = "BLOCK_COMMENT"
     UNKNOWN = "UNKNOWN"
     PARSING_TOKEN = "PARSING_TOKEN"  
 
 
+# Token types in a fixed order so a type can be stored as a small integer id
+TOKEN_TYPES = list(TokenType)
+TOKEN_TYPE_IDS = {token_type: type_id for type_id, token_type in enumerate(TOKEN_TYPES)}
+
+# Keywords are matched by the identifier pattern and then looked up here
+# Adding a keyword only adds an entry, it does not add work for every other token
+KEYWORDS = {
+    "if": TokenType.IF,
+    "else": TokenType.ELSE,
+    "while": TokenType.WHILE,
+    "for": TokenType.FOR,
+    "return": TokenType.RETURN,
+    "int": TokenType.INT,
+    "float": TokenType.FLOAT,
+    "char": TokenType.CHAR,
+    "void": TokenType.VOID,
+}
+
+# Characters an identifier is made of
+# A keyword right after one of them is an identifier like with the \bint\b patterns the lexer used to have,
+# so 1.5int is a number and the identifier int
+WORD_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+
+# Token type of the identifier value that starts at start in line
+def keyword_type(value, line, start):
+    if start > 0 and line[start - 1] in WORD_CHARACTERS:
+        return TokenType.IDENTIFIER
+    return KEYWORDS.get(value, TokenType.IDENTIFIER)
+
+# Token types whose values are interned so every copy of a name shares one string
+INTERNED_TYPES = {TokenType.IDENTIFIER} | set(KEYWORDS.values())
+
+
 class Token:
+    # Slots instead of a __dict__ since there is one token object per token in the source
+    __slots__ = ('type', 'value', 'line', 'column')
+
     def __init__(self, type: TokenType, value: str, line: int, column: int):
         self.type = type
         self.value = value
@@ -69,24 +110,72 @@ class Token:
     
 
 
+# Compact storage for a whole token stream
+# Every token is a row in parallel int arrays (type id, start offset, length, line, column)
+# and the value is only sliced out of the source when a token is asked for
+class TokenBuffer:
+    def __init__(self, source_code: str):
+        self.source_code = source_code
+        self.type_ids = array('i')
+        self.starts = array('i')
+        self.lengths = array('i')
+        self.lines = array('i')
+        self.columns = array('i')
+
+        # Offset of the first character of every line so a line and column can be turned into an offset
+        self.line_starts = array('i', [0])
+        position = source_code.find('\n')
+        while position != -1:
+            self.line_starts.append(position + 1)
+            position = source_code.find('\n', position + 1)
+
+    # Add a token from the lexer, only its position in the source is kept
+    def append(self, token: Token):
+        self.type_ids.append(TOKEN_TYPE_IDS[token.type])
+        self.starts.append(self.line_starts[token.line - 1] + token.column - 1)
+        self.lengths.append(len(token.value))
+        self.lines.append(token.line)
+        self.columns.append(token.column)
+
+    def __len__(self) -> int:
+        return len(self.type_ids)
+
+    # Type of the token at index without building a Token
+    def type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.type_ids[index]]
+
+    # Value of the token at index sliced out of the source
+    def value(self, index: int) -> str:
+        start = self.starts[index]
+        value = self.source_code[start:start + self.lengths[index]]
+        if TOKEN_TYPES[self.type_ids[index]] in INTERNED_TYPES:
+            value = sys.intern(value)
+        return value
+
+    # Build a Token object for the token at index
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return Token(TOKEN_TYPES[self.type_ids[index]], self.value(index), self.lines[index], self.columns[index])
+
+    # Tokens are built one at a time so the parser can pull them like any other token stream
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
 class Lexer:
+
+    # Scanner engines that can be picked when creating a lexer
+    ENGINES = ("master", "loop", "dfa")
     
-    def __init__(self):
+    def __init__(self, engine="master"):
         # Initialize Lexer
         # Token patterns
         # Regular Expressions created with help from Copilot
         self.token_patterns = [
-            # Keywords 
-            (r'\bif\b', TokenType.IF),
-            (r'\belse\b', TokenType.ELSE),
-            (r'\bwhile\b', TokenType.WHILE),
-            (r'\bfor\b', TokenType.FOR),
-            (r'\breturn\b', TokenType.RETURN),
-            (r'\bint\b', TokenType.INT),
-            (r'\bfloat\b', TokenType.FLOAT),
-            (r'\bchar\b', TokenType.CHAR),
-            (r'\bvoid\b', TokenType.VOID),
-
             # Invalid identifiers
             (r'\d+[a-zA-Z_][a-zA-Z0-9_]*', TokenType.INVALID_IDENTIFIER),
             
@@ -94,13 +183,18 @@ class Lexer:
             (r'\d+\.\d+', TokenType.FLOATING_NUMBER),  
             (r'\d+', TokenType.NUMBER),       
             
-            # Identifiers
+            # Identifiers, keywords are found by looking the identifier up in KEYWORDS
             (r'[a-zA-Z_][a-zA-Z0-9_]*', TokenType.IDENTIFIER),
             
             # String literals and character literals
             (r'"[^"]*"', TokenType.STRING),
             (r"'[^']*'", TokenType.CHARACTER),
 
+            # Comments, these come before the divide operator
+            # A block comment only matches its opening here, the scanner looks for the end
+            (r'//.*', TokenType.COMMENT),
+            (r'/\*', TokenType.BLOCK_COMMENT),
+
             # Two-character operators
             (r'==', TokenType.EQUAL),
             (r'!=', TokenType.NOT_EQUAL),
@@ -124,70 +218,255 @@ class Lexer:
             (r'[ \t]+', TokenType.WHITESPACE),
         ]
         
+        self._compile_patterns()
+
+        # Pick which scanner tokenize uses
+        # loop - tries every compiled pattern one after another at each position
+        # master - one match per token using the combined pattern
+        # dfa - table-driven automaton built from the patterns, longest match with no regex backtracking
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}', expected one of {', '.join(self.ENGINES)}")
+        self.engine = engine
+        if engine == "dfa":
+            self.dfa = dfaGenerator.get_dfa(self.token_patterns)
+
+    # Compile the token patterns for the scanners
+    def _compile_patterns(self):
         # Compile all regex patterns 
-        self.compiled_patterns = [(re.compile(pattern), token_type) for pattern, token_type in self.token_patterns]
+        # re.ASCII so \d is only 0-9 like in the dfa, without it digits of other scripts like '٣' would be numbers
+        self.compiled_patterns = [(re.compile(pattern, re.ASCII), token_type) for pattern, token_type in self.token_patterns]
+
+        # Combine all patterns into one alternation with a named group per pattern
+        # Alternatives are tried left to right so the priority is the same as the pattern list
+        self.master_pattern = re.compile('|'.join(f'(?P<T{i}>{pattern})' for i, (pattern, _) in enumerate(self.token_patterns)), re.ASCII)
+        self.group_types = {f'T{i}': token_type for i, (_, token_type) in enumerate(self.token_patterns)}
     
     # Tokenize the given source code and return a list of tokens
     def tokenize(self, source_code: str) -> List[Token]:
+        return list(self.iter_tokens(source_code))
+
+    # Tokenize the given source code into a compact TokenBuffer instead of a list of Token objects
+    def tokenize_compact(self, source_code: str) -> TokenBuffer:
+        buffer = TokenBuffer(source_code)
+        for token in self.iter_tokens(source_code):
+            buffer.append(token)
+        return buffer
+
+    # Tokenize the given source code one token at a time
+    # Source can be a string or an open text file, files are read line by line through their buffer
+    # so neither the whole source nor the whole token list has to be kept in memory
+    def iter_tokens(self, source):
+        scan_line = self._get_line_scanner()
+
+        # Line and column where a block comment that is still open started
+        open_comment = None
+
+        # Loop through all the lines, a block comment left open carries over to the next line
+        for line_num, line in enumerate(self._iter_lines(source), 1):
+            open_comment = yield from scan_line(line, line_num, open_comment)
+
+        if open_comment is not None:
+            raise LexerError("Unterminated block comment", open_comment[0], open_comment[1])
+
+    # Returns the line scanner for the selected engine
+    def _get_line_scanner(self):
+        if self.engine == "loop":
+            return self._scan_line_loop
+        if self.engine == "dfa":
+            return self._scan_line_dfa
+        return self._scan_line_master
+
+    # Yields the lines of a string or a text file without the newline character
+    def _iter_lines(self, source):
+        if isinstance(source, str):
+            start = 0
+            while True:
+                end = source.find('\n', start)
+                if end == -1:
+                    yield source[start:]
+                    return
+                yield source[start:end]
+                start = end + 1
+        else:
+            for line in source:
+                yield line[:-1] if line.endswith('\n') else line
+
+    # Returns the position right after the */ that closes a block comment
+    # Returns -1 if the comment does not end on this line
+    def _block_comment_end(self, line: str, position: int) -> int:
+        end = line.find('*/', position)
+        if end == -1:
+            return -1
+        return end + 2
     
-        # Create empty token list that we will end up returning
-        tokens = []
-        
-        # Handle comments first by removing them from the entire source
-        source_code = self._remove_comments(source_code)
-        
-        # Split source code into lines for line/column tracking
-        lines = source_code.split('\n')
-        
-        # Loop through all the lines 
-        for line_num, line in enumerate(lines, 1):
-            position = 0
-
-            # Going through each line
-            while position < len(line):
-                match_found = False
-
-                # Try to match each pattern by going through all compiled patterns
-                for pattern, token_type in self.compiled_patterns:
-                    match = pattern.match(line, position)
-                    if match:
-                        value = match.group(0)
-                        
-                        # Skip whitespace tokens
-                        if token_type == TokenType.WHITESPACE:
-                            position = match.end()
-                            match_found = True
-                            break
-                        
-                        # Handle invalid identifiers
-                        if token_type == TokenType.INVALID_IDENTIFIER:
-                            raise LexerError(f"Invalid identifier '{value}'", line_num, position + 1)
-                        
-                        # Create token for tokens that are not whitespace
-                        token = Token(token_type, value, line_num, position + 1) 
-                        tokens.append(token)
-                        
-                        # Move position forward
+    # Scans one line by trying every compiled pattern at each position
+    # open_comment is where a block comment still open from an earlier line started
+    # Yields the tokens found on the line and returns where a block comment left open started
+    def _scan_line_loop(self, line: str, line_num: int, open_comment=None):
+        position = 0
+
+        # Finish a block comment started on an earlier line
+        if open_comment is not None:
+            position = self._block_comment_end(line, 0)
+            if position == -1:
+                return open_comment
+
+        # Going through each line
+        while position < len(line):
+            match_found = False
+
+            # Try to match each pattern by going through all compiled patterns
+            for pattern, token_type in self.compiled_patterns:
+                match = pattern.match(line, position)
+                if match:
+                    value = match.group(0)
+                    
+                    # Skip whitespace and comment tokens
+                    if token_type == TokenType.WHITESPACE or token_type == TokenType.COMMENT:
                         position = match.end()
                         match_found = True
                         break
-                
-                # If no pattern matched, throw error for unknown character
-                if not match_found:
-                    unknown_char = line[position]
-                    raise LexerError(f"Unknown character seen during tokenization: '{unknown_char}'", line_num, position + 1)
 
-        return tokens
-    
-    # Takes in source code string and removes all comments
-    # Returns source code as a string without comments
-    def _remove_comments(self, source_code: str) -> str:
-        # Remove multi-line comments 
-        multiline_comment = re.compile(r'/\*.*?\*/', re.DOTALL)
-        source_code = multiline_comment.sub('', source_code)
-        
-        # Remove single-line comments 
-        oneline_comment = re.compile(r'//.*')
-        source_code = oneline_comment.sub('', source_code)
+                    # Skip block comments, they can keep going on the next lines
+                    if token_type == TokenType.BLOCK_COMMENT:
+                        end = self._block_comment_end(line, match.end())
+                        if end == -1:
+                            return (line_num, position + 1)
+                        position = end
+                        match_found = True
+                        break
+                    
+                    # Handle invalid identifiers
+                    if token_type == TokenType.INVALID_IDENTIFIER:
+                        raise LexerError(f"Invalid identifier '{value}'", line_num, position + 1)
+                    
+                    # Create token for tokens that are not whitespace
+                    # Identifiers that are keywords get the keyword type
+                    if token_type == TokenType.IDENTIFIER:
+                        value = sys.intern(value)
+                        token_type = keyword_type(value, line, position)
+                    yield Token(token_type, value, line_num, position + 1)
+                    
+                    # Move position forward
+                    position = match.end()
+                    match_found = True
+                    break
+            
+            # If no pattern matched, throw error for unknown character
+            if not match_found:
+                unknown_char = line[position]
+                raise LexerError(f"Unknown character seen during tokenization: '{unknown_char}'", line_num, position + 1)
+
+        return None
+
+    # Scans one line with the combined pattern so each token costs a single match
+    # The named group that matched tells us the token type
+    # Yields the same tokens and raises the same errors as _scan_line_loop
+    def _scan_line_master(self, line: str, line_num: int, open_comment=None):
+        position = 0
+        master_match = self.master_pattern.match
+        group_types = self.group_types
+
+        # Finish a block comment started on an earlier line
+        if open_comment is not None:
+            position = self._block_comment_end(line, 0)
+            if position == -1:
+                return open_comment
+
+        while position < len(line):
+            match = master_match(line, position)
+
+            # If no pattern matched, throw error for unknown character
+            if match is None:
+                unknown_char = line[position]
+                raise LexerError(f"Unknown character seen during tokenization: '{unknown_char}'", line_num, position + 1)
+
+            token_type = group_types[match.lastgroup]
+
+            # Skip block comments, they can keep going on the next lines
+            if token_type == TokenType.BLOCK_COMMENT:
+                end = self._block_comment_end(line, match.end())
+                if end == -1:
+                    return (line_num, position + 1)
+                position = end
+                continue
+
+            # Handle invalid identifiers
+            if token_type == TokenType.INVALID_IDENTIFIER:
+                raise LexerError(f"Invalid identifier '{match.group(0)}'", line_num, position + 1)
+
+            # Create token for tokens that are not whitespace or comments
+            # Identifiers that are keywords get the keyword type
+            if token_type == TokenType.IDENTIFIER:
+                value = sys.intern(match.group(0))
+                yield Token(keyword_type(value, line, position), value, line_num, position + 1)
+            elif token_type != TokenType.WHITESPACE and token_type != TokenType.COMMENT:
+                yield Token(token_type, match.group(0), line_num, position + 1)
+
+            # Move position forward
+            position = match.end()
+
+        return None
+
+    # Scans one line by running the DFA from dfaGenerator over the characters
+    # Takes the longest match, when patterns tie the one listed first wins
+    # For these patterns that gives the same tokens and errors as the regex scanners
+    def _scan_line_dfa(self, line: str, line_num: int, open_comment=None):
+        position = 0
+        length = len(line)
+        class_of = self.dfa.class_of
+        other_class = self.dfa.other_class
+        table = self.dfa.table
+        accept = self.dfa.accept
+
+        # Finish a block comment started on an earlier line
+        if open_comment is not None:
+            position = self._block_comment_end(line, 0)
+            if position == -1:
+                return open_comment
+
+        while position < length:
+            # Run the automaton as far as it goes and remember the last accepting state
+            state = 0
+            token_type = None
+            end = position
+            index = position
+            while index < length:
+                code = ord(line[index])
+                state = table[state][class_of[code] if code < 128 else other_class]
+                if state < 0:
+                    break
+                index += 1
+                if accept[state] is not None:
+                    token_type = accept[state]
+                    end = index
+
+            # If no pattern matched, throw error for unknown character
+            if token_type is None:
+                unknown_char = line[position]
+                raise LexerError(f"Unknown character seen during tokenization: '{unknown_char}'", line_num, position + 1)
+
+            # Skip block comments, they can keep going on the next lines
+            if token_type == TokenType.BLOCK_COMMENT:
+                end = self._block_comment_end(line, end)
+                if end == -1:
+                    return (line_num, position + 1)
+                position = end
+                continue
+
+            # Handle invalid identifiers
+            if token_type == TokenType.INVALID_IDENTIFIER:
+                raise LexerError(f"Invalid identifier '{line[position:end]}'", line_num, position + 1)
+
+            # Create token for tokens that are not whitespace or comments
+            # Identifiers that are keywords get the keyword type
+            if token_type == TokenType.IDENTIFIER:
+                value = sys.intern(line[position:end])
+                yield Token(keyword_type(value, line, position), value, line_num, position + 1)
+            elif token_type != TokenType.WHITESPACE and token_type != TokenType.COMMENT:
+                yield Token(token_type, line[position:end], line_num, position + 1)
+
+            # Move position forward
+            position = end
 
-        return source_code
+        return None
@@ -0,0 +1,129 @@
+from instruction import Opcode, BINARY
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
+
+# https://en.wikipedia.org/wiki/Live-variable_analysis
+# Dead code elimination with the variables live in and out of the basic blocks of every function
+#   - Blocks are split the same way as BasicBlockGenerator but over the nodes and numbered, the pass runs after every
+#     change in a pipeline and only needs the successors, nothing local is live at the end of a function
+#   - Going backwards through a block a definition kills its variable and the operands of an instruction become live
+#   - A copy or arithmetic whose result is not live is dead and its operands don't become live (strong liveness),
+#     so a chain of dead assignments is found at once instead of one link per run
+#   - live out of a block is what is live in its successors, the worklist puts back the predecessors of a block
+#     whose live in grew, starting with nothing live the dead loops like i = i + 1 with i never read are found too
+# Then every block is walked backwards from its live out and the dead instructions are removed
+#
+# Variables of a function are numbered from 0 so the live sets are small bitsets
+# Globals are always live since other functions can read them, calls are never removed since they can have side effects
+class LivenessDeadCodeElimination:
+    def __init__(self, instructions, symbol_table):
+        self.instructions = as_instruction_list(instructions)
+        self.symbol_table = symbol_table
+        self.modified = False
+
+    def optimize(self):
+        for function_nodes in list(self.instructions.functions()):
+            self.optimize_function(function_nodes)
+        return self.instructions
+
+    def optimize_function(self, nodes):
+        # Bit of every symbol id in the live sets, 0 for globals and functions
+        bits = {}
+
+        def bit(value):
+            if not isinstance(value, Symbol):
+                return 0
+            value_bit = bits.get(value.id)
+            if value_bit is None:
+                value_bit = 1 << len(bits) if self.symbol_table.is_local(value) else 0
+                bits[value.id] = value_bit
+            return value_bit
+
+        # Split the nodes into blocks like BasicBlockGenerator, a label starts a block and a jump or return ends it
+        # With (can be removed, variable defined, variables used) of every instruction
+        blocks = []
+        summaries = []
+        block_of_label = {}
+        block = None
+        for node in nodes:
+            instr = node.instr
+            if instr.label is not None:
+                block = None
+                block_of_label[instr.label] = len(blocks)
+            if block is None:
+                block = []
+                summary = []
+                blocks.append(block)
+                summaries.append(summary)
+            block.append(node)
+
+            opcode = instr.opcode
+            if opcode is Opcode.CALL:
+                used = 0
+                for arg in instr.arg2 or ():
+                    used |= bit(arg)
+                summary.append((False, bit(instr.result), used))
+            elif opcode is Opcode.COPY or opcode in BINARY:
+                defines = bit(instr.result)
+                summary.append((defines != 0, defines, bit(instr.arg1) | bit(instr.arg2)))
+            else:
+                summary.append((False, 0, bit(instr.arg1) | bit(instr.arg2)))
+                if opcode is Opcode.IF or opcode is Opcode.GOTO or opcode is Opcode.RETURN:
+                    block = None
+
+        # The CFG by block index, a jump to a label that isn't in the function has no edge
+        successors = []
+        predecessors = [[] for _ in blocks]
+        for index, block in enumerate(blocks):
+            last = block[-1].instr
+            if last.opcode is Opcode.IF:
+                targets = (block_of_label.get(last.arg2), block_of_label.get(last.result))
+            elif last.opcode is Opcode.GOTO:
+                targets = (block_of_label.get(last.result),)
+            elif last.opcode is Opcode.RETURN or index + 1 == len(blocks):
+                targets = ()
+            else:
+                targets = (index + 1,)
+            targets = [target for target in targets if target is not None]
+            successors.append(targets)
+            for target in targets:
+                predecessors[target].append(index)
+
+        # Variables live before the instructions of a block given the ones live after it
+        def transfer(index, live):
+            for removable, defines, used in reversed(summaries[index]):
+                if removable and not live & defines:
+                    continue
+                live = live & ~defines | used
+            return live
+
+        def live_out(index):
+            live = 0
+            for successor in successors[index]:
+                live |= live_in[successor]
+            return live
+
+        # Blocks are popped from the end so the last block goes first, liveness flows backwards
+        live_in = [0] * len(blocks)
+        worklist = list(range(len(blocks)))
+        queued = set(worklist)
+        while worklist:
+            index = worklist.pop()
+            queued.discard(index)
+            live = transfer(index, live_out(index))
+            if live != live_in[index]:
+                live_in[index] = live
+                for predecessor in predecessors[index]:
+                    if predecessor not in queued:
+                        queued.add(predecessor)
+                        worklist.append(predecessor)
+
+        # Remove the dead instructions
+        for index, block in enumerate(blocks):
+            live = live_out(index)
+            for node, (removable, defines, used) in zip(reversed(block), reversed(summaries[index])):
+                if removable and not live & defines:
+                    self.instructions.remove(node)
+                    self.modified = True
+                    continue
+                live = live & ~defines | used
@@ -0,0 +1,581 @@
+# https://en.wikipedia.org/wiki/LL_parser
+# https://www.geeksforgeeks.org/compiler-design/construction-of-ll1-parsing-table/
+# Table-driven LL(1) parser, an alternative to the hand-written recursive parser in parser.py
+# The grammar below is the grammar from DesignDocument.txt rewritten without left recursion
+# FIRST and FOLLOW sets and the prediction table are computed from it once when the module is imported
+# Parsing is a loop over a stack of grammar symbols, the #actions in the grammar build the same AST and symbol table
+
+import AST
+import SymbolTable
+from lexer import TokenType, Token
+from Errors import ParsingError
+
+# Grammar notation
+# UPPERCASE names are token types, lowercase names are nonterminals, #names are semantic actions
+# An empty alternative is written as ε
+GRAMMAR = """
+program         -> decl #add_child program
+                 | ε
+decl            -> type #push_token IDENTIFIER #push_token decl_tail
+local_decl      -> var_type #push_token IDENTIFIER #push_token decl_tail
+decl_tail       -> #func_begin LEFT_PAREN params RIGHT_PAREN LEFT_BRACE stmt_list #add_child RIGHT_BRACE #end_scope
+                 | #var_begin var_tail
+var_tail        -> ASSIGN #assign_begin bool_expr #add_child #end_type SEMICOLON
+                 | SEMICOLON #no_init
+type            -> INT | FLOAT | CHAR | VOID
+var_type        -> INT | FLOAT | CHAR
+params          -> param params_tail
+                 | ε
+params_tail     -> COMMA param params_tail
+                 | ε
+param           -> var_type #push_token IDENTIFIER #add_param
+stmt_list       -> #stmt_list stmts
+stmts           -> stmt #add_child stmts
+                 | ε
+stmt            -> return_stmt
+                 | if_stmt
+                 | while_stmt
+                 | for_stmt
+                 | local_decl
+                 | IDENTIFIER #ident_stmt ident_tail SEMICOLON
+ident_tail      -> LEFT_PAREN #call_begin call_args RIGHT_PAREN
+                 | ASSIGN #assign_begin bool_expr #add_child #end_type
+return_stmt     -> RETURN #return_begin bool_expr #add_child #end_type SEMICOLON
+if_stmt         -> IF #if_begin LEFT_PAREN #condition_type bool_expr #add_child #end_type RIGHT_PAREN LEFT_BRACE #block_begin stmt_list #add_child RIGHT_BRACE #end_scope #pop_node else_part
+else_part       -> ELSE #else_begin else_body #pop_node
+                 | ε
+else_body       -> if_stmt #add_child
+                 | LEFT_BRACE #block_begin stmt_list #add_child RIGHT_BRACE #end_scope
+while_stmt      -> WHILE #push_node LEFT_PAREN #condition_type bool_expr #add_child #end_type RIGHT_PAREN LEFT_BRACE #block_begin stmt_list #add_child RIGHT_BRACE #end_scope
+for_stmt        -> FOR #push_node #block_begin LEFT_PAREN for_init #add_child #condition_type bool_expr #add_child #end_type SEMICOLON expr_stmt #add_child RIGHT_PAREN LEFT_BRACE #block_begin stmt_list #add_child RIGHT_BRACE #end_scope #end_scope
+for_init        -> local_decl
+                 | expr_stmt SEMICOLON
+expr_stmt       -> IDENTIFIER #assign_target ASSIGN #assign_begin bool_expr #add_child #end_type
+bool_expr       -> expr bool_tail
+bool_tail       -> comparison_op #push_node expr #reduce
+                 | ε
+comparison_op   -> EQUAL | NOT_EQUAL | LESS_THAN | GREATER_THAN
+expr            -> term expr_tail
+expr_tail       -> add_op #push_node term #reduce expr_tail
+                 | ε
+add_op          -> PLUS | MINUS
+term            -> factor term_tail
+term_tail       -> mul_op #push_node factor #reduce term_tail
+                 | ε
+mul_op          -> MULTIPLY | DIVIDE
+factor          -> LEFT_PAREN bool_expr RIGHT_PAREN
+                 | NUMBER #literal
+                 | FLOATING_NUMBER #literal
+                 | CHARACTER #literal
+                 | IDENTIFIER #factor_identifier factor_tail
+factor_tail     -> LEFT_PAREN #call_begin call_args RIGHT_PAREN
+                 | ε
+call_args       -> #args_begin arg args_tail #args_end
+                 | ε
+args_tail       -> COMMA arg args_tail
+                 | ε
+arg             -> #arg_begin bool_expr #arg_end
+"""
+
+START_SYMBOL = "program"
+EMPTY = "ε"
+END = "$"
+
+# Error messages when no production fits the lookahead, the same ones the recursive parser gives
+ERROR_MESSAGES = {
+    "program": "Unexpected type {value}",
+    "decl": "Unexpected type {value}",
+    "type": "Unexpected type {value}",
+    "params": "Unexpected type {value}",
+    "param": "Unexpected type {value}",
+    "var_type": "Unexpected type {value}",
+    "stmt": "Unexpected token {value} in statement",
+    "stmts": "Unexpected token {value} in statement",
+    "factor": "Unexpected token {value} in expression",
+}
+
+# Type that a literal has to be used as
+LITERAL_TYPES = {
+    TokenType.NUMBER: "int",
+    TokenType.FLOATING_NUMBER: "float",
+    TokenType.CHARACTER: "char",
+}
+
+
+# Grammar loaded from text with its FIRST and FOLLOW sets and LL(1) prediction table
+# productions - list of (nonterminal, right hand side symbols)
+# table[nonterminal][token type or END] - index of the production to use
+# empty_productions[nonterminal] - index of its empty production if it has one
+class Grammar:
+    def __init__(self, text, start_symbol):
+        self.start_symbol = start_symbol
+        self.productions = []
+        self.nonterminals = []
+        self.load(text)
+        self.first = self.compute_first()
+        self.follow = self.compute_follow()
+        self.table = self.build_table()
+        self.expanded_table = self.build_expanded_table()
+
+    # Reads rules like "name -> a b | c" with extra alternatives on lines starting with |
+    def load(self, text):
+        current = None
+        for line in text.strip().splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if '->' in line:
+                current, alternatives = line.split('->', 1)
+                current = current.strip()
+                self.nonterminals.append(current)
+            elif line.startswith('|'):
+                alternatives = line[1:]
+            else:
+                raise ValueError(f"Bad grammar line: {line}")
+
+            for alternative in alternatives.split('|'):
+                symbols = [self.to_symbol(name) for name in alternative.split() if name != EMPTY]
+                self.productions.append((current, symbols))
+
+        for _, symbols in self.productions:
+            for symbol in symbols:
+                if isinstance(symbol, str) and not symbol.startswith('#') and symbol not in self.nonterminals:
+                    raise ValueError(f"Nonterminal {symbol} has no rule")
+
+    # Token type names become TokenType values, everything else stays a string
+    def to_symbol(self, name):
+        if name.isupper():
+            return TokenType[name]
+        return name
+
+    def is_nonterminal(self, symbol):
+        return isinstance(symbol, str) and not symbol.startswith('#')
+
+    # Grammar symbols of a right hand side without the actions
+    def grammar_symbols(self, symbols):
+        return [symbol for symbol in symbols if not (isinstance(symbol, str) and symbol.startswith('#'))]
+
+    # FIRST set of a sequence of symbols, EMPTY is in it if the whole sequence can be empty
+    def first_of_sequence(self, symbols, first):
+        result = set()
+        for symbol in self.grammar_symbols(symbols):
+            if not self.is_nonterminal(symbol):
+                result.add(symbol)
+                return result
+            result |= first[symbol] - {EMPTY}
+            if EMPTY not in first[symbol]:
+                return result
+        result.add(EMPTY)
+        return result
+
+    def compute_first(self):
+        first = {nonterminal: set() for nonterminal in self.nonterminals}
+        changed = True
+        while changed:
+            changed = False
+            for nonterminal, symbols in self.productions:
+                before = len(first[nonterminal])
+                first[nonterminal] |= self.first_of_sequence(symbols, first)
+                changed |= len(first[nonterminal]) != before
+        return first
+
+    def compute_follow(self):
+        follow = {nonterminal: set() for nonterminal in self.nonterminals}
+        follow[self.start_symbol].add(END)
+        changed = True
+        while changed:
+            changed = False
+            for nonterminal, symbols in self.productions:
+                symbols = self.grammar_symbols(symbols)
+                for index, symbol in enumerate(symbols):
+                    if not self.is_nonterminal(symbol):
+                        continue
+                    before = len(follow[symbol])
+                    rest = self.first_of_sequence(symbols[index + 1:], self.first)
+                    follow[symbol] |= rest - {EMPTY}
+                    if EMPTY in rest:
+                        follow[symbol] |= follow[nonterminal]
+                    changed |= len(follow[symbol]) != before
+        return follow
+
+    # Fills the prediction table, two productions for the same cell means the grammar is not LL(1)
+    def build_table(self):
+        table = {nonterminal: {} for nonterminal in self.nonterminals}
+        self.empty_productions = {}
+        for index, (nonterminal, symbols) in enumerate(self.productions):
+            lookaheads = self.first_of_sequence(symbols, self.first)
+            if EMPTY in lookaheads:
+                self.empty_productions[nonterminal] = index
+                lookaheads = (lookaheads - {EMPTY}) | self.follow[nonterminal]
+            for lookahead in lookaheads:
+                if lookahead in table[nonterminal]:
+                    raise ValueError(f"Grammar is not LL(1): {nonterminal} has two productions for {lookahead}")
+                table[nonterminal][lookahead] = index
+        return table
+
+    # Right hand side of every table cell with the nonterminals it starts with already expanded
+    # Until a terminal is matched the lookahead stays the same, so the production a leading nonterminal
+    # picks is known when the table is built and the parser doesn't have to look it up while parsing
+    # A nonterminal with no cell for the lookahead is left for the parser so its errors stay the same
+    def build_expanded_table(self):
+        expanded_table = {nonterminal: {} for nonterminal in self.nonterminals}
+        for nonterminal, cells in self.table.items():
+            for lookahead, index in cells.items():
+                symbols, _ = self.expand(self.productions[index][1], lookahead)
+                expanded_table[nonterminal][lookahead] = symbols
+        return expanded_table
+
+    # Returns the expanded symbols and whether expanding stopped before the end of symbols
+    def expand(self, symbols, lookahead):
+        expanded = []
+        for index, symbol in enumerate(symbols):
+            if not self.is_nonterminal(symbol):
+                if isinstance(symbol, TokenType):
+                    expanded.extend(symbols[index:])
+                    return expanded, True
+                expanded.append(symbol)
+                continue
+            production = self.table[symbol].get(lookahead)
+            if production is None:
+                expanded.extend(symbols[index:])
+                return expanded, True
+            nested, stopped = self.expand(self.productions[production][1], lookahead)
+            expanded.extend(nested)
+            if stopped:
+                expanded.extend(symbols[index + 1:])
+                return expanded, True
+        return expanded, False
+
+
+LL1_GRAMMAR = Grammar(GRAMMAR, START_SYMBOL)
+
+
+# One function that runs the actions in order
+def run_all(actions):
+    if len(actions) == 1:
+        return actions[0]
+    actions = tuple(actions)
+
+    def run():
+        for action in actions:
+            action()
+    return run
+
+
+class LL1Parser:
+    # arena - build the AST in an AST.ASTArena like Parser(arena=True)
+    def __init__(self, grammar=LL1_GRAMMAR, arena=False):
+        self.grammar = grammar
+        self.tokens = []
+        self.token_stream = iter(self.tokens)
+        self.lookahead = None
+        self.previous = None
+        self.symbol_table = SymbolTable.symbol_table()
+        self.arena = AST.ASTArena(self.symbol_table.symbols) if arena else None
+        self.new_node = self.arena.new_node if arena else AST.AST
+
+        # Semantic stacks used by the actions
+        # values - AST nodes and tokens that are still being put together
+        # scopes - name of the scope declarations go into
+        # types - type the expression being parsed has to have
+        # arguments - [parameters, index of the next one] for every call whose arguments are being parsed
+        self.values = []
+        self.scopes = []
+        self.types = []
+        self.arguments = []
+
+        # Right hand sides in reverse so they can be pushed onto the parse stack as they are
+        # Actions are replaced with the bound methods that run them
+        self.reversed_productions = [self.reversed_symbols(symbols) for _, symbols in grammar.productions]
+
+        # Expanded right hand side for every table cell, keyed by the lookahead's token type value
+        # since a str hashes faster than a TokenType
+        self.cells = {}
+        for nonterminal, cells in grammar.expanded_table.items():
+            self.cells[nonterminal] = {lookahead if lookahead == END else lookahead._value_: self.reversed_symbols(symbols)
+                                       for lookahead, symbols in cells.items()}
+
+    # Actions next to each other are joined into one function so they take one trip through the parse loop
+    def reversed_symbols(self, symbols):
+        reversed_symbols = []
+        actions = []
+        for symbol in symbols:
+            if isinstance(symbol, str) and symbol.startswith('#'):
+                actions.append(getattr(self, f"action_{symbol[1:]}"))
+                continue
+            if actions:
+                reversed_symbols.append(run_all(actions))
+                actions = []
+            reversed_symbols.append(symbol)
+        if actions:
+            reversed_symbols.append(run_all(actions))
+        return tuple(reversed(reversed_symbols))
+
+    # Move to the next token
+    def consume(self):
+        self.lookahead = next(self.token_stream, None)
+
+    # Make sure the current token matches the expected type
+    def match(self, expected_type):
+        if self.lookahead is None:
+            raise ParsingError(f"Expected {expected_type.value} but reached end of input", 0, 0)
+        elif self.lookahead.type != expected_type:
+            raise ParsingError(f"Expected {expected_type.value} found {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
+        self.previous = self.lookahead
+        self.consume()
+
+    # Main parse function, returns the AST and symbol table like Parser.parse
+    def parse(self, tokens):
+        # Arena nodes point into the tokens so a token stream is kept as a list
+        if self.arena is not None:
+            tokens = self.arena.start(tokens)
+        self.tokens = tokens
+        self.token_stream = iter(tokens)
+        self.consume()
+
+        program_token = Token(TokenType.PARSING_TOKEN, "Program", None, None)
+        program_root = self.new_node(program_token)
+        self.values = [program_root]
+        self.scopes = ["global"]
+        self.types = []
+        self.arguments = []
+
+        cells = self.cells
+        empty_productions = self.grammar.empty_productions
+        productions = self.reversed_productions
+        stack = [self.grammar.start_symbol]
+        pop = stack.pop
+        extend = stack.extend
+
+        token_stream = self.token_stream
+
+        while stack:
+            symbol = pop()
+
+            # Terminal, match does the same and raises the errors
+            if isinstance(symbol, TokenType):
+                lookahead = self.lookahead
+                if lookahead is None or lookahead.type is not symbol:
+                    self.match(symbol)
+                self.previous = lookahead
+                self.lookahead = next(token_stream, None)
+
+            # Nonterminal, push the expanded right hand side of its table cell
+            # On a token the table has no entry for, a nonterminal that can be empty is left out
+            # so the error comes from the next token match and reads like the recursive parser's
+            elif isinstance(symbol, str):
+                lookahead = self.lookahead.type._value_ if self.lookahead is not None else END
+                symbols = cells[symbol].get(lookahead)
+                if symbols is None:
+                    production = None
+                    if lookahead == END or symbol not in ERROR_MESSAGES:
+                        production = empty_productions.get(symbol)
+                    if production is None:
+                        self.no_production(symbol)
+                    symbols = productions[production]
+                extend(symbols)
+
+            # Semantic action
+            else:
+                symbol()
+
+        if self.arena is not None:
+            self.arena.finish()
+        return program_root, self.symbol_table
+
+    # Raises the error for a lookahead that no production of nonterminal starts with
+    def no_production(self, nonterminal):
+        if self.lookahead is None:
+            raise ParsingError(f"Unexpected end of input while parsing {nonterminal}", 0, 0)
+        if nonterminal in ERROR_MESSAGES:
+            message = ERROR_MESSAGES[nonterminal].format(value=self.lookahead.value)
+        else:
+            expected = sorted(symbol.value for symbol in self.grammar.table[nonterminal] if symbol != END)
+            message = f"Expected one of {', '.join(expected)} found {self.lookahead.value}"
+        raise ParsingError(message, self.lookahead.line, self.lookahead.column)
+
+    # Pop the top value and add it as the last child of the value under it
+    def action_add_child(self):
+        child = self.values.pop()
+        self.values[-1].add_child(child)
+
+    # Push the token that was just matched
+    def action_push_token(self):
+        self.values.append(self.previous)
+
+    # Push a node for the token that was just matched
+    def action_push_node(self):
+        self.values.append(self.new_node(self.previous))
+
+    def action_pop_node(self):
+        self.values.pop()
+
+    def action_end_type(self):
+        self.types.pop()
+
+    def action_end_scope(self):
+        self.scopes.pop()
+
+    # Block of an if/else/while/for or a for header, gets a scope nested in the current one
+    def action_block_begin(self):
+        self.scopes.append(self.symbol_table.new_block(self.scopes[-1]))
+
+    # Function declaration, the function name becomes the scope of its parameters and body
+    def action_func_begin(self):
+        name_token = self.values.pop()
+        type_token = self.values.pop()
+        entry = self.symbol_table.add_symbol(name_token.value, type_token.value, self.scopes[-1], "function", name_token)
+        self.values.append(self.new_node(entry.symbol_token(name_token)))
+        self.scopes.append(name_token.value)
+
+    # Variable declaration, the initial value has to have the variable's type
+    def action_var_begin(self):
+        name_token = self.values.pop()
+        type_token = self.values.pop()
+        entry = self.symbol_table.add_symbol(name_token.value, type_token.value, self.scopes[-1], "variable", name_token)
+        self.values.append(entry.symbol_token(name_token))
+        self.types.append(type_token.value)
+
+    # Declaration without a value does not add anything to the AST
+    def action_no_init(self):
+        self.values.pop()
+        self.values.append(None)
+        self.types.pop()
+
+    def action_add_param(self):
+        type_token = self.values.pop()
+        self.symbol_table.add_symbol(self.previous.value, type_token.value, self.scopes[-1], "parameter", self.previous)
+
+    def action_stmt_list(self):
+        stmt_list_token = Token(TokenType.PARSING_TOKEN, "StmtList", None, None)
+        self.values.append(self.new_node(stmt_list_token))
+
+    # Assignment, the = node gets the variable token under it as its first child
+    def action_assign_begin(self):
+        assign_node = self.new_node(self.previous)
+        assign_node.add_child(self.new_node(self.values.pop()))
+        self.values.append(assign_node)
+
+    # Variable on the left of an assignment statement
+    def action_assign_target(self):
+        entry = self.symbol_table.lookup(self.previous.value, self.scopes[-1])
+        if entry is None:
+            raise ParsingError(f"Undeclared variable {self.previous.value}", self.previous.line, self.previous.column)
+        self.values.append(entry.symbol_token(self.previous))
+        self.types.append(entry.type)
+
+    # Statement starting with an identifier is a function call or an assignment depending on the symbol
+    def action_ident_stmt(self):
+        entry = self.symbol_table.lookup(self.previous.value, self.scopes[-1])
+        if entry is None:
+            raise ParsingError(f"Undeclared variable {self.previous.value}", self.previous.line, self.previous.column)
+        if entry.kind == "function":
+            self.expect_next(TokenType.LEFT_PAREN)
+            self.values.append(self.new_node(entry.symbol_token(self.previous)))
+        else:
+            self.expect_next(TokenType.ASSIGN)
+            self.values.append(entry.symbol_token(self.previous))
+            self.types.append(entry.type)
+
+    # Raise the same error match would if the lookahead is not of the expected type
+    def expect_next(self, expected_type):
+        if self.lookahead is None:
+            raise ParsingError(f"Expected {expected_type.value} but reached end of input", 0, 0)
+        if self.lookahead.type != expected_type:
+            raise ParsingError(f"Expected {expected_type.value} found {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
+
+    # Return statement, the value has to have the function's return type
+    def action_return_begin(self):
+        self.values.append(self.new_node(self.previous))
+        function = self.symbol_table.function_of(self.scopes[-1])
+        function_entry = self.symbol_table.lookup(function, function)
+        self.types.append(function_entry.type)
+
+    # If statement, pushes the IfStmt node and the if node that the condition and block go under
+    def action_if_begin(self):
+        if_token_list = Token(TokenType.PARSING_TOKEN, "IfStmt", None, None)
+        if_stmt_list = self.new_node(if_token_list)
+        if_stmt = self.new_node(self.previous)
+        if_stmt_list.add_child(if_stmt)
+        self.values.append(if_stmt_list)
+        self.values.append(if_stmt)
+
+    # Else goes under the IfStmt node, its block or else if goes under the else node
+    def action_else_begin(self):
+        else_stmt = self.new_node(self.previous)
+        self.values[-1].add_child(else_stmt)
+        self.values.append(else_stmt)
+
+    # Conditions take their type from their first token like in the recursive parser
+    def action_condition_type(self):
+        type = None
+        if self.lookahead is not None:
+            if self.lookahead.type in LITERAL_TYPES:
+                type = LITERAL_TYPES[self.lookahead.type]
+            elif self.lookahead.type == TokenType.IDENTIFIER:
+                entry = self.symbol_table.lookup(self.lookahead.value, self.scopes[-1])
+                if entry is None:
+                    raise ParsingError(f"Undeclared variable {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
+                type = entry.type
+        self.types.append(type)
+
+    # Make the operator under the right operand the parent of both operands
+    def action_reduce(self):
+        right = self.values.pop()
+        operator = self.values.pop()
+        left = self.values.pop()
+        operator.add_child(left)
+        operator.add_child(right)
+        self.values.append(operator)
+
+    # Number, float or char literal, it has to have the expression's type
+    def action_literal(self):
+        type = self.types[-1]
+        literal_type = LITERAL_TYPES[self.previous.type]
+        if type != literal_type:
+            raise ParsingError(f"Cannot convert {type} to {literal_type}", self.previous.line, self.previous.column)
+        self.values.append(self.new_node(self.previous))
+
+    # Identifier in an expression is a variable or a call to a function of the expression's type
+    def action_factor_identifier(self):
+        type = self.types[-1]
+        entry = self.symbol_table.lookup(self.previous.value, self.scopes[-1])
+        if entry is not None and entry.kind == "function" and entry.type == type:
+            self.expect_next(TokenType.LEFT_PAREN)
+        elif entry is None:
+            raise ParsingError(f"Undeclared variable {self.previous.value}", self.previous.line, self.previous.column)
+        elif entry.type != type:
+            raise ParsingError(f"Type mismatch: expected {type} but found {entry.type}", self.previous.line, self.previous.column)
+        self.values.append(self.new_node(entry.symbol_token(self.previous)))
+
+    # Only functions can be called
+    def action_call_begin(self):
+        function_token = self.values[-1].get_token()
+        entry = self.symbol_table.lookup(function_token.value, self.scopes[-1])
+        if entry is None or entry.kind != "function":
+            raise ParsingError(f"{function_token.value} is not a function", self.previous.line, self.previous.column)
+
+    # Arguments of a call go under a Parameters node and have to match the parameter types in order
+    def action_args_begin(self):
+        function_name = self.values[-1].get_token().value
+        params = self.symbol_table.get_function_params(function_name)
+        if params is None:
+            raise ParsingError(f"Function expects no arguments but arguments were provided", self.lookahead.line, self.lookahead.column)
+        argument_token = Token(TokenType.PARSING_TOKEN, "Parameters", None, None)
+        self.values.append(self.new_node(argument_token))
+        self.arguments.append([params, 0])
+
+    def action_arg_begin(self):
+        params, index = self.arguments[-1]
+        if index >= len(params):
+            raise ParsingError(f"Expected {TokenType.RIGHT_PAREN.value} found {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
+        self.types.append(params[index].type)
+
+    def action_arg_end(self):
+        self.action_add_child()
+        self.types.pop()
+        self.arguments[-1][1] += 1
+
+    def action_args_end(self):
+        self.arguments.pop()
+        self.action_add_child()
@@ -0,0 +1,102 @@
+from instruction import Instruction, Opcode, Const, BINARY, COMMUTATIVE
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
+
+# https://en.wikipedia.org/wiki/Value_numbering
+# Common subexpression elimination inside a block by local value numbering
+#   - Every value gets a number, a variable has the number of the value it holds and equal constants share one
+#   - An expression is hashed by its opcode and the numbers of its operands, the operands of +, *, == and != are
+#     sorted and x > y is y < x so the same expression written another way has the same hash
+#   - An expression already in the table is replaced with a copy of a variable that still holds its value, the copy is
+#     left for propagation and dead code elimination
+#   - A new value for a variable takes it out of the holders of its old value so a redefined operand is never reused,
+#     a call gives the globals new values since the function can change them
+# Blocks start at labels like CandCPropagation, the table starts empty at every one
+class LocalValueNumbering:
+    def __init__(self, instructions, symbol_table):
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
+        self.global_ids = symbol_table.global_ids()
+
+    def optimize(self):
+        # Symbol id -> number of the value it holds, constant -> its number
+        value_of = {}
+        constant_numbers = {}
+
+        # Number of a value -> symbols that hold it now, in the order they got it
+        holders = {}
+
+        # (opcode, number, number) -> number of the result
+        expressions = {}
+        next_number = 0
+
+        def new_number():
+            nonlocal next_number
+            next_number += 1
+            return next_number
+
+        def number_of(operand):
+            if type(operand) is Const:
+                # 1 and 1.0 are different constants for the generated code
+                key = (type(operand.value), operand.value)
+                if key not in constant_numbers:
+                    constant_numbers[key] = new_number()
+                return constant_numbers[key]
+            if operand.id not in value_of:
+                assign(operand, new_number())
+            return value_of[operand.id]
+
+        # A symbol gets a new value, it no longer holds the old one
+        def forget(symbol_id):
+            number = value_of.pop(symbol_id, None)
+            if number is not None:
+                holders[number] = [holder for holder in holders[number] if holder.id != symbol_id]
+
+        def assign(symbol, number):
+            forget(symbol.id)
+            value_of[symbol.id] = number
+            holders.setdefault(number, []).append(symbol)
+
+        for node in self.instructions.nodes():
+            instr = node.instr
+            opcode = instr.opcode
+            if opcode is Opcode.LABEL or opcode is Opcode.FUNCTION:
+                value_of = {}
+                holders = {}
+                expressions = {}
+
+            elif opcode is Opcode.COPY:
+                if isinstance(instr.arg1, Symbol) or type(instr.arg1) is Const:
+                    assign(instr.result, number_of(instr.arg1))
+                else:
+                    assign(instr.result, new_number())
+
+            elif opcode in BINARY:
+                left, right = number_of(instr.arg1), number_of(instr.arg2)
+                if opcode is Opcode.GT:
+                    key = (Opcode.LT, right, left)
+                elif opcode in COMMUTATIVE and right < left:
+                    key = (opcode, right, left)
+                else:
+                    key = (opcode, left, right)
+
+                number = expressions.get(key)
+                if number is None:
+                    number = expressions[key] = new_number()
+                elif value_of.get(instr.result.id) == number:
+                    # x = a + b when x already holds a + b
+                    self.instructions.remove(node)
+                    self.modified = True
+                    continue
+                elif holders.get(number):
+                    self.instructions.replace(node, Instruction(Opcode.COPY, arg1=holders[number][0], result=instr.result))
+                    self.modified = True
+                assign(instr.result, number)
+
+            elif opcode is Opcode.CALL:
+                for symbol_id in self.global_ids & value_of.keys():
+                    forget(symbol_id)
+                if isinstance(instr.result, Symbol):
+                    assign(instr.result, new_number())
+
+        return self.instructions
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import SymbolTable
+from lexer import TokenType
+from Errors import ParsingError
+
+# Module interface files for separate compilation
+# A file's interface is its global variables and function signatures, other files import it before they are parsed
+# The interface is found with a quick scan of the top level declarations so files that call each other
+# can all get their interfaces before any of them is parsed
+# Interface files are compact JSON:
+#   {"version": 1, "source": hash of the source, "variables": [[name, type]], "functions": [[name, type, [[param, type]]]]}
+
+INTERFACE_VERSION = 1
+INTERFACE_EXTENSION = ".ci"
+
+DECLARATION_TYPES = (TokenType.INT, TokenType.FLOAT, TokenType.CHAR, TokenType.VOID)
+PARAMETER_TYPES = (TokenType.INT, TokenType.FLOAT, TokenType.CHAR)
+
+
+# Hash of a source file, an interface is only scanned again when it changes
+def source_hash(source_code):
+    return hashlib.sha256(source_code.encode()).hexdigest()
+
+
+# Scans the top level declarations of a token list and returns a symbol table with just those symbols
+# Function bodies and initial values are skipped, the parser checks them when the file is compiled
+def scan_interface(tokens):
+    table = SymbolTable.symbol_table()
+    index = 0
+
+    def error(message, token):
+        if token is None:
+            return ParsingError(f"{message} but reached end of input", 0, 0)
+        return ParsingError(f"{message} found {token.value}", token.line, token.column)
+
+    def peek():
+        return tokens[index] if index < len(tokens) else None
+
+    def expect(token_types, message):
+        nonlocal index
+        token = peek()
+        if token is None or token.type not in token_types:
+            raise error(message, token)
+        index += 1
+        return token
+
+    while index < len(tokens):
+        type_token = expect(DECLARATION_TYPES, "Expected type")
+        name_token = expect((TokenType.IDENTIFIER,), "Expected name")
+
+        # Function, add its signature and skip its body
+        if peek() is not None and peek().type == TokenType.LEFT_PAREN:
+            table.add_symbol(name_token.value, type_token.value, "global", "function", name_token)
+            index += 1
+            if peek() is not None and peek().type != TokenType.RIGHT_PAREN:
+                while True:
+                    param_type = expect(PARAMETER_TYPES, "Expected parameter type")
+                    param_name = expect((TokenType.IDENTIFIER,), "Expected parameter name")
+                    table.add_symbol(param_name.value, param_type.value, name_token.value, "parameter", param_name)
+                    if peek() is None or peek().type != TokenType.COMMA:
+                        break
+                    index += 1
+            expect((TokenType.RIGHT_PAREN,), f"Expected {TokenType.RIGHT_PAREN.value}")
+            expect((TokenType.LEFT_BRACE,), f"Expected {TokenType.LEFT_BRACE.value}")
+            depth = 1
+            while depth:
+                token = peek()
+                if token is None:
+                    raise error(f"Expected {TokenType.RIGHT_BRACE.value}", None)
+                if token.type == TokenType.LEFT_BRACE:
+                    depth += 1
+                elif token.type == TokenType.RIGHT_BRACE:
+                    depth -= 1
+                index += 1
+
+        # Global variable, skip its initial value
+        else:
+            table.add_symbol(name_token.value, type_token.value, "global", "variable", name_token)
+            while peek() is not None and peek().type != TokenType.SEMICOLON:
+                index += 1
+            expect((TokenType.SEMICOLON,), f"Expected {TokenType.SEMICOLON.value}")
+
+    return table
+
+
+# Path of the interface file for a source file in build_dir
+def interface_path(build_dir, source_path):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(build_dir, name + INTERFACE_EXTENSION)
+
+
+def write_interface(path, hash, exports):
+    data = {"version": INTERFACE_VERSION, "source": hash}
+    data.update(exports)
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+
+# Returns the interface in path, or None if there is none or it was written by another version
+def read_interface(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INTERFACE_VERSION:
+        return None
+    return data
+
+
+# Only the exported symbols of an interface, what other files import
+def exports_of(interface):
+    return {"variables": interface["variables"], "functions": interface["functions"]}
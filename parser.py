@@ -3,20 +3,85 @@ import SymbolTable
 from lexer import TokenType, Token
 from Errors import ParsingError
 
+# Precedence of binary operators, higher binds tighter
+COMPARISON_PRECEDENCE = 1
+BINARY_PRECEDENCE = {
+    TokenType.EQUAL: COMPARISON_PRECEDENCE,
+    TokenType.NOT_EQUAL: COMPARISON_PRECEDENCE,
+    TokenType.LESS_THAN: COMPARISON_PRECEDENCE,
+    TokenType.GREATER_THAN: COMPARISON_PRECEDENCE,
+    TokenType.PLUS: 2,
+    TokenType.MINUS: 2,
+    TokenType.MULTIPLY: 3,
+    TokenType.DIVIDE: 3,
+}
+
 class Parser:
-    def __init__(self):
+
+    # Parser engines that can be picked when creating a parser
+    # recursive - one method call per grammar rule, nested blocks recurse
+    # stack - nested blocks are kept on an explicit stack so deep nesting can't hit the recursion limit
+    ENGINES = ("recursive", "stack")
+
+    # recover - keep parsing after a ParsingError, the errors are collected in self.errors
+    # and the returned AST only has the statements and declarations that parsed
+    # arena - build the AST in an AST.ASTArena, the returned nodes are ArenaNode views
+    def __init__(self, engine="recursive", recover=False, arena=False):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown parser engine '{engine}', expected one of {', '.join(self.ENGINES)}")
+        self.engine = engine
+        self.recover = recover
+        self.errors = []
         self.tokens = []
+        self.token_stream = iter(self.tokens)
         self.current_token_index = 0
         self.lookahead = None
-        self.symbol_table = SymbolTable.symbol_table()  
+        self.symbol_table = SymbolTable.symbol_table()
+        self.arena = AST.ASTArena(self.symbol_table.symbols) if arena else None
+        self.new_node = self.arena.new_node if arena else AST.AST
+
+    # Builders for the results of expressions and simple statements
+    # The parser builds AST nodes with them, TACParser overrides them to emit TAC while parsing instead
+
+    # Number, character or variable
+    def leaf(self, token):
+        return self.new_node(token)
+
+    # Binary operator with its two operands
+    def binary(self, operator_token, left, right):
+        node = self.new_node(operator_token)
+        node.add_child(left)
+        node.add_child(right)
+        return node
+
+    # Function call, arguments is None when the call has none
+    def call(self, function_token, arguments):
+        node = self.new_node(function_token)
+        if arguments is not None:
+            parameters = self.new_node(Token(TokenType.PARSING_TOKEN, "Parameters", None, None))
+            for argument in arguments:
+                parameters.add_child(argument)
+            node.add_child(parameters)
+        return node
+
+    # Assignment or declaration with a value
+    def assignment(self, assign_token, variable_token, value):
+        node = self.new_node(assign_token)
+        node.add_child(self.new_node(variable_token))
+        node.add_child(value)
+        return node
+
+    def return_stmt(self, return_token, value):
+        node = self.new_node(return_token)
+        node.add_child(value)
+        return node
 
     # Move to the next token 
+    # Tokens are pulled from the stream so a lazy token generator works the same as a list
     def consume(self):
-        if self.current_token_index < len(self.tokens):
-            self.lookahead = self.tokens[self.current_token_index]
+        self.lookahead = next(self.token_stream, None)
+        if self.lookahead is not None:
             self.current_token_index += 1
-        else:
-            self.lookahead = None
         
     # Make sure the current token matches the expected type    
     def match(self, expected_type):
@@ -26,16 +91,59 @@ class Parser:
             raise ParsingError(f"Expected {expected_type.value} found {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
         self.consume()
 
+    # Type of the current token for deciding which rule to parse
+    # Running out of tokens in the middle of a rule is an error instead of a token of type None
+    def peek(self):
+        if self.lookahead is None:
+            raise ParsingError("Unexpected end of input", 0, 0)
+        return self.lookahead.type
+
+    # Panic mode recovery
+    # Records the error and skips tokens to the end of the broken statement
+    # Stops after a ; or after the } that closes a block opened while skipping (and its else blocks)
+    # Stops before a } that closes the enclosing block so the block still ends where it should
+    def recover_from(self, error):
+        if not self.recover:
+            raise error
+
+        # Errors at the end of input are raised once for every open block, only keep the first
+        if not self.errors or str(self.errors[-1]) != str(error):
+            self.errors.append(error)
+
+        depth = 0
+        while self.lookahead is not None:
+            token_type = self.lookahead.type
+            if token_type == TokenType.LEFT_BRACE:
+                depth += 1
+            elif token_type == TokenType.RIGHT_BRACE:
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    self.consume()
+                    if self.lookahead is None or self.lookahead.type != TokenType.ELSE:
+                        return
+                    continue
+            elif token_type == TokenType.SEMICOLON and depth == 0:
+                self.consume()
+                return
+            self.consume()
+
     # Main parse function that starts the parsing process
+    # tokens can be a list of tokens or any iterator of tokens like Lexer.iter_tokens
     def parse(self, tokens):
+        # Arena nodes point into the tokens so a token stream is kept as a list
+        if self.arena is not None:
+            tokens = self.arena.start(tokens)
         self.tokens = tokens
+        self.token_stream = iter(tokens)
         
         # Initialize lookahead token
         self.consume()
 
         # Create root of AST 
         program_token = Token(TokenType.PARSING_TOKEN, "Program", None, None)
-        program_root = AST.AST(program_token)
+        program_root = self.new_node(program_token)
 
         # Start looping through tokens and building AST
         while self.lookahead is not None:
@@ -43,41 +151,47 @@ class Parser:
                 decl = self.parse_decl()
                 if decl is not None:
                     program_root.add_child(decl)
-            except Exception as e:
-                raise
+            except ParsingError as e:
+                self.recover_from(e)
+
+                # A stray } has no block to close at the top level
+                if self.lookahead is not None and self.lookahead.type == TokenType.RIGHT_BRACE:
+                    self.consume()
 
         # Return AST tree and symbol table
+        if self.arena is not None:
+            self.arena.finish()
         return program_root, self.symbol_table
 
     def parse_decl(self, scope = "global"):
         # Get type of function/variable
+        if self.peek() not in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR, TokenType.VOID]:
+            raise ParsingError(f"Unexpected type {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
         type = self.lookahead.value
-        if self.lookahead.type not in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR, TokenType.VOID]:
-            raise ParsingError(f"Unexpected type {type}", self.lookahead.line, self.lookahead.column)
         self.match(self.lookahead.type)
 
         # Get function/variable name
         token = self.lookahead 
-        if self.lookahead.type != TokenType.IDENTIFIER:
+        if self.peek() != TokenType.IDENTIFIER:
             raise ParsingError(f"Expected name but found {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
         self.match(self.lookahead.type)
 
         # Determine if its a function or variable declaration
-        if self.lookahead.type == TokenType.LEFT_PAREN:
-            self.symbol_table.add_symbol(token.value, type, scope, "function")
-            return self.parse_func_decl(token)
+        if self.peek() == TokenType.LEFT_PAREN:
+            entry = self.symbol_table.add_symbol(token.value, type, scope, "function", token)
+            return self.parse_func_decl(entry.symbol_token(token))
         else:
-            self.symbol_table.add_symbol(token.value, type, scope, "variable")
-            return self.parse_var_decl(scope, token, type)
+            entry = self.symbol_table.add_symbol(token.value, type, scope, "variable", token)
+            return self.parse_var_decl(scope, entry.symbol_token(token), type)
 
     # Parses a single function declaration
     def parse_func_decl(self, func_token):
         # Use the actual function name token
-        func_decl = AST.AST(func_token)
+        func_decl = self.new_node(func_token)
 
         # Match the parameter list
         self.match(TokenType.LEFT_PAREN)
-        if self.lookahead.type != TokenType.RIGHT_PAREN:
+        if self.peek() != TokenType.RIGHT_PAREN:
             self.parse_params(func_token.value)
         self.match(TokenType.RIGHT_PAREN)
 
@@ -91,53 +205,122 @@ class Parser:
 
     # Parses function parameters
     def parse_params(self, scope):
+        while True:
+            # Get the type of the parameter
+            if self.peek() not in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
+                raise ParsingError(f"Unexpected type {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
+            type = self.lookahead.value
+            self.match(self.lookahead.type)
 
-        # Get the type of the parameter
-        type = self.lookahead.value
-        if self.lookahead.type not in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
-            raise ParsingError(f"Unexpected type {type}", self.lookahead.line, self.lookahead.column)
-        self.match(self.lookahead.type)
-
-        # Get the name of the parameter
-        arg_token = self.lookahead
-        self.match(TokenType.IDENTIFIER)
-        self.symbol_table.add_symbol(arg_token.value, type, scope, "parameter")
+            # Get the name of the parameter
+            arg_token = self.lookahead
+            self.match(TokenType.IDENTIFIER)
+            self.symbol_table.add_symbol(arg_token.value, type, scope, "parameter", arg_token)
 
-        if self.lookahead.type == TokenType.COMMA:
-            self.match(TokenType.COMMA)
-            self.parse_params(scope)
-        else:
-            return
+            if self.peek() == TokenType.COMMA:
+                self.match(TokenType.COMMA)
+            else:
+                return
 
     # Parses a list of statements
     def parse_stmt_list(self, scope):
-        stmt_list_token = Token(TokenType.PARSING_TOKEN, "StmtList", None, None)
-        stmt_list = AST.AST(stmt_list_token)
+        if self.engine == "stack":
+            return self.parse_stmt_list_with_stack(scope)
+
+        stmt_list = self.new_stmt_list()
 
         while self.lookahead is not None and self.lookahead.type != TokenType.RIGHT_BRACE:
-            stmt = self.parse_stmt(scope)
-            if stmt is not None:
-                stmt_list.add_child(stmt)
+            try:
+                stmt = self.parse_stmt(scope)
+                if stmt is not None:
+                    stmt_list.add_child(stmt)
+            except ParsingError as e:
+                self.recover_from(e)
 
         return stmt_list
 
+    # Creates an empty StmtList node
+    def new_stmt_list(self):
+        stmt_list_token = Token(TokenType.PARSING_TOKEN, "StmtList", None, None)
+        return self.new_node(stmt_list_token)
+
+    # Parses a list of statements without recursing into nested blocks
+    # Every if, else, while and for block that is still open is a frame on the stack
+    # A frame is (kind, node the block belongs to, StmtList of the block, IfStmt node for if blocks, scope of the block)
+    # so nesting depth and else if chains are only limited by memory
+    def parse_stmt_list_with_stack(self, scope):
+        new_block = self.symbol_table.new_block
+        stack = [(None, None, self.new_stmt_list(), None, scope)]
+
+        while True:
+            kind, owner, stmt_list, if_stmt_list, block_scope = stack[-1]
+
+            try:
+                # End of a block
+                if self.lookahead is None or self.lookahead.type == TokenType.RIGHT_BRACE:
+                    if len(stack) == 1:
+                        return stmt_list
+                    stack.pop()
+                    owner.add_child(stmt_list)
+                    self.match(TokenType.RIGHT_BRACE)
+
+                    # Check for optional else part, it is in the scope the if statement is in
+                    if kind == "if" and self.lookahead is not None and self.lookahead.type == TokenType.ELSE:
+                        else_stmt = self.parse_else_header(if_stmt_list)
+                        outer_scope = stack[-1][4]
+
+                        # Check if else is another if, it goes under the else node
+                        if self.peek() == TokenType.IF:
+                            nested_if_list, nested_if = self.parse_if_header(outer_scope)
+                            else_stmt.add_child(nested_if_list)
+                            stack.append(("if", nested_if, self.new_stmt_list(), nested_if_list, new_block(outer_scope)))
+                        else:
+                            self.match(TokenType.LEFT_BRACE)
+                            stack.append(("else", else_stmt, self.new_stmt_list(), None, new_block(outer_scope)))
+                    continue
+
+                # Statements with a block push a frame for the block
+                if self.peek() == TokenType.IF:
+                    nested_if_list, nested_if = self.parse_if_header(block_scope)
+                    stmt_list.add_child(nested_if_list)
+                    stack.append(("if", nested_if, self.new_stmt_list(), nested_if_list, new_block(block_scope)))
+                elif self.peek() == TokenType.WHILE:
+                    while_stmt = self.parse_while_header(block_scope)
+                    stmt_list.add_child(while_stmt)
+                    stack.append(("while", while_stmt, self.new_stmt_list(), None, new_block(block_scope)))
+                elif self.peek() == TokenType.FOR:
+                    for_scope = new_block(block_scope)
+                    for_stmt = self.parse_for_header(for_scope)
+                    stmt_list.add_child(for_stmt)
+                    stack.append(("for", for_stmt, self.new_stmt_list(), None, new_block(for_scope)))
+
+                # Statements without a block
+                else:
+                    stmt = self.parse_stmt(block_scope)
+                    if stmt is not None:
+                        stmt_list.add_child(stmt)
+            except ParsingError as e:
+                self.recover_from(e)
+
     # Parses a single statement
     def parse_stmt(self, scope):
 
-        if self.lookahead.type == TokenType.RETURN:
+        if self.peek() == TokenType.RETURN:
             return self.parse_return_stmt(scope)
-        elif self.lookahead.type == TokenType.IF:
+        elif self.peek() == TokenType.IF:
             return self.parse_IF_stmt(scope)
-        elif self.lookahead.type == TokenType.WHILE:
+        elif self.peek() == TokenType.WHILE:
             return self.parse_while_stmt(scope)
-        elif self.lookahead.type == TokenType.FOR:
+        elif self.peek() == TokenType.FOR:
             return self.parse_for_stmt(scope)
-        elif self.lookahead.type in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
+        elif self.peek() in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
             return self.parse_decl(scope)
-        elif self.lookahead.type == TokenType.IDENTIFIER:
+        elif self.peek() == TokenType.IDENTIFIER:
             valid = self.symbol_table.lookup(self.lookahead.value, scope)
+            if valid is None:
+                raise ParsingError(f"Undeclared variable {self.lookahead.value}", self.lookahead.line, self.lookahead.column)
             if valid.kind == "function":
-                function_identifier = self.lookahead
+                function_identifier = valid.symbol_token(self.lookahead)
                 self.match(TokenType.IDENTIFIER)
                 func_call = self.func_call(function_identifier, scope)
                 self.match(TokenType.SEMICOLON)
@@ -151,13 +334,13 @@ class Parser:
 
     # Determines the type of the next token for boolean expressions
     def get_next_type_for_boolean(self, scope):
-        if self.lookahead.type == TokenType.NUMBER:
+        if self.peek() == TokenType.NUMBER:
             return "int"
-        elif self.lookahead.type == TokenType.FLOATING_NUMBER:
+        elif self.peek() == TokenType.FLOATING_NUMBER:
             return "float"
-        elif self.lookahead.type == TokenType.CHARACTER:
+        elif self.peek() == TokenType.CHARACTER:
             return "char"
-        elif self.lookahead.type == TokenType.IDENTIFIER:
+        elif self.peek() == TokenType.IDENTIFIER:
             valid = self.symbol_table.lookup(self.lookahead.value, scope)
             if valid is not None:
                 return valid.type
@@ -166,68 +349,95 @@ class Parser:
 
     # Parses an if statement
     def parse_IF_stmt(self, scope):
-        # Match if token
-        if_token_list = Token(TokenType.PARSING_TOKEN, "IfStmt", None, None)
-        if_stmt_list = AST.AST(if_token_list)
-        if_stmt = (AST.AST(self.lookahead)) 
-        self.match(TokenType.IF)
-
-        # Match boolean expression
-        self.match(TokenType.LEFT_PAREN)
-        type = self.get_next_type_for_boolean(scope)
-        if_stmt.add_child(self.parse_bool_expr(scope, type))
-        self.match(TokenType.RIGHT_PAREN)
+        if_stmt_list, if_stmt = self.parse_if_header(scope)
 
         # Match statement block
-        self.match(TokenType.LEFT_BRACE)
-        if_stmt.add_child(self.parse_stmt_list(scope))
+        if_stmt.add_child(self.parse_stmt_list(self.symbol_table.new_block(scope)))
         self.match(TokenType.RIGHT_BRACE)
 
-        if_stmt_list.add_child(if_stmt)
-
         # Check for optional else part
-        if self.lookahead.type == TokenType.ELSE:
-            else_stmt = AST.AST(self.lookahead)
-            self.match(TokenType.ELSE)
+        if self.peek() == TokenType.ELSE:
+            else_stmt = self.parse_else_header(if_stmt_list)
 
             # Check if else is another if
-            if self.lookahead.type == TokenType.IF:
+            if self.peek() == TokenType.IF:
                 else_stmt.add_child(self.parse_IF_stmt(scope))
             else:
                 self.match(TokenType.LEFT_BRACE)
-                else_stmt.add_child(self.parse_stmt_list(scope))
+                else_stmt.add_child(self.parse_stmt_list(self.symbol_table.new_block(scope)))
                 self.match(TokenType.RIGHT_BRACE)
-            if_stmt_list.add_child(else_stmt)
 
         return if_stmt_list
-    # Parses a while statement
-    def parse_while_stmt(self, scope):
-        # Match token and create AST node
-        while_stmt = (AST.AST(self.lookahead))
-        self.match(TokenType.WHILE)
 
+    # Parses an if statement up to the { that opens its block
+    # Returns the IfStmt node and the if node that the block belongs to
+    def parse_if_header(self, scope):
+        # Match if token
+        if_token_list = Token(TokenType.PARSING_TOKEN, "IfStmt", None, None)
+        if_stmt_list = self.new_node(if_token_list)
+        if_stmt = (self.new_node(self.lookahead)) 
+        self.match(TokenType.IF)
+        if_stmt_list.add_child(if_stmt)
+        if_stmt.add_child(self.parse_condition(scope))
+        return if_stmt_list, if_stmt
+
+    # Parses the (condition) of an if or while and the { after it
+    def parse_condition(self, scope):
         # Match boolean expression
         self.match(TokenType.LEFT_PAREN)
         type = self.get_next_type_for_boolean(scope)
-        while_stmt.add_child(self.parse_bool_expr(scope, type))
+        condition = self.parse_bool_expr(scope, type)
         self.match(TokenType.RIGHT_PAREN)
 
-        # Match statement block
         self.match(TokenType.LEFT_BRACE)
-        while_stmt.add_child(self.parse_stmt_list(scope))
+        return condition
+
+    # Matches else and adds its node to the IfStmt node
+    def parse_else_header(self, if_stmt_list):
+        else_stmt = self.new_node(self.lookahead)
+        self.match(TokenType.ELSE)
+        if_stmt_list.add_child(else_stmt)
+        return else_stmt
+
+    # Parses a while statement
+    def parse_while_stmt(self, scope):
+        while_stmt = self.parse_while_header(scope)
+
+        # Match statement block
+        while_stmt.add_child(self.parse_stmt_list(self.symbol_table.new_block(scope)))
         self.match(TokenType.RIGHT_BRACE)
 
         return while_stmt
 
+    # Parses a while statement up to the { that opens its block
+    def parse_while_header(self, scope):
+        # Match token and create AST node
+        while_stmt = (self.new_node(self.lookahead))
+        self.match(TokenType.WHILE)
+        while_stmt.add_child(self.parse_condition(scope))
+        return while_stmt
+
     # Parses a for statement
+    # Variables declared in the header are in a scope of their own that the block is nested in
     def parse_for_stmt(self, scope):
+        for_scope = self.symbol_table.new_block(scope)
+        for_stmt = self.parse_for_header(for_scope)
+
+        # Match statement block
+        for_stmt.add_child(self.parse_stmt_list(self.symbol_table.new_block(for_scope)))
+        self.match(TokenType.RIGHT_BRACE)
+
+        return for_stmt
+
+    # Parses a for statement up to the { that opens its block
+    def parse_for_header(self, scope):
         # Match token and create AST node
-        for_stmt = (AST.AST(self.lookahead))
+        for_stmt = (self.new_node(self.lookahead))
         self.match(TokenType.FOR)
 
         # Match initalization
         self.match(TokenType.LEFT_PAREN)
-        if self.lookahead.type in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
+        if self.peek() in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
             init_decl = self.parse_decl(scope)
             for_stmt.add_child(init_decl)
         else:
@@ -246,23 +456,18 @@ class Parser:
         for_stmt.add_child(iter_expr)
         self.match(TokenType.RIGHT_PAREN)
 
-        # Match statement block
         self.match(TokenType.LEFT_BRACE)
-        for_stmt.add_child(self.parse_stmt_list(scope))
-        self.match(TokenType.RIGHT_BRACE)
-
         return for_stmt
 
     # Parses a variable declaration
     def parse_var_decl(self, scope, variable_name, variable_type):
 
         # Check for optional initialization
-        if self.lookahead.type == TokenType.ASSIGN:
-            variable_declaration = AST.AST(self.lookahead)  
+        if self.peek() == TokenType.ASSIGN:
+            assign_token = self.lookahead
             self.match(TokenType.ASSIGN)
 
-            variable_declaration.add_child(AST.AST(variable_name))
-            variable_declaration.add_child(self.parse_bool_expr(scope, variable_type))
+            variable_declaration = self.assignment(assign_token, variable_name, self.parse_bool_expr(scope, variable_type))
             self.match(TokenType.SEMICOLON)
             return variable_declaration
         else:
@@ -276,164 +481,143 @@ class Parser:
         if valid is None:
             raise ParsingError(f"Undeclared variable {identifier_token.value}", identifier_token.line, identifier_token.column)
 
-        expr_stmt = AST.AST(self.lookahead)  
+        assign_token = self.lookahead
         self.match(TokenType.ASSIGN)
 
         variable_type = valid.type  
-        expr_stmt.add_child(AST.AST(identifier_token))
-        expr_stmt.add_child(self.parse_bool_expr(scope, variable_type))
-        return expr_stmt
+        return self.assignment(assign_token, valid.symbol_token(identifier_token), self.parse_bool_expr(scope, variable_type))
 
     # Parses a return statement
     def parse_return_stmt(self, scope):
         # Get the return token and match it
         return_token = self.lookahead
         self.match(TokenType.RETURN)
-        return_stmt = AST.AST(return_token)
 
         # Get the return type from the symbol table 
-        return_type = self.symbol_table.lookup(scope, scope)
+        function = self.symbol_table.function_of(scope)
+        return_type = self.symbol_table.lookup(function, function)
 
         # Parse the expression part of return 
-        return_stmt.add_child(self.parse_bool_expr(scope, return_type.type))
+        return_stmt = self.return_stmt(return_token, self.parse_bool_expr(scope, return_type.type))
         self.match(TokenType.SEMICOLON)
      
         return return_stmt
     
     # Parses a boolean expression
     def parse_bool_expr(self, scope, type):
-
-        left = self.parse_expr(scope, type)
-        if self.lookahead.type in [TokenType.EQUAL, TokenType.NOT_EQUAL, TokenType.LESS_THAN, TokenType.GREATER_THAN]:
-            bool_operator = AST.AST(self.lookahead)
-            self.match(self.lookahead.type)
-
-            right = self.parse_expr(scope, type)
-            bool_operator.add_child(left)
-            bool_operator.add_child(right)
-            return bool_operator
-        else:
-                return left
+        return self.parse_binary_expr(scope, type, COMPARISON_PRECEDENCE)
 
     # Parses an expression
     def parse_expr(self, scope, type):
-        term = self.parse_term(scope, type)
+        return self.parse_binary_expr(scope, type, COMPARISON_PRECEDENCE + 1)
 
-        # See if there's an etail 
-        if self.lookahead.type in [TokenType.PLUS, TokenType.MINUS]:
-            etail = self.parse_etail(scope, term, type)
-            return etail
-        else:
-            return term
+    # Parses binary operators with at least min_precedence using precedence climbing
+    # Operators and operands are kept on stacks so long chains like a + b + c + ... are parsed with a loop
+    # Operators of the same precedence group to the left so a - b - c is (a - b) - c
+    # Only one comparison is allowed like in the grammar, a second one is left for the caller to reject
+    def parse_binary_expr(self, scope, type, min_precedence):
+        operands = [self.parse_factor(scope, type)]
+        operators = []
+        seen_comparison = False
+
+        while self.lookahead is not None:
+            precedence = BINARY_PRECEDENCE.get(self.lookahead.type)
+            if precedence is None or precedence < min_precedence:
+                break
+            if precedence == COMPARISON_PRECEDENCE:
+                if seen_comparison:
+                    break
+                seen_comparison = True
 
-    # Parses a term
-    def parse_term(self, scope, type):
-        factor = self.parse_factor(scope, type)
+            # Finish everything on the stack that binds at least as tight as this operator
+            while operators and BINARY_PRECEDENCE[operators[-1].type] >= precedence:
+                self.reduce_binary(operators, operands)
 
-        # See if there's a ttail
-        if self.lookahead.type in [TokenType.MULTIPLY, TokenType.DIVIDE]:
-            ttail = self.parse_ttail(scope, factor, type)
-            return ttail
-        else:
-            return factor
+            operators.append(self.lookahead)
+            self.match(self.lookahead.type)
+            operands.append(self.parse_factor(scope, type))
+
+        while operators:
+            self.reduce_binary(operators, operands)
+        return operands[0]
+
+    # Pops the top operator token and builds it with its two operands
+    def reduce_binary(self, operators, operands):
+        operator = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(self.binary(operator, left, right))
 
     # Parses a factor
     def parse_factor(self, scope, type):
 
         # Parenthesis
-        if self.lookahead.type == TokenType.LEFT_PAREN:
+        if self.peek() == TokenType.LEFT_PAREN:
             self.match(TokenType.LEFT_PAREN)
             expr = self.parse_bool_expr(scope, type)
             self.match(TokenType.RIGHT_PAREN)
             return expr
         # Ints
-        elif self.lookahead.type == TokenType.NUMBER:
+        elif self.peek() == TokenType.NUMBER:
             if type != "int":
                 raise ParsingError(f"Cannot convert {type} to int", self.lookahead.line, self.lookahead.column)
             number_token = self.lookahead
             self.match(TokenType.NUMBER)
-            return AST.AST(number_token)
+            return self.leaf(number_token)
         # Identifiers/Vars
-        elif self.lookahead.type == TokenType.IDENTIFIER:
+        elif self.peek() == TokenType.IDENTIFIER:
             identifier_token = self.lookahead
             self.match(TokenType.IDENTIFIER)
             valid = self.symbol_table.lookup(identifier_token.value, scope)
 
             if (valid is not None and valid.kind == "function") and (valid.type == type):
                 # Function call
-                return self.func_call(identifier_token, scope)
+                return self.func_call(valid.symbol_token(identifier_token), scope)
             else:
                 # make sure variable or function is declared and types match
                 if valid is None :
                     raise ParsingError(f"Undeclared variable {identifier_token.value}", identifier_token.line, identifier_token.column)
                 elif valid.type != type:
                     raise ParsingError(f"Type mismatch: expected {type} but found {valid.type}", identifier_token.line, identifier_token.column)
-                return AST.AST(identifier_token)
+                return self.leaf(valid.symbol_token(identifier_token))
         # Floats
-        elif self.lookahead.type == TokenType.FLOATING_NUMBER:
+        elif self.peek() == TokenType.FLOATING_NUMBER:
             if type != "float":
                 raise ParsingError(f"Cannot convert {type} to float", self.lookahead.line, self.lookahead.column)
             float_token = self.lookahead
             self.match(TokenType.FLOATING_NUMBER)
-            return AST.AST(float_token)
+            return self.leaf(float_token)
         
         # Chars
-        elif self.lookahead.type == TokenType.CHARACTER:
+        elif self.peek() == TokenType.CHARACTER:
             if type != "char":
                 raise ParsingError(f"Cannot convert {type} to char", self.lookahead.line, self.lookahead.column)
             char_token = self.lookahead
             self.match(TokenType.CHARACTER)
-            return AST.AST(char_token)
-
-    # Parses etail for right side of expressions
-    def parse_etail(self, scope, left, type):
-        etail = AST.AST(self.lookahead)
-        etail.add_child(left)
-        self.match(self.lookahead.type)
-        term = self.parse_term(scope, type)
-        if self.lookahead.type in [TokenType.PLUS, TokenType.MINUS]:
-            next_etail = self.parse_etail(scope, term, type)
-            etail.add_child(next_etail)
-            return etail
+            return self.leaf(char_token)
         else:
-            etail.add_child(term)
-            return etail
+            raise ParsingError(f"Unexpected token {self.lookahead.value} in expression", self.lookahead.line, self.lookahead.column)
 
-    # Parses ttail for right side of terms
-    def parse_ttail(self, scope, left, type):
-        ttail = AST.AST(self.lookahead)
-        ttail.add_child(left)
-        self.match(self.lookahead.type)
-        factor = self.parse_factor(scope, type)
-        if self.lookahead.type in [TokenType.MULTIPLY, TokenType.DIVIDE]:
-            next_ttail = self.parse_ttail(scope, factor, type)
-            ttail.add_child(next_ttail)
-            return ttail
-        else:
-            ttail.add_child(factor)
-            return ttail
-        
     # Parses a function call
     def func_call(self, function_identifier, scope):
-        func_token = AST.AST(function_identifier)  
+        arguments = None
         self.match(TokenType.LEFT_PAREN)
-        if self.lookahead.type != TokenType.RIGHT_PAREN:
-            func_token.add_child(self.parse_args(scope, self.symbol_table.get_function_params(function_identifier.value)))
+        if self.peek() != TokenType.RIGHT_PAREN:
+            arguments = self.parse_args(scope, self.symbol_table.get_function_params(function_identifier.value))
         self.match(TokenType.RIGHT_PAREN)
-        return func_token
+        return self.call(function_identifier, arguments)
     
-    # Parses function call arguments
+    # Parses function call arguments and returns the list of them
     def parse_args(self, scope, params):
         if params is None:
             raise ParsingError(f"Function expects no arguments but arguments were provided", self.lookahead.line, self.lookahead.column)
 
-        argument_token = Token(TokenType.PARSING_TOKEN, "Parameters", None, None)
-        args = AST.AST(argument_token)
+        args = []
 
         for param in params:
             arg = self.parse_bool_expr(scope, param.type)
-            args.add_child(arg)
-            if self.lookahead.type == TokenType.COMMA:
+            args.append(arg)
+            if self.peek() == TokenType.COMMA:
                 self.match(TokenType.COMMA)
             else:
                 break
@@ -0,0 +1,129 @@
+import itertools
+import constantFoldingOptimization
+import tempVariableRemoverOptimization
+import algebraicSimplificationOptimization
+import candcPropagation
+import easyDeadCodeElimination
+import livenessDeadCodeElimination
+import localValueNumbering
+import globalCommonSubexpressionElimination
+import sparseConditionalConstantPropagation
+from instructionList import as_instruction_list
+
+# https://llvm.org/docs/NewPassManager.html
+# Runs optimization passes by name in named pipelines
+# A pipeline is a list of steps, a step is the name of a pass that runs once or a tuple of names that run to a fixed point
+# Fixed points use a worklist instead of running every pass again each round:
+#   - Every pass starts on the worklist, the first one in the step's order runs next
+#   - A pass reports if it changed the TAC through its modified flag
+#   - A pass that changed the TAC puts back the passes registered as woken by it, the others can't find anything new
+#   - Stops when the worklist is empty or a pass has run max_iterations times, then capped is True
+#     (max_iterations None runs until the worklist is empty, every pass only ever makes the TAC smaller or simpler)
+
+
+# Pass that the PassManager can run
+# factory - called with the InstructionList, returns an object whose optimize() edits it in place and sets modified
+# wakes - names of the passes that can find more to do after this pass changes the TAC
+class PassInfo:
+    def __init__(self, name, factory, wakes=()):
+        self.name = name
+        self.factory = factory
+        self.wakes = tuple(wakes)
+
+
+class PassManager:
+
+    def __init__(self, max_iterations=None):
+        self.passes = {}
+        self.pipelines = {}
+        self.max_iterations = max_iterations
+        self.capped = False
+
+        # Name of a pass -> [times it ran, times it changed the TAC]
+        self.stats = {}
+
+    def register(self, name, factory, wakes=()):
+        self.passes[name] = PassInfo(name, factory, wakes)
+
+    # Unknown passes are an error when the pipeline is added, not when it runs
+    def add_pipeline(self, name, steps):
+        for step in steps:
+            for pass_name in (step if type(step) is tuple else (step,)):
+                if pass_name not in self.passes:
+                    raise ValueError(f"Unknown pass '{pass_name}' in pipeline {name}")
+        self.pipelines[name] = list(steps)
+
+    # Runs a pipeline on a list or InstructionList and returns the InstructionList
+    def run(self, pipeline, instructions):
+        if pipeline not in self.pipelines:
+            raise ValueError(f"Unknown pipeline '{pipeline}', expected one of {', '.join(self.pipelines)}")
+        instructions = as_instruction_list(instructions)
+        for step in self.pipelines[pipeline]:
+            if type(step) is tuple:
+                self.run_to_fixed_point(step, instructions)
+            else:
+                self.run_pass(step, instructions)
+        return instructions
+
+    # Runs one pass, returns True if it changed the TAC
+    def run_pass(self, name, instructions):
+        optimization = self.passes[name].factory(instructions)
+        optimization.optimize()
+        stats = self.stats.setdefault(name, [0, 0])
+        stats[0] += 1
+        if optimization.modified:
+            stats[1] += 1
+        return optimization.modified
+
+    def run_to_fixed_point(self, names, instructions):
+        pending = [True] * len(names)
+        runs = [0] * len(names)
+        index_of = {name: index for index, name in enumerate(names)}
+        while True in pending:
+            index = pending.index(True)
+            if runs[index] == self.max_iterations:
+                self.capped = True
+                return
+            pending[index] = False
+            runs[index] += 1
+            if self.run_pass(names[index], instructions):
+                for woken in self.passes[names[index]].wakes:
+                    if woken in index_of:
+                        pending[index_of[woken]] = True
+
+
+# Dependencies between the passes
+#   temp - a computation that now goes straight into a variable can be simplified, folded or propagated
+#   sccp - constants and removed branches leave arithmetic to simplify and definitions that are dead
+#   lvn - reused expressions are copies to propagate and leave the temps they went into dead
+#   gcse - the same as lvn across blocks
+#   algebraic - new copies to propagate, x - x and x * 0 drop a use so its definition can be dead
+#   fold - new constant copies to propagate
+#   propagate - constants in arithmetic can be simplified or folded, replaced uses can leave definitions dead,
+#               a propagated copy can be propagated further
+#   dce - a removed instruction's uses are gone so more definitions can be dead
+#   liveness - removes every dead assignment it can find in one run, nothing is left for it or the others
+# Passes that make new constants wake sccp so they reach other blocks, passes that turn arithmetic into
+# copies or constants wake lvn, propagation only finds copies lvn already sees through
+def standard_pass_manager(symbol_table, max_iterations=None):
+    manager = PassManager(max_iterations)
+
+    # Numbers of the temps gcse keeps values in, shared by its runs so every temp gets its own name
+    cse_numbers = itertools.count()
+    manager.register("temp", tempVariableRemoverOptimization.tempVarRemover, wakes=("sccp", "lvn", "gcse", "algebraic", "fold", "propagate", "dce", "liveness"))
+    manager.register("sccp", lambda instructions: sparseConditionalConstantPropagation.SparseConditionalConstantPropagation(instructions, symbol_table),
+                     wakes=("lvn", "gcse", "algebraic", "propagate", "dce", "liveness"))
+    manager.register("lvn", lambda instructions: localValueNumbering.LocalValueNumbering(instructions, symbol_table), wakes=("propagate", "dce", "liveness"))
+    manager.register("gcse", lambda instructions: globalCommonSubexpressionElimination.GlobalCommonSubexpressionElimination(instructions, symbol_table, cse_numbers),
+                     wakes=("lvn", "propagate", "dce", "liveness"))
+    manager.register("algebraic", algebraicSimplificationOptimization.AlgebraicSimplificationOptimization, wakes=("sccp", "lvn", "gcse", "propagate", "dce", "liveness"))
+    manager.register("fold", constantFoldingOptimization.ConstantFoldingOptimization, wakes=("sccp", "lvn", "gcse", "propagate"))
+    manager.register("propagate", lambda instructions: candcPropagation.CandCPropagation(instructions, symbol_table), wakes=("sccp", "gcse", "algebraic", "fold", "propagate", "dce", "liveness"))
+    manager.register("dce", easyDeadCodeElimination.EasyDeadCodeElimination, wakes=("dce",))
+    manager.register("liveness", lambda instructions: livenessDeadCodeElimination.LivenessDeadCodeElimination(instructions, symbol_table))
+
+    # O1 is -o1, O2 is -o2, O3 adds the passes that look across blocks
+    manager.add_pipeline("O1", ["fold", "temp"])
+    manager.add_pipeline("O2", ["temp", ("lvn", "algebraic", "fold", "propagate", "liveness")])
+    manager.add_pipeline("O3", ["temp", ("sccp", "lvn", "gcse", "algebraic", "fold", "propagate", "liveness")])
+    return manager
@@ -0,0 +1,163 @@
+import heapq
+from basicBlockGenerator import BasicBlockGenerator
+from constantFoldingOptimization import fold
+from instruction import Instruction, Opcode, Const, BINARY
+from instructionList import as_instruction_list
+from SymbolTable import Symbol
+
+# https://en.wikipedia.org/wiki/Sparse_conditional_constant_propagation
+# https://www.cs.utexas.edu/~pingali/CS380C/2010/papers/p181-wegman.pdf
+# Constant propagation across the basic blocks of a function that only follows the branches that can be taken
+#   - Blocks and the CFG come from BasicBlockGenerator, only the entry block is executable at first
+#   - The constants known at the start of a block are the ones all its executable predecessors agree on
+#   - An if whose condition is a known constant only makes the edge it takes executable, so code on the
+#     other side can't spoil the constants
+#   - A block is only looked at again when a new edge into it becomes executable or its constants change,
+#     constants are only ever lost so this stops
+# Then in every executable block known variables are replaced with their constants, arithmetic on constants
+# becomes a copy of the result and ifs with a known condition become gotos. Blocks that can't be reached are removed
+#
+# The TAC is not in SSA form so the constants are kept per block instead of per definition
+# Globals are never constants since other functions can change them, parameters and variables not assigned yet aren't either
+class SparseConditionalConstantPropagation:
+    def __init__(self, instructions, symbol_table):
+        self.instructions = as_instruction_list(instructions)
+        self.symbol_table = symbol_table
+        self.modified = False
+
+    def optimize(self):
+        for function_nodes in list(self.instructions.functions()):
+            self.optimize_function(function_nodes)
+        return self.instructions
+
+    # Const an operand is known to be in state, or None
+    def constant_of(self, operand, state):
+        if type(operand) is Const:
+            return operand if operand.is_numeric() else None
+        if isinstance(operand, Symbol):
+            return state.get(operand.id)
+        return None
+
+    # Constant result of an instruction that defines a tracked variable, or None
+    def evaluate(self, instr, state):
+        opcode = instr.opcode
+        if opcode is Opcode.COPY:
+            return self.constant_of(instr.arg1, state)
+        if opcode in BINARY:
+            left = self.constant_of(instr.arg1, state)
+            right = self.constant_of(instr.arg2, state)
+            if left is None or right is None:
+                return None
+            value = fold(opcode, left.value, right.value)
+            return None if value is None else Const(value)
+        return None
+
+    # Updates state with what instr defines
+    def transfer(self, instr, state):
+        opcode = instr.opcode
+        if (opcode is Opcode.COPY or opcode in BINARY or opcode is Opcode.CALL) and self.symbol_table.is_local(instr.result):
+            value = self.evaluate(instr, state)
+            if value is None:
+                state.pop(instr.result.id, None)
+            else:
+                state[instr.result.id] = value
+
+    def optimize_function(self, nodes):
+        generator = BasicBlockGenerator()
+        blocks, graph = generator.generate_basic_blocks([node.instr for node in nodes])
+        order = {block_id: index for index, block_id in enumerate(blocks)}
+        block_ids = list(blocks)
+
+        # Successors of a block that can be taken with the constants at its end
+        def successors(block_id, state):
+            last = blocks[block_id][-1]
+            if last.opcode is Opcode.IF:
+                condition = self.constant_of(last.arg1, state)
+                if condition is not None:
+                    target = generator.label_in_block.get(last.arg2 if condition.value != 0 else last.result)
+                    return [target] if target else []
+            return list(graph.successors(block_id))
+
+        # Constants both states agree on, the same value of another type is not the same constant
+        def meet(first, second):
+            return {variable_id: value for variable_id, value in first.items()
+                    if variable_id in second and second[variable_id].value == value.value and type(second[variable_id].value) is type(value.value)}
+
+        entry = block_ids[0]
+        in_states = {entry: {}}
+        out_states = {}
+        executable_edges = set()
+        worklist = [0]
+        queued = {entry}
+        while worklist:
+            block_id = block_ids[heapq.heappop(worklist)]
+            queued.discard(block_id)
+            state = dict(in_states[block_id])
+            for instr in blocks[block_id]:
+                self.transfer(instr, state)
+            out_states[block_id] = state
+
+            for successor in successors(block_id, state):
+                executable_edges.add((block_id, successor))
+                new_state = None
+                for predecessor in graph.predecessors(successor):
+                    if (predecessor, successor) in executable_edges:
+                        new_state = dict(out_states[predecessor]) if new_state is None else meet(new_state, out_states[predecessor])
+                if successor not in in_states or in_states[successor] != new_state:
+                    in_states[successor] = new_state
+                    if successor not in queued:
+                        queued.add(successor)
+                        heapq.heappush(worklist, order[successor])
+
+        # Rewrite the executable blocks and remove the rest, blocks are in the same order as the nodes
+        position = 0
+        for block_id, block in blocks.items():
+            block_nodes = nodes[position:position + len(block)]
+            position += len(block)
+            if block_id not in in_states:
+                for node in block_nodes:
+                    self.instructions.remove(node)
+                self.modified = True
+                continue
+            state = dict(in_states[block_id])
+            for node in block_nodes:
+                instr = node.instr
+                new_instr = self.rewrite(instr, state)
+                if new_instr is not None:
+                    self.instructions.replace(node, new_instr)
+                    self.modified = True
+                self.transfer(instr, state)
+
+    # Instruction with the known constants put in, or None if nothing changes
+    def rewrite(self, instr, state):
+        opcode = instr.opcode
+        if opcode is Opcode.COPY or opcode in BINARY:
+            value = self.evaluate(instr, state)
+            if value is not None:
+                if opcode is Opcode.COPY and instr.arg1 is value:
+                    return None
+                return Instruction(Opcode.COPY, arg1=value, result=instr.result)
+        if opcode is Opcode.IF:
+            condition = self.constant_of(instr.arg1, state)
+            if condition is not None:
+                return Instruction(Opcode.GOTO, result=instr.arg2 if condition.value != 0 else instr.result)
+            return None
+
+        # Known constant of an operand, a tuple is only copied if an argument changed
+        def replace(operand):
+            if type(operand) is tuple:
+                args = tuple(replace(arg) for arg in operand)
+                return operand if all(new is old for new, old in zip(args, operand)) else args
+            if self.symbol_table.is_local(operand):
+                return state.get(operand.id, operand)
+            return operand
+
+        if opcode in BINARY or opcode is Opcode.RETURN:
+            arg1, arg2 = replace(instr.arg1), replace(instr.arg2)
+        elif opcode is Opcode.CALL:
+            arg1, arg2 = instr.arg1, replace(instr.arg2)
+        else:
+            return None
+        if arg1 is instr.arg1 and arg2 is instr.arg2:
+            return None
+        return Instruction(opcode, arg1=arg1, arg2=arg2, result=instr.result)
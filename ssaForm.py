@@ -0,0 +1,239 @@
+# https://en.wikipedia.org/wiki/Static_single-assignment_form
+# https://www.cs.utexas.edu/~pingali/CS380C/2010/papers/ssaCytron.pdf
+# Converts TAC to SSA form one function at a time and back to TAC for the assembler
+#
+# Construction (Cytron et al.)
+#   - Basic blocks and the CFG come from BasicBlockGenerator, blocks that can't be reached are dropped
+#   - Phis go at the iterated dominance frontier of the blocks that define a variable,
+#     only for variables used in a block before they are defined there (semi-pruned SSA)
+#   - Renaming walks the dominator tree with an explicit stack so every definition gets its own version x.n
+# Destruction puts copies for every phi at the end of its predecessors, an edge from a block with two successors
+# to a block with two predecessors gets a block of its own for the copies
+#
+# Global variables are left alone since other functions can change them, only variables, parameters and temps
+# of the function are renamed
+
+import networkx as nx
+from basicBlockGenerator import BasicBlockGenerator
+from instruction import Instruction, Opcode, Label, Var, BINARY
+
+# Opcodes that define their result
+DEFINES = BINARY | {Opcode.COPY, Opcode.CALL, Opcode.PHI}
+
+# Opcodes that end a block by jumping, copies for phis go before them
+JUMPS = (Opcode.IF, Opcode.GOTO)
+
+
+# One function in SSA form
+# blocks - dict of block id -> instructions in layout order, the first block is the entry
+# graph - CFG between the blocks
+class SSAFunction:
+    def __init__(self, name, blocks, graph):
+        self.name = name
+        self.blocks = blocks
+        self.graph = graph
+
+    def entry(self):
+        return next(iter(self.blocks))
+
+    # All instructions in layout order
+    def instructions(self):
+        return [instr for block in self.blocks.values() for instr in block]
+
+
+# Operands of an instruction that it reads, call and phi arguments are in a tuple
+def used_operands(instr):
+    for operand in (instr.arg1, instr.arg2):
+        if type(operand) is tuple:
+            yield from operand
+        elif operand is not None:
+            yield operand
+
+
+class SSAForm:
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.version_counts = {}
+        self.label_count = 0
+        self.swap_count = 0
+
+    # Next version of a variable, it has the same kind and type so passes and the assembler treat it the same
+    # The first definition keeps the variable itself so code without phis reads like before,
+    # parameters are already defined when the function starts so they always get a new version
+    def new_version(self, variable):
+        kind = self.symbol_table.symbol_kinds[variable.id]
+        if variable.id not in self.version_counts and kind != "parameter":
+            self.version_counts[variable.id] = 0
+            return variable
+        count = self.version_counts.get(variable.id, 0) + 1
+        self.version_counts[variable.id] = count
+        return self.symbol_table.new_symbol(f"{variable}.{count}", kind, type(variable))
+
+    def new_label(self):
+        self.label_count += 1
+        return Label(f"%E{self.label_count}")
+
+    # Converts TAC to SSA form
+    # Returns (instructions before the first function, list of SSAFunction)
+    def construct(self, instructions):
+        starts = [index for index, instr in enumerate(instructions) if instr.opcode is Opcode.FUNCTION]
+        global_instructions = instructions[:starts[0]] if starts else list(instructions)
+        functions = []
+        for start, end in zip(starts, starts[1:] + [len(instructions)]):
+
+            # Work on copies so the TAC passed in is not changed
+            body = [Instruction(instr.opcode, instr.arg1, instr.arg2, instr.result, instr.label) for instr in instructions[start:end]]
+            blocks, graph = BasicBlockGenerator().generate_basic_blocks(body)
+            entry = next(iter(blocks))
+            reachable = nx.descendants(graph, entry) | {entry}
+            blocks = {block_id: block for block_id, block in blocks.items() if block_id in reachable}
+            function = SSAFunction(body[0].label, blocks, graph.subgraph(reachable).copy())
+            self.insert_phis(function)
+            self.rename(function)
+            functions.append(function)
+        return global_instructions, functions
+
+    # Puts phis at the iterated dominance frontier of the definitions of every variable used across blocks
+    def insert_phis(self, function):
+        frontiers = nx.dominance_frontiers(function.graph, function.entry())
+        live_across = set()
+        definitions = {}
+        variables = {}
+        for block_id, block in function.blocks.items():
+            defined = set()
+            for instr in block:
+                for operand in used_operands(instr):
+                    if self.symbol_table.is_local(operand) and operand.id not in defined:
+                        live_across.add(operand.id)
+                if instr.opcode in DEFINES and self.symbol_table.is_local(instr.result):
+                    defined.add(instr.result.id)
+                    definitions.setdefault(instr.result.id, set()).add(block_id)
+                    variables[instr.result.id] = instr.result
+
+        for variable_id in sorted(live_across & definitions.keys()):
+            variable = variables[variable_id]
+            has_phi = set()
+            worklist = sorted(definitions[variable_id])
+            while worklist:
+                for frontier_block in sorted(frontiers[worklist.pop()]):
+                    if frontier_block in has_phi:
+                        continue
+                    has_phi.add(frontier_block)
+                    predecessors = tuple(function.graph.predecessors(frontier_block))
+                    block = function.blocks[frontier_block]
+                    position = 1 if block[0].opcode in (Opcode.LABEL, Opcode.FUNCTION) else 0
+                    block.insert(position, Instruction(Opcode.PHI, arg1=predecessors, arg2=(variable,) * len(predecessors), result=variable))
+                    if frontier_block not in definitions[variable_id]:
+                        worklist.append(frontier_block)
+
+    # Gives every definition a new version and points every use at the version that reaches it
+    def rename(self, function):
+        entry = function.entry()
+        dominators = nx.immediate_dominators(function.graph, entry)
+        children = {block_id: [] for block_id in function.blocks}
+        for block_id, dominator in dominators.items():
+            if block_id != entry:
+                children[dominator].append(block_id)
+
+        stacks = {}
+
+        def current(value):
+            if type(value) is tuple:
+                return tuple(current(operand) for operand in value)
+            if self.symbol_table.is_local(value):
+                versions = stacks.get(value.id)
+                return versions[-1] if versions else value
+            return value
+
+        # A block id is a block to rename, a list is the variables whose versions its block pushed
+        work = [entry]
+        while work:
+            item = work.pop()
+            if type(item) is list:
+                for variable_id in item:
+                    stacks[variable_id].pop()
+                continue
+
+            pushed = []
+            for instr in function.blocks[item]:
+                if instr.opcode is not Opcode.PHI:
+                    instr.arg1 = current(instr.arg1)
+                    instr.arg2 = current(instr.arg2)
+                if instr.opcode in DEFINES and self.symbol_table.is_local(instr.result):
+                    variable = instr.result
+                    instr.result = self.new_version(variable)
+                    stacks.setdefault(variable.id, []).append(instr.result)
+                    pushed.append(variable.id)
+
+            # Fill in the operand of every phi in the successors that comes from this block
+            for successor in function.graph.successors(item):
+                for instr in function.blocks[successor]:
+                    if instr.opcode is Opcode.PHI:
+                        index = instr.arg1.index(item)
+                        args = instr.arg2
+                        instr.arg2 = args[:index] + (current(args[index]),) + args[index + 1:]
+
+            work.append(pushed)
+            work.extend(reversed(children[item]))
+
+    # Turns parallel copies [(destination, source)] into copies that can run one after another
+    # A cycle like a = b, b = a saves one value in a temp first
+    def sequentialize(self, copies):
+        pending = [(destination, source) for destination, source in copies if destination != source]
+        result = []
+        while pending:
+            sources = {source.id for _, source in pending if isinstance(source, Var)}
+            ready = [copy for copy in pending if copy[0].id not in sources]
+            if ready:
+                for destination, source in ready:
+                    result.append(Instruction(Opcode.COPY, arg1=source, result=destination))
+                pending = [copy for copy in pending if copy[0].id in sources]
+                continue
+
+            self.swap_count += 1
+            saved = pending[0][0]
+            temp = self.symbol_table.new_temp(f"%swap{self.swap_count}")
+            result.append(Instruction(Opcode.COPY, arg1=saved, result=temp))
+            # Sources are compared by id since an equal Symbol can be a different object than the destination
+            pending = [(destination, temp if isinstance(source, Var) and source.id == saved.id else source) for destination, source in pending]
+        return result
+
+    # Converts SSA form back to TAC
+    def destruct(self, global_instructions, functions):
+        instructions = list(global_instructions)
+        for function in functions:
+            blocks = function.blocks
+            copies_at_end = {block_id: [] for block_id in blocks}
+            split_blocks = {block_id: [] for block_id in blocks}
+
+            for block_id, block in blocks.items():
+                phis = [instr for instr in block if instr.opcode is Opcode.PHI]
+                if not phis:
+                    continue
+                for index, predecessor in enumerate(phis[0].arg1):
+                    copies = [(phi.result, phi.arg2[index]) for phi in phis]
+                    if function.graph.out_degree(predecessor) == 1:
+                        copies_at_end[predecessor].extend(copies)
+                        continue
+
+                    # Critical edge, jump to a new block with the copies instead
+                    label = self.new_label()
+                    target = block[0].label
+                    jump = blocks[predecessor][-1]
+                    if jump.arg2 == target:
+                        jump.arg2 = label
+                    if jump.result == target:
+                        jump.result = label
+                    split_blocks[predecessor].append([Instruction(Opcode.LABEL, label=label)] + self.sequentialize(copies) + [Instruction(Opcode.GOTO, result=target)])
+
+            for block_id, block in blocks.items():
+                block = [instr for instr in block if instr.opcode is not Opcode.PHI]
+                copies = self.sequentialize(copies_at_end[block_id])
+                if block and block[-1].opcode in JUMPS:
+                    block[-1:-1] = copies
+                else:
+                    block.extend(copies)
+                instructions.extend(block)
+                for split_block in split_blocks[block_id]:
+                    instructions.extend(split_block)
+        return instructions
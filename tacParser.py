@@ -0,0 +1,251 @@
+import parser
+import TAC
+from lexer import TokenType
+from Errors import ParsingError
+from instruction import Instruction, Opcode, Label, BINARY_OPCODES
+
+# https://en.wikipedia.org/wiki/Syntax-directed_translation
+# Parser that emits TAC while it parses instead of building an AST, for builds that don't need the AST
+# The TAC is the same as parsing and then running TAC.generate_TAC, down to temp and label numbers:
+#   - Expressions, assignments and returns use the parser's builder methods, which emit here
+#   - if, while, for and function bodies are parsed here so their labels and jumps go around the blocks
+#   - Labels are numbered in the order TAC would make them, but an if only has an else label when an else follows,
+#     so labels are LabelSlots while parsing and get their names once the whole program is parsed
+#   - The increment of a for loop runs after the body, its tokens are kept and parsed after the body
+#     so its temps come after the body's like they do in TAC
+# Nested blocks are parsed recursively like the recursive parser engine
+
+
+# Label that gets its name when parsing is done, unused slots are else labels of ifs without an else
+class LabelSlot:
+    __slots__ = ("used", "label")
+
+    def __init__(self):
+        self.used = True
+        self.label = None
+
+
+class TACParser(parser.Parser):
+
+    def __init__(self, recover=False):
+        super().__init__("recursive", recover)
+        self.instructions = []
+        self.global_instructions = []
+        self.temp_var_count = 1
+        self.label_slots = []
+
+        # Instructions that have LabelSlots to fill in
+        self.jumps = []
+
+    # Returns (TAC instructions, symbol table)
+    def parse(self, tokens):
+        super().parse(tokens)
+        self.name_labels()
+        self.instructions = self.global_instructions + self.instructions
+        return self.instructions, self.symbol_table
+
+    def emit(self, opcode, arg1=None, arg2=None, result=None, label=None):
+        instr = Instruction(opcode, arg1, arg2, result, label)
+        self.instructions.append(instr)
+        return instr
+
+    # Emits an instruction that has LabelSlots
+    def emit_jump(self, opcode, arg1=None, arg2=None, result=None, label=None):
+        instr = self.emit(opcode, arg1, arg2, result, label)
+        self.jumps.append(instr)
+        return instr
+
+    # Same names as TAC.generate_fresh_variable
+    def new_temp(self):
+        temp = self.symbol_table.new_temp(f"%temp{self.temp_var_count}")
+        self.temp_var_count += 1
+        return temp
+
+    def new_labels(self, count):
+        slots = [LabelSlot() for _ in range(count)]
+        self.label_slots.extend(slots)
+        return slots
+
+    # Names every used slot like TAC.generate_fresh_label and puts the names in the jumps
+    def name_labels(self):
+        count = 1
+        for slot in self.label_slots:
+            if slot.used:
+                slot.label = Label(f"%L{count}")
+                count += 1
+        for instr in self.jumps:
+            if instr.opcode is Opcode.LABEL:
+                instr.label = instr.label.label
+            elif instr.opcode is Opcode.IF:
+                instr.arg2 = instr.arg2.label
+                instr.result = instr.result.label
+            else:
+                instr.result = instr.result.label
+        self.jumps = []
+
+    # Builders emit TAC and return the operand that holds the result
+
+    def leaf(self, token):
+        if token.type == TokenType.IDENTIFIER:
+            return token.value
+        return TAC.constant(token)
+
+    def binary(self, operator_token, left, right):
+        temp = self.new_temp()
+        self.emit(BINARY_OPCODES[operator_token.value], left, right, temp)
+        return temp
+
+    def call(self, function_token, arguments):
+        temp = self.new_temp()
+        self.emit(Opcode.CALL, function_token.value, tuple(arguments or ()), temp)
+        return temp
+
+    def assignment(self, assign_token, variable_token, value):
+        self.emit(Opcode.COPY, value, result=variable_token.value)
+        return None
+
+    def return_stmt(self, return_token, value):
+        self.emit(Opcode.RETURN, value)
+        return None
+
+    # Statements emit their TAC as they are parsed, nothing is collected
+    def parse_stmt_list(self, scope):
+        while self.lookahead is not None and self.lookahead.type != TokenType.RIGHT_BRACE:
+            try:
+                self.parse_stmt(scope)
+            except ParsingError as e:
+                self.recover_from(e)
+
+    # Globals go before the first function like TAC.generate_TAC_for_program
+    def parse_var_decl(self, scope, variable_name, variable_type):
+        if scope != "global":
+            return super().parse_var_decl(scope, variable_name, variable_type)
+        function_instructions = self.instructions
+        self.instructions = self.global_instructions
+        try:
+            return super().parse_var_decl(scope, variable_name, variable_type)
+        finally:
+            self.global_instructions = self.instructions
+            self.instructions = function_instructions
+
+    def parse_func_decl(self, func_token):
+        self.emit(Opcode.FUNCTION, label=func_token.value)
+
+        # Match the parameter list
+        self.match(TokenType.LEFT_PAREN)
+        if self.peek() != TokenType.RIGHT_PAREN:
+            self.parse_params(func_token.value)
+        self.match(TokenType.RIGHT_PAREN)
+
+        # Match the function body
+        self.match(TokenType.LEFT_BRACE)
+        self.parse_stmt_list(func_token.value)
+        self.match(TokenType.RIGHT_BRACE)
+
+    # if condition goto if_label else goto else_label (or end_label)
+    def parse_IF_stmt(self, scope):
+        self.match(TokenType.IF)
+        condition = self.parse_condition(scope)
+        if_label, else_label, end_label = self.new_labels(3)
+        branch = self.emit_jump(Opcode.IF, condition, if_label, else_label)
+        self.emit_jump(Opcode.LABEL, label=if_label)
+
+        # Match statement block
+        self.parse_stmt_list(self.symbol_table.new_block(scope))
+        self.match(TokenType.RIGHT_BRACE)
+        self.emit_jump(Opcode.GOTO, result=end_label)
+
+        # Check for optional else part
+        if self.lookahead is not None and self.lookahead.type == TokenType.ELSE:
+            self.match(TokenType.ELSE)
+            self.emit_jump(Opcode.LABEL, label=else_label)
+
+            # Check if else is another if
+            if self.peek() == TokenType.IF:
+                self.parse_IF_stmt(scope)
+            else:
+                self.match(TokenType.LEFT_BRACE)
+                self.parse_stmt_list(self.symbol_table.new_block(scope))
+                self.match(TokenType.RIGHT_BRACE)
+            self.emit_jump(Opcode.GOTO, result=end_label)
+        else:
+            else_label.used = False
+            branch.result = end_label
+
+        self.emit_jump(Opcode.LABEL, label=end_label)
+
+    def parse_while_stmt(self, scope):
+        self.match(TokenType.WHILE)
+        start_label, body_label, end_label = self.new_labels(3)
+        self.emit_jump(Opcode.LABEL, label=start_label)
+        condition = self.parse_condition(scope)
+        self.emit_jump(Opcode.IF, condition, body_label, end_label)
+        self.emit_jump(Opcode.LABEL, label=body_label)
+
+        # Match statement block
+        self.parse_stmt_list(self.symbol_table.new_block(scope))
+        self.match(TokenType.RIGHT_BRACE)
+        self.emit_jump(Opcode.GOTO, result=start_label)
+        self.emit_jump(Opcode.LABEL, label=end_label)
+
+    # Variables declared in the header are in a scope of their own that the block is nested in
+    def parse_for_stmt(self, scope):
+        for_scope = self.symbol_table.new_block(scope)
+        self.match(TokenType.FOR)
+
+        # Match initalization
+        self.match(TokenType.LEFT_PAREN)
+        if self.peek() in [TokenType.INT, TokenType.FLOAT, TokenType.CHAR]:
+            self.parse_decl(for_scope)
+        else:
+            self.parse_expr_stmt(for_scope)
+            self.match(TokenType.SEMICOLON)
+
+        # Match boolean expression
+        start_label, body_label, end_label = self.new_labels(3)
+        self.emit_jump(Opcode.LABEL, label=start_label)
+        type = self.get_next_type_for_boolean(for_scope)
+        condition = self.parse_bool_expr(for_scope, type)
+        self.match(TokenType.SEMICOLON)
+
+        # Keep the iteration expression for after the body
+        increment_tokens = self.take_until_close_paren()
+        self.match(TokenType.LEFT_BRACE)
+        self.emit_jump(Opcode.IF, condition, body_label, end_label)
+        self.emit_jump(Opcode.LABEL, label=body_label)
+
+        # Match statement block
+        self.parse_stmt_list(self.symbol_table.new_block(for_scope))
+        self.match(TokenType.RIGHT_BRACE)
+
+        self.parse_kept_tokens(increment_tokens, lambda: self.parse_expr_stmt(for_scope))
+        self.emit_jump(Opcode.GOTO, result=start_label)
+        self.emit_jump(Opcode.LABEL, label=end_label)
+
+    # Takes the tokens up to the ) that closes the for header, the ) is kept too
+    def take_until_close_paren(self):
+        tokens = []
+        depth = 0
+        while self.lookahead is not None:
+            if self.lookahead.type == TokenType.LEFT_PAREN:
+                depth += 1
+            elif self.lookahead.type == TokenType.RIGHT_PAREN:
+                if depth == 0:
+                    tokens.append(self.lookahead)
+                    self.consume()
+                    return tokens
+                depth -= 1
+            tokens.append(self.lookahead)
+            self.consume()
+        raise ParsingError(f"Expected {TokenType.RIGHT_PAREN.value} but reached end of input", 0, 0)
+
+    # Parses kept tokens that end with a ) and then goes back to the token after the body
+    def parse_kept_tokens(self, tokens, parse):
+        token_stream, lookahead, token_index = self.token_stream, self.lookahead, self.current_token_index
+        self.token_stream = iter(tokens)
+        self.consume()
+        try:
+            parse()
+            self.match(TokenType.RIGHT_PAREN)
+        finally:
+            self.token_stream, self.lookahead, self.current_token_index = token_stream, lookahead, token_index
@@ -1,19 +1,22 @@
-from instruction import Instruction
+from instruction import Instruction, Opcode, Temp
+from instructionList import as_instruction_list
 
+# Removes the copy of a temp into a variable right after the temp is computed, the computation
+# goes straight into the variable instead
+# The instruction before the copy is replaced in the InstructionList and the copy removed, modified is True if any were
 class tempVarRemover:
     def __init__(self, instructions):
-        self.instructions = instructions
+        self.instructions = as_instruction_list(instructions)
+        self.modified = False
     
     def optimize(self):
-        optimized_instructions = []
-        
-        for i in range(len(self.instructions)):
-            instr = self.instructions[i]
-            prev_instr = self.instructions[i-1] if i > 0 else None
-            if instr.operator == '=' and prev_instr and instr.arg1 == prev_instr.result and instr.arg2 is None and instr.arg1.startswith('%'):
-                optimized_instructions[-1].result = instr.result
-            else:
-                optimized_instructions.append(instr)
+        for node in self.instructions.nodes():
+            instr = node.instr
+            prev_node = node.prev
+            if instr.opcode is Opcode.COPY and prev_node and type(instr.arg1) is Temp and instr.arg1 == prev_node.instr.result:
+                prev_instr = prev_node.instr
+                self.instructions.replace(prev_node, Instruction(prev_instr.opcode, prev_instr.arg1, prev_instr.arg2, instr.result, prev_instr.label))
+                self.instructions.remove(node)
+                self.modified = True
 
-        return optimized_instructions
-        
\ No newline at end of file
+        return self.instructions